@@ -0,0 +1,127 @@
+"""
+Compares the GA hit chunks with the `OrderedDict` based chunks they
+replaced, building and encoding an event with a transaction and products.
+
+    $ python benchmarks/hits.py [--products 20] [--number 2000]
+"""
+import argparse
+import gc
+import random
+import sys
+import timeit
+import tracemalloc
+
+from collections import OrderedDict
+from os.path import (
+    abspath,
+    dirname)
+
+from six.moves.urllib.parse import urlencode
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from catracking.ga import (  # noqa: E402
+    core,
+    parameters)
+
+
+class OrderedDictHit(OrderedDict):
+    """
+    The previous hit chunk: values normalized as they are set.
+    """
+
+    def __setitem__(self, key, value):
+        if not (value is None or value == ''):
+            value = str(value)
+            if key not in [parameters.TRACKING_ID, parameters.USER_AGENT]:
+                value = value.lower()
+            super(OrderedDictHit, self).__setitem__(key, value)
+
+    @property
+    def encoded_url(self):
+        self[parameters.CACHE_BUSTER] = random.randint(1, 100000)
+        return urlencode(self)
+
+
+class OrderedDictProduct(OrderedDictHit):
+
+    def __init__(self, index):
+        self.index = index
+        super(OrderedDictProduct, self).__init__()
+
+    def __setitem__(self, key, value):
+        key = 'pr{0}{1}'.format(self.index, key)
+        super(OrderedDictProduct, self).__setitem__(key, value)
+
+
+def fill_event(event, products, product_class):
+    event[parameters.HIT_TYPE] = parameters.HIT_TYPE_EVENT
+    event[parameters.EVENT_CATEGORY] = 'Verified Lead'
+    event[parameters.EVENT_ACTION] = 'Checkout'
+    event[parameters.EVENT_LABEL] = 'Click'
+    event[parameters.TRANSACTION_ID] = 'T-1234'
+    event[parameters.TRANSACTION_REVENUE] = 99.5
+    items = []
+    for index in range(1, products + 1):
+        product = product_class(index)
+        product[parameters.PRODUCT_ID] = 'SKU-{}'.format(index)
+        product[parameters.PRODUCT_NAME] = 'Product Name {}'.format(index)
+        product[parameters.PRODUCT_CATEGORY] = 'Home Security'
+        product[parameters.PRODUCT_BRAND] = 'Brand'
+        product[parameters.PRODUCT_PRICE] = 10.5
+        product[parameters.PRODUCT_QUANTITY] = 1
+        product['cd1'] = 'Dimension'
+        product['cm1'] = 3
+        items.append(product)
+    return event, items
+
+
+def build_ordered_dict(products):
+    event, items = fill_event(OrderedDictHit(), products, OrderedDictProduct)
+    for product in items:
+        event.update(product)
+    return event
+
+
+def build_slots(products):
+    event, items = fill_event(
+        core.BaseMeasurementProtocolHit(), products, core.ProductHitChunk)
+    for product in items:
+        event.update(product)
+    return event
+
+
+def measure_memory(build, products, count=200):
+    gc.collect()
+    tracemalloc.start()
+    hits = [build(products) for _ in range(count)]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del hits
+    return size / count
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--products', type=int, default=20)
+    parser.add_argument('--number', type=int, default=2000)
+    options = parser.parse_args()
+
+    print('{:<14}{:>14}{:>14}{:>12}'.format(
+        'hit', 'build (us)', 'encode (us)', 'bytes'))
+    for name, build in (
+            ('OrderedDict', build_ordered_dict), ('slots', build_slots)):
+        hit = build(options.products)
+        build_time = timeit.timeit(
+            lambda: build(options.products), number=options.number)
+        encode_time = timeit.timeit(
+            lambda: hit.encoded_url, number=options.number)
+        print('{:<14}{:>14.1f}{:>14.1f}{:>12.0f}'.format(
+            name,
+            build_time / options.number * 1e6,
+            encode_time / options.number * 1e6,
+            measure_memory(build, options.products)))
+
+
+if __name__ == '__main__':
+    main()
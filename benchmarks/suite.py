@@ -0,0 +1,366 @@
+"""
+Benchmark suite of the tracking hot paths.
+
+It runs offline, with the `test_app` settings, an in-memory test database
+and a local stub endpoint standing in for the tracker, and writes the
+results as JSON so they can be compared between releases:
+
+    $ python benchmarks/suite.py --output 0.1.7.json
+    $ python benchmarks/suite.py --baseline 0.1.7.json [--threshold 0.2]
+
+With `--baseline`, every case is compared with the same case of the
+baseline results, and the exit status is 1 when any of them got slower
+than the threshold (relative, on the median).
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import timeit
+
+from datetime import datetime
+from http.server import (
+    BaseHTTPRequestHandler,
+    HTTPServer)
+from os.path import (
+    abspath,
+    dirname)
+from socketserver import ThreadingMixIn
+
+ROOT = dirname(dirname(abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'test_app.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth.models import AnonymousUser  # noqa: E402
+from django.contrib.sessions.backends.signed_cookies import (  # noqa: E402
+    SessionStore)
+from django.db import connection  # noqa: E402
+from django.http import HttpResponse  # noqa: E402
+from django.test import (  # noqa: E402
+    RequestFactory,
+    override_settings)
+
+from catracking import buffers  # noqa: E402
+from catracking.backends import memory  # noqa: E402
+from catracking.ga.core import (  # noqa: E402
+    GoogleAnalyticsTracker,
+    HitEncoder,
+    RootHitChunk)
+from catracking.ga.middleware import (  # noqa: E402
+    COOKIE_NAME,
+    GoogleAnalyticsCookieMiddleware)
+from catracking.middleware import TrackingMiddleware  # noqa: E402
+from catracking.tasks import SendTrackingDataTask  # noqa: E402
+
+FORMAT_VERSION = 1
+
+GA_CONFIG = {
+    'PROPERTY': 'UA-123456-1',
+    'DOCUMENT_HOSTNAME': 'www.consumeraffairs.com',
+    'COOKIE_DOMAIN': '.consumeraffairs.com',
+    'DISPATCH': 'memory',
+}
+
+USER_AGENT = (
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) '
+    'Chrome/70.0.3538.77 Safari/537.36')
+GA_COOKIE = 'GA1.2.809004643.1509480820'
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Accepts every hit, with keep-alive connections as the tracker does.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    do_HEAD = do_POST
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def start_stub_endpoint():
+    server = StubServer(('127.0.0.1', 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server, 'http://127.0.0.1:{}/collect'.format(server.server_port)
+
+
+def new_request(cookie=True):
+    request = RequestFactory().get('/', HTTP_USER_AGENT=USER_AGENT)
+    if cookie:
+        request.COOKIES[COOKIE_NAME] = GA_COOKIE
+    request.session = SessionStore()
+    request.user = AnonymousUser()
+    return request
+
+
+def new_event(tracker, products):
+    event = tracker.new_event('Verified Lead', 'Checkout', 'Click')
+    event['cd2'] = 'home-security'
+    if products:
+        event.new_transaction('T-1234', revenue=99.5)
+        event.set_product_action('purchase')
+    for index in range(products):
+        product = event.new_product(
+            'SKU-{}'.format(index), 'Product Name {}'.format(index),
+            'Home Security', 'Brand', 10.5, 1)
+        product['cd1'] = 'Dimension'
+    return event
+
+
+def tracking_middleware(events):
+    """
+    A request through `TrackingMiddleware`, with a view adding `events`
+    events. Hits are dispatched with the `memory` backend.
+    """
+    middleware = TrackingMiddleware(lambda request: None)
+    request = new_request()
+    response = HttpResponse()
+
+    def view(request):
+        for index in range(events):
+            request.trackers.ga.new_event('Verified Lead', 'Checkout', 'Click')
+        return response
+
+    def run():
+        middleware.process_view(request, view, (), {})
+        middleware.process_response(request, view(request))
+        memory.clear()
+    return run
+
+
+def root_hit_chunk():
+    request = new_request()
+    return lambda: RootHitChunk(request)
+
+
+def compile_hits(products):
+    """
+    `compile_hits` and `encoded_url` of every compiled hit.
+    """
+    tracker = GoogleAnalyticsTracker(new_request())
+    hits = [new_event(tracker, products)]
+
+    def run():
+        tracker.hits = list(hits)
+        tracker.compile_hits()
+        return [hit.encoded_url for hit in tracker.hits]
+    return run
+
+
+def hit_encoder(products):
+    """
+    Encoding of the hits as `GoogleAnalyticsTracker.send` does it.
+    """
+    tracker = GoogleAnalyticsTracker(new_request())
+    new_event(tracker, products)
+
+    def run():
+        encoder = HitEncoder(tracker.get_root_chunk())
+        return [encoder.encode(hit.compile()) for hit in tracker.hits]
+    return run
+
+
+def cookie_middleware(cookie):
+    middleware = GoogleAnalyticsCookieMiddleware(lambda request: None)
+    request = new_request(cookie)
+    response = HttpResponse()
+
+    def run():
+        middleware.process_request(request)
+        middleware.process_response(request, response)
+    return run
+
+
+def send_tracking_data(ident, endpoint, hits):
+    """
+    `hits` deliveries of `SendTrackingDataTask` to the stub endpoint,
+    including the `TrackingRequest` logs.
+    """
+    tracker = GoogleAnalyticsTracker(new_request())
+    new_event(tracker, 2)
+    payload = HitEncoder(tracker.get_root_chunk()).encode(
+        tracker.hits[0].compile())
+
+    def run():
+        for index in range(hits):
+            SendTrackingDataTask().run(ident, endpoint, payload)
+        buffers.get_buffer(ident).flush()
+    return run
+
+
+def cases(options, endpoint):
+    """
+    Yields the name, parameters, operations per call and callable of
+    every case.
+    """
+    for events in (0, 1, 20):
+        yield 'tracking_middleware', {'events': events}, 1, \
+            tracking_middleware(events)
+    yield 'root_hit_chunk', {}, 1, root_hit_chunk()
+    for products in (0, 1, 10, 50):
+        yield 'compile_hits', {'products': products}, 1, \
+            compile_hits(products)
+        yield 'hit_encoder', {'products': products}, 1, \
+            hit_encoder(products)
+    for cookie in (True, False):
+        yield 'cookie_middleware', {'cookie': cookie}, 1, \
+            cookie_middleware(cookie)
+    for ident, log_buffer_size in (('ga_log', 1), ('ga_log_buffered', 100)):
+        yield 'send_tracking_data', {'log_buffer_size': log_buffer_size}, \
+            options.hits, send_tracking_data(ident, endpoint, options.hits)
+
+
+def case_id(name, params):
+    return name + ''.join(
+        '[{}={}]'.format(key, json.dumps(value))
+        for key, value in sorted(params.items()))
+
+
+def measure(func, operations, number, repeat):
+    """
+    Returns the timings, in microseconds per operation, of `repeat` runs
+    of `number` calls.
+    """
+    func()
+    times = [
+        total / (number * operations) * 1e6
+        for total in timeit.Timer(func).repeat(repeat, number)]
+    return {
+        'min': min(times),
+        'median': statistics.median(times),
+        'mean': statistics.mean(times),
+        'max': max(times),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=ROOT,
+            stderr=subprocess.DEVNULL).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(options):
+    server, endpoint = start_stub_endpoint()
+    trackers = {
+        'ga': GA_CONFIG,
+        'ga_log': {'LOG_BUFFER_SIZE': 1},
+        'ga_log_buffered': {'LOG_BUFFER_SIZE': 100},
+    }
+    old_name = connection.creation.create_test_db(verbosity=0)
+    results = []
+    try:
+        with override_settings(TRACKERS=trackers):
+            for name, params, operations, func in cases(options, endpoint):
+                if options.only and not name.startswith(options.only):
+                    continue
+                number = 1 if operations > 1 else options.number
+                timings = measure(func, operations, number, options.repeat)
+                results.append({
+                    'id': case_id(name, params),
+                    'name': name,
+                    'params': params,
+                    'number': number * operations,
+                    'repeat': options.repeat,
+                    'us': timings,
+                    'per_second': 1e6 / timings['median'],
+                })
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        server.shutdown()
+    return {
+        'format': FORMAT_VERSION,
+        'created': datetime.utcnow().isoformat() + 'Z',
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Prints the change of every case against the baseline and returns the
+    ids of the cases that regressed.
+    """
+    previous = {result['id']: result for result in baseline['results']}
+    regressions = []
+    print('\n{:<44}{:>12}{:>12}{:>9}'.format(
+        'case', 'base (us)', 'now (us)', 'change'))
+    for result in results['results']:
+        if result['id'] not in previous:
+            continue
+        before = previous[result['id']]['us']['median']
+        after = result['us']['median']
+        change = after / before - 1
+        if change > threshold:
+            regressions.append(result['id'])
+        print('{:<44}{:>12.1f}{:>12.1f}{:>+8.0%}{}'.format(
+            result['id'], before, after, change,
+            ' !' if change > threshold else ''))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--number', type=int, default=1000,
+                        help='calls per run of every case')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='runs of every case, the median is reported')
+    parser.add_argument('--hits', type=int, default=200,
+                        help='hits delivered per run by the end-to-end case')
+    parser.add_argument('--only', help='only run cases starting with this')
+    parser.add_argument('--output', help='file to write the JSON results to')
+    parser.add_argument('--baseline', help='JSON results to compare with')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='relative slowdown reported as a regression')
+    options = parser.parse_args()
+
+    results = run(options)
+    print('{:<44}{:>12}{:>12}{:>14}'.format(
+        'case', 'median (us)', 'min (us)', 'per second'))
+    for result in results['results']:
+        print('{:<44}{:>12.1f}{:>12.1f}{:>14.0f}'.format(
+            result['id'], result['us']['median'], result['us']['min'],
+            result['per_second']))
+
+    if options.output:
+        with open(options.output, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+
+    if options.baseline:
+        with open(options.baseline) as baseline:
+            regressions = compare(
+                results, json.load(baseline), options.threshold)
+        if regressions:
+            print('\n{} case(s) regressed more than {:.0%}'.format(
+                len(regressions), options.threshold))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -4,7 +4,10 @@ from six.moves.urllib.parse import parse_qsl
 
 from django.contrib import admin
 
-from catracking.models import TrackingRequest
+from catracking.models import (
+    TrackingDeadLetter,
+    TrackingRequest,
+    TrackingRequestSummary)
 
 
 class TrackingRequestAdmin(admin.ModelAdmin):
@@ -23,13 +26,34 @@ class TrackingRequestAdmin(admin.ModelAdmin):
         Should be improved in future versions.
         """
         if obj.tracker == 'ga':
-            values = dict(parse_qsl(obj.payload))
-            event_type = values['t']
-            if event_type == 'event':
-                return 'event ({})'.format(', '.join(
-                    [values['ec'], values['ea'], values['el']]))
+            friendly = []
+            for hit in obj.payload.splitlines():
+                values = dict(parse_qsl(hit))
+                if values.get('t') == 'event':
+                    friendly.append('event ({})'.format(', '.join(
+                        [values['ec'], values['ea'], values['el']])))
+            return '; '.join(friendly)
         return ''
     payloadify.short_description = 'Friendly payload'
 
 
+class TrackingRequestSummaryAdmin(admin.ModelAdmin):
+    list_display = ('tracker', 'endpoint', 'response_code', 'minute', 'count')
+    list_filter = ('tracker', 'response_code')
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        qs = super(TrackingRequestSummaryAdmin, self).get_queryset(request)
+        five_hours_ago = arrow.utcnow().shift(hours=-5)
+        return qs.filter(minute__gte=five_hours_ago.datetime)
+
+
+class TrackingDeadLetterAdmin(admin.ModelAdmin):
+    list_display = ('tracker', 'endpoint', 'attempts', 'error', 'created')
+    list_filter = ('tracker',)
+    show_full_result_count = False
+
+
 admin.site.register(TrackingRequest, TrackingRequestAdmin)
+admin.site.register(TrackingRequestSummary, TrackingRequestSummaryAdmin)
+admin.site.register(TrackingDeadLetter, TrackingDeadLetterAdmin)
@@ -0,0 +1,108 @@
+"""
+Async support of the middlewares and trackers, used when they run under
+ASGI. This module is python 3 only, so it is only imported there.
+"""
+import asyncio
+import functools
+import inspect
+
+
+def iscoroutinefunction(func):
+    """
+    Async middlewares are coroutine functions too, even when they could not
+    be marked as such, see `mark_coroutine`.
+    """
+    return asyncio.iscoroutinefunction(func) or getattr(
+        func, 'is_async', False) is True
+
+
+def mark_coroutine(obj):
+    """
+    Marks a callable object as a coroutine function, for the callers that
+    check it with `iscoroutinefunction`, when asgiref (3.6+) or python
+    (3.12+) provides `markcoroutinefunction`. Django does not need it: it
+    chains async capable middlewares as coroutines under ASGI anyway.
+    """
+    try:
+        from asgiref.sync import markcoroutinefunction
+    except ImportError:
+        markcoroutinefunction = getattr(
+            inspect, 'markcoroutinefunction', None)
+    if markcoroutinefunction is not None:
+        markcoroutinefunction(obj)
+
+
+def as_coroutine(func):
+    """
+    Wraps a function that does not block in a coroutine function, so
+    django can call it from the event loop without a thread hop.
+    """
+    async def wrapper(*args, **kwargs):
+        return func(*args, **kwargs)
+    return wrapper
+
+
+def sync_to_async(func, thread_sensitive=True):
+    """
+    Wraps a sync function in a coroutine function running it outside of
+    the event loop. With asgiref, thread sensitive functions, the ones
+    reading the session or the user from the database, run in the thread
+    django uses for the sync code of the request, the others in any thread
+    of the executor. Otherwise, they all run in the default executor.
+    """
+    try:
+        from asgiref.sync import sync_to_async
+    except ImportError:
+        pass
+    else:
+        return sync_to_async(func, thread_sensitive=thread_sensitive)
+
+    async def wrapper(*args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            None, functools.partial(func, *args, **kwargs))
+    return wrapper
+
+
+async def call(middleware, request):
+    """
+    Async version of `MiddlewareMixin.__call__`. `process_request` and
+    `process_response` may read the session, so they run in the sync
+    thread of the request (see `sync_to_async`), unless the middleware
+    provides an awaitable `aprocess_response`.
+    """
+    response = None
+    if hasattr(middleware, 'process_request'):
+        response = await sync_to_async(middleware.process_request)(request)
+    if not response:
+        response = await middleware.get_response(request)
+    if hasattr(middleware, 'aprocess_response'):
+        response = await middleware.aprocess_response(request, response)
+    elif hasattr(middleware, 'process_response'):
+        response = await sync_to_async(middleware.process_response)(
+            request, response)
+    return response
+
+
+async def send(tracker):
+    """
+    Sends a tracker without blocking the event loop. Compiling the hits
+    reads the session and the user, so it runs in the sync thread of the
+    request, but the payloads are dispatched (most dispatch backends block)
+    in any thread, so the trackers of the requests do not wait for each
+    other. See `Tracker.compile_dispatches`.
+    """
+    dispatches = await sync_to_async(tracker.compile_dispatches)()
+    for dispatch in dispatches:
+        await sync_to_async(dispatch, thread_sensitive=False)()
+
+
+async def process_response(middleware, request, response):
+    """
+    Async version of `TrackingMiddleware.process_response`, the trackers
+    are sent concurrently.
+    """
+    await asyncio.gather(*[
+        tracker.asend() for tracker in middleware.touched_trackers(request)])
+    middleware.defer(request, response)
+    return response
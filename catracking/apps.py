@@ -0,0 +1,20 @@
+from django.apps import AppConfig
+from django.conf import settings
+from django.core import checks
+
+
+class CatrackingConfig(AppConfig):
+    name = 'catracking'
+
+    def ready(self):
+        """
+        Registers the configuration checks and builds the configuration
+        snapshot of every tracker, so requests do not parse the settings.
+        """
+        from catracking.checks import check_trackers
+        from catracking.core import get_config
+
+        checks.register(check_trackers)
+        for ident, values in getattr(settings, 'TRACKERS', {}).items():
+            if isinstance(values, dict):
+                get_config(ident)
@@ -0,0 +1,29 @@
+from django.utils.module_loading import import_string
+
+DISPATCH_BACKENDS = {
+    'task': 'catracking.backends.celery.CeleryBackend',
+    'bulk': 'catracking.backends.celery.CeleryBulkBackend',
+    'sync': 'catracking.backends.sync.SyncBackend',
+    'thread': 'catracking.backends.thread.ThreadBackend',
+    'outbox': 'catracking.backends.outbox.OutboxBackend',
+    'memory': 'catracking.backends.memory.MemoryBackend',
+}
+
+DEFAULT_DISPATCH = 'task'
+
+_backends = {}
+
+
+def get_backend(tracker_class):
+    """
+    Returns the dispatch backend configured with `DISPATCH` for a tracker.
+    `DISPATCH` is either the name of a bundled backend or the path to a
+    custom `DispatchBackend`.
+    """
+    dispatch = tracker_class.settings('DISPATCH', DEFAULT_DISPATCH)
+    key = (tracker_class, dispatch)
+    if key not in _backends:
+        backend_class = import_string(
+            DISPATCH_BACKENDS.get(dispatch, dispatch))
+        _backends[key] = backend_class(tracker_class)
+    return _backends[key]
@@ -0,0 +1,54 @@
+import six
+
+from abc import (
+    ABCMeta,
+    abstractmethod)
+
+from catracking.delivery import (
+    creation_times,
+    earliest)
+
+
+@six.add_metaclass(ABCMeta)
+class DispatchBackend(object):
+    """
+    Defines how the payloads of a tracker leave the request.
+    The `send` function receives every payload compiled in a request, and
+    the list of their creation timestamps (`None` if unknown).
+    """
+
+    def __init__(self, tracker_class):
+        self.tracker_class = tracker_class
+
+    @property
+    def ident(self):
+        return self.tracker_class.IDENT
+
+    def payloads(self, payload_bucket):
+        """
+        Returns the endpoint and the payloads to be sent to it, packed in
+        batches if the tracker has batching enabled.
+        """
+        if self.tracker_class.batch_enabled():
+            return (
+                self.tracker_class.BATCH_ENDPOINT,
+                self.tracker_class.batches(payload_bucket))
+        return self.tracker_class.ENDPOINT, payload_bucket
+
+    def timed_payloads(self, payload_bucket, created=None):
+        """
+        Same as `payloads`, with `(payload, created)` pairs. Batches were
+        created with their earliest payload.
+        """
+        items = list(zip(
+            payload_bucket, creation_times(created, len(payload_bucket))))
+        if self.tracker_class.batch_enabled():
+            return self.tracker_class.BATCH_ENDPOINT, [
+                ('\n'.join(item[0] for item in batch),
+                 earliest(item[1] for item in batch))
+                for batch in self.tracker_class.pack(items, lambda i: i[0])]
+        return self.tracker_class.ENDPOINT, items
+
+    @abstractmethod
+    def send(self, payload_bucket, created=None):
+        pass
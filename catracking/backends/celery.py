@@ -0,0 +1,55 @@
+from __future__ import absolute_import
+
+from time import time
+
+from catracking import wire
+from catracking.backends.base import DispatchBackend
+from catracking.tasks import (
+    SendBulkTrackingDataTask,
+    SendPackedTrackingDataTask,
+    SendTrackingDataTask)
+
+WIRE_FORMAT_PLAIN = 'plain'
+WIRE_FORMAT_COMPACT = 'compact'
+
+
+class CeleryBackend(DispatchBackend):
+    """
+    Instantiates a celery task for each payload in the bucket, or for each
+    batch of payloads if batching is enabled.
+    """
+
+    def send(self, payload_bucket, created=None):
+        endpoint, payloads = self.timed_payloads(payload_bucket, created)
+        for payload, payload_created in payloads:
+            SendTrackingDataTask().delay(
+                self.ident, endpoint, payload, created=payload_created,
+                enqueued=time())
+
+
+class CeleryBulkBackend(DispatchBackend):
+    """
+    A single celery task receives every payload of the request and the
+    worker delivers them, concurrently if `BULK_CONCURRENCY` is set.
+
+    With the `compact` `WIRE_FORMAT`, the message is packed with
+    `catracking.wire` to use less broker memory, unless packing does not
+    make it smaller.
+    """
+
+    def send(self, payload_bucket, created=None):
+        endpoint, payloads = self.timed_payloads(payload_bucket, created)
+        if not payloads:
+            return
+        payloads, created = [list(values) for values in zip(*payloads)]
+        settings = self.tracker_class.settings
+        concurrency = settings('BULK_CONCURRENCY', 1)
+        if settings('WIRE_FORMAT', WIRE_FORMAT_PLAIN) == WIRE_FORMAT_COMPACT:
+            message = wire.pack(endpoint, payloads, settings(
+                'WIRE_COMPRESS_MIN', wire.DEFAULT_COMPRESS_MIN))
+            if wire.smaller(message, endpoint, payloads):
+                SendPackedTrackingDataTask().delay(
+                    self.ident, message, concurrency, created, time())
+                return
+        SendBulkTrackingDataTask().delay(
+            self.ident, endpoint, payloads, concurrency, created, time())
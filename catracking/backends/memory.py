@@ -0,0 +1,28 @@
+from collections import namedtuple
+
+from catracking.backends.base import DispatchBackend
+
+SentPayload = namedtuple('SentPayload', 'tracker endpoint payload')
+
+"""
+Every payload sent with the `memory` backend, in order. Test suites can
+inspect it instead of mocking the delivery, and should `clear()` it
+between tests.
+"""
+sent = []
+
+
+def clear():
+    del sent[:]
+
+
+class MemoryBackend(DispatchBackend):
+    """
+    Records the payloads in `catracking.backends.memory.sent` instead of
+    delivering them.
+    """
+
+    def send(self, payload_bucket, created=None):
+        sent.extend(
+            SentPayload(self.ident, self.tracker_class.ENDPOINT, payload)
+            for payload in payload_bucket)
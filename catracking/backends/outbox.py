@@ -0,0 +1,23 @@
+from catracking import outbox
+from catracking.backends.base import DispatchBackend
+
+
+class OutboxBackend(DispatchBackend):
+    """
+    Payloads are appended to the local outbox and shipped later by the
+    `drain_tracking_outbox` command, batching happens when it is drained.
+    The outbox only keeps when payloads were appended, which is logged as
+    the time they were enqueued.
+    """
+
+    @property
+    def outbox(self):
+        return outbox.get_outbox(
+            self.tracker_class.settings('OUTBOX_PATH'),
+            self.tracker_class.settings(
+                'OUTBOX_SYNCHRONOUS', outbox.DEFAULT_SYNCHRONOUS))
+
+    def send(self, payload_bucket, created=None):
+        if payload_bucket:
+            self.outbox.append(
+                self.ident, self.tracker_class.ENDPOINT, payload_bucket)
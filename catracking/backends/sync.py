@@ -0,0 +1,19 @@
+from time import time
+
+from catracking.backends.base import DispatchBackend
+from catracking.delivery import deliver_or_dead_letter
+
+
+class SyncBackend(DispatchBackend):
+    """
+    Delivers the payloads right away, inside the request. Payloads failing
+    with a server error or a connection failure are stored as dead
+    letters, so they never break the response (see
+    `delivery.deliver_or_dead_letter`).
+    """
+
+    def send(self, payload_bucket, created=None):
+        endpoint, payloads = self.timed_payloads(payload_bucket, created)
+        for payload, payload_created in payloads:
+            deliver_or_dead_letter(
+                self.ident, endpoint, payload, payload_created, time())
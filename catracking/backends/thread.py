@@ -0,0 +1,13 @@
+from catracking import sender
+from catracking.backends.base import DispatchBackend
+
+
+class ThreadBackend(DispatchBackend):
+    """
+    Payloads are delivered by a background thread of the current process,
+    batching happens in the thread.
+    """
+
+    def send(self, payload_bucket, created=None):
+        sender.get_sender(self.tracker_class).send(
+            self.tracker_class.ENDPOINT, payload_bucket, created)
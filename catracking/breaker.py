@@ -0,0 +1,105 @@
+import hashlib
+import logging
+import requests
+import threading
+
+from time import time
+
+from django.core.cache import caches
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLD = 5
+DEFAULT_WINDOW = 60
+DEFAULT_RESET_TIMEOUT = 30
+DEFAULT_CHECK_INTERVAL = 1
+DEFAULT_CACHE = 'default'
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+class CircuitOpenError(requests.RequestException):
+    """
+    Raised instead of sending a hit while the circuit breaker of its
+    endpoint is open. As a `RequestException`, it is handled like any
+    other delivery failure.
+    """
+    pass
+
+
+class CircuitBreaker(object):
+    """
+    Stops the deliveries to an endpoint after `threshold` failures (server
+    errors or connection failures) within `window` seconds, for
+    `reset_timeout` seconds. After that, the next hit is sent again, and a
+    new failure opens the circuit right away.
+
+    The state is kept in a django cache, so it is shared by every process
+    using the same cache (e.g. a file based cache per host, or memcached
+    for the whole fleet). Each process only reads the shared state once
+    every `check_interval` seconds, so the breaker adds no cache round trip
+    to most of the hits.
+    """
+
+    def __init__(self, key, threshold=DEFAULT_THRESHOLD,
+                 window=DEFAULT_WINDOW, reset_timeout=DEFAULT_RESET_TIMEOUT,
+                 check_interval=DEFAULT_CHECK_INTERVAL, cache=DEFAULT_CACHE):
+        digest = hashlib.md5(key.encode('utf-8')).hexdigest()
+        self.key = key
+        self.failures_key = 'catracking:breaker:failures:{}'.format(digest)
+        self.open_key = 'catracking:breaker:open:{}'.format(digest)
+        self.threshold = threshold
+        self.window = window
+        self.reset_timeout = reset_timeout
+        self.check_interval = check_interval
+        self.cache = caches[cache]
+        self.open_until = 0
+        self.checked_at = 0
+        self.failing = False
+
+    def allow(self):
+        now = time()
+        if now < self.open_until:
+            return False
+        if now - self.checked_at >= self.check_interval:
+            self.checked_at = now
+            open_until = self.cache.get(self.open_key)
+            if open_until and now < open_until:
+                self.open_until = open_until
+                return False
+        return True
+
+    def record_success(self):
+        if self.failing:
+            self.failing = False
+            self.cache.delete(self.failures_key)
+
+    def record_failure(self):
+        self.failing = True
+        self.cache.add(self.failures_key, 0, self.window)
+        try:
+            failures = self.cache.incr(self.failures_key)
+        except ValueError:
+            failures = 1
+            self.cache.set(self.failures_key, failures, self.window)
+        if failures >= self.threshold:
+            self.open_until = time() + self.reset_timeout
+            self.cache.set(self.open_key, self.open_until, self.reset_timeout)
+            logger.warning(
+                'Circuit breaker opened for tracker endpoint',
+                extra={'endpoint': self.key, 'failures': failures})
+
+
+def get_breaker(tracker_ident, endpoint, config):
+    key = (tracker_ident, endpoint)
+    with _breakers_lock:
+        if key not in _breakers:
+            _breakers[key] = CircuitBreaker(
+                endpoint,
+                config.get('BREAKER_THRESHOLD', DEFAULT_THRESHOLD),
+                config.get('BREAKER_WINDOW', DEFAULT_WINDOW),
+                config.get('BREAKER_RESET_TIMEOUT', DEFAULT_RESET_TIMEOUT),
+                config.get('BREAKER_CHECK_INTERVAL', DEFAULT_CHECK_INTERVAL),
+                config.get('BREAKER_CACHE', DEFAULT_CACHE))
+        return _breakers[key]
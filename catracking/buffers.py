@@ -0,0 +1,285 @@
+import atexit
+import logging
+import os
+import threading
+import zlib
+
+from time import (
+    sleep,
+    time)
+
+from django.db import (
+    DatabaseError,
+    connection,
+    transaction)
+from django.db.models import F
+from django.utils import timezone
+
+from catracking import instrumentation
+from catracking.models import (
+    TrackingRequest,
+    TrackingRequestSummary)
+from catracking.transport import tracker_settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZE = 1
+DEFAULT_AGE = 5
+DEFAULT_SAMPLE_RATE = 0.01
+
+"""
+Rows kept after failed writes are limited to this many times the size of
+the buffer, the oldest ones are dropped beyond that.
+"""
+BACKLOG_FACTOR = 10
+
+"""
+Seconds between two checks of the age of the buffers by the flusher
+thread.
+"""
+FLUSH_INTERVAL = 1
+
+LOG_POLICY_ALL = 'all'
+LOG_POLICY_FAILURES = 'failures'
+LOG_POLICY_SAMPLE = 'sample'
+LOG_POLICY_AGGREGATE = 'aggregate'
+
+_buffers = {}
+_buffers_lock = threading.Lock()
+_flusher = (None, None)
+
+
+class TrackingRequestBuffer(object):
+    """
+    Collects `TrackingRequest` rows in memory and writes them with a single
+    `bulk_create` once `size` rows were collected or the oldest row has been
+    waiting for more than `age` seconds. Thresholds are checked whenever a
+    row is added, and the age by a thread of the process (see
+    `start_flusher`), so rows are written on idle processes as well.
+
+    If writing the rows fails they are kept in the buffer, so they are
+    written again in the next flush. At most `size * BACKLOG_FACTOR` rows
+    are kept, the oldest ones are dropped.
+
+    Which hits are logged depends on the policy:
+        all: every hit is logged.
+        failures: only hits with a non 2xx response are logged.
+        sample: failures, plus a deterministic sample of the successful
+                hits, sized by `sample_rate`.
+        aggregate: failures, plus a per minute counter of every hit, by
+                   response code, kept in `TrackingRequestSummary`.
+                   Counters are written once they are `age` seconds old.
+    """
+
+    def __init__(self, size=DEFAULT_SIZE, age=DEFAULT_AGE,
+                 policy=LOG_POLICY_ALL, sample_rate=DEFAULT_SAMPLE_RATE,
+                 tracker_ident=None):
+        self.size = size
+        self.age = age
+        self.policy = policy
+        self.sample_rate = sample_rate
+        self.tracker_ident = tracker_ident
+        self.max_rows = size * BACKLOG_FACTOR
+        self.rows = []
+        self.oldest = None
+        self.counters = {}
+        self.oldest_counter = None
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def should_flush(self):
+        return len(self.rows) >= self.size or time() - self.oldest >= self.age
+
+    def sampled(self, payload):
+        """
+        The same hit is always either sampled or not, regardless of the
+        process logging it or of how many times it was sent, see
+        `Tracker.sample_key`.
+        """
+        from catracking.delivery import get_tracker_class
+        tracker_class = get_tracker_class(self.tracker_ident)
+        if tracker_class is not None:
+            payload = tracker_class.sample_key(payload)
+        checksum = zlib.crc32(payload.encode('utf-8')) & 0xffffffff
+        return checksum < self.sample_rate * 0x100000000
+
+    def log(self, **fields):
+        """
+        Logs a delivered hit according to the policy of the buffer.
+        """
+        if not 200 <= fields['response_code'] < 300:
+            self.add(**fields)
+        elif self.policy == LOG_POLICY_ALL:
+            self.add(**fields)
+        elif self.policy == LOG_POLICY_SAMPLE:
+            if self.sampled(fields['payload']):
+                self.add(**fields)
+        if self.policy == LOG_POLICY_AGGREGATE:
+            self.count(
+                fields['tracker'], fields['endpoint'], fields['response_code'])
+
+    def count(self, tracker, endpoint, response_code):
+        minute = timezone.now().replace(second=0, microsecond=0)
+        key = (tracker, endpoint, response_code, minute)
+        with self.lock:
+            if not self.counters:
+                self.oldest_counter = time()
+            self.counters[key] = self.counters.get(key, 0) + 1
+            if time() - self.oldest_counter >= self.age:
+                self._flush_counters()
+
+    def add(self, **fields):
+        fields.setdefault('created', timezone.now())
+        with self.lock:
+            if not self.rows:
+                self.oldest = time()
+            self.rows.append(TrackingRequest(**fields))
+            if self.should_flush():
+                self._flush()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+            self._flush_counters()
+
+    def flush_expired(self):
+        """
+        Writes the rows and counters that waited for more than `age`
+        seconds. Returns whether anything was written.
+        """
+        flushed = False
+        with self.lock:
+            now = time()
+            if self.rows and now - self.oldest >= self.age:
+                self._flush()
+                flushed = True
+            if self.counters and now - self.oldest_counter >= self.age:
+                self._flush_counters()
+                flushed = True
+        return flushed
+
+    def _flush(self):
+        if not self.rows:
+            return
+        rows, self.rows = self.rows, []
+        instrument = instrumentation.get_instrument(self.tracker_ident)
+        try:
+            with instrument.timer(instrumentation.LOG_INSERT):
+                TrackingRequest.objects.bulk_create(rows)
+        except DatabaseError:
+            logger.exception(
+                'Could not write tracking requests, retrying on next flush',
+                extra={'rows': len(rows)})
+            self.rows = rows + self.rows
+            self.oldest = time()
+            dropped = len(self.rows) - self.max_rows
+            if dropped > 0:
+                del self.rows[:dropped]
+                logger.warning(
+                    'Tracking request buffer is full, oldest rows dropped',
+                    extra={'rows': dropped})
+                instrument.count(instrumentation.DROPS, dropped)
+        else:
+            self.oldest = None
+            instrument.count(instrumentation.LOGGED, len(rows))
+
+    def _flush_counters(self):
+        if not self.counters:
+            return
+        counters, self.counters = self.counters, {}
+        try:
+            with transaction.atomic():
+                for key, count in counters.items():
+                    tracker, endpoint, response_code, minute = key
+                    summaries = TrackingRequestSummary.objects.filter(
+                        tracker=tracker, endpoint=endpoint,
+                        response_code=response_code, minute=minute)
+                    if not summaries.update(count=F('count') + count):
+                        TrackingRequestSummary.objects.create(
+                            tracker=tracker, endpoint=endpoint,
+                            response_code=response_code, minute=minute,
+                            count=count)
+        except DatabaseError:
+            logger.exception(
+                'Could not write tracking request summaries, '
+                'retrying on next flush', extra={'counters': len(counters)})
+            for key, count in counters.items():
+                self.counters[key] = self.counters.get(key, 0) + count
+            self.oldest_counter = time()
+        else:
+            self.oldest_counter = None
+
+
+def get_buffer(tracker_ident):
+    """
+    Returns the buffer of a tracker for the current process. Forked
+    processes start with an empty buffer instead of sharing the rows of
+    their parent.
+    """
+    pid = os.getpid()
+    with _buffers_lock:
+        buffer_pid, buffer = _buffers.get(tracker_ident, (None, None))
+        if buffer_pid != pid:
+            config = tracker_settings(tracker_ident)
+            buffer = TrackingRequestBuffer(
+                config.get('LOG_BUFFER_SIZE', DEFAULT_SIZE),
+                config.get('LOG_BUFFER_AGE', DEFAULT_AGE),
+                config.get('LOG_POLICY', LOG_POLICY_ALL),
+                config.get('LOG_SAMPLE_RATE', DEFAULT_SAMPLE_RATE),
+                tracker_ident)
+            _buffers[tracker_ident] = (pid, buffer)
+            if buffer.size > 1 or buffer.policy == LOG_POLICY_AGGREGATE:
+                start_flusher()
+        return buffer
+
+
+def flush_expired():
+    """
+    Writes the expired rows of every buffer of the current process, and
+    closes the database connection of the thread if it was used.
+    """
+    pid = os.getpid()
+    flushed = False
+    for buffer_pid, buffer in list(_buffers.values()):
+        if buffer_pid == pid:
+            flushed = buffer.flush_expired() or flushed
+    if flushed:
+        connection.close()
+
+
+def run_flusher():
+    while True:
+        sleep(FLUSH_INTERVAL)
+        try:
+            flush_expired()
+        except Exception:
+            logger.exception('Could not flush tracking request buffers')
+
+
+def start_flusher():
+    """
+    Starts the thread writing the expired rows of the buffers of the
+    current process, unless it is running. Threads do not survive a fork,
+    so forked processes start their own.
+    """
+    global _flusher
+    pid = os.getpid()
+    if _flusher[0] == pid:
+        return
+    thread = threading.Thread(
+        target=run_flusher, name='catracking-buffers')
+    thread.daemon = True
+    thread.start()
+    _flusher = (pid, thread)
+
+
+def flush_all():
+    pid = os.getpid()
+    for buffer_pid, buffer in list(_buffers.values()):
+        if buffer_pid == pid:
+            buffer.flush()
+
+
+atexit.register(flush_all)
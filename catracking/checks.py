@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.core.checks import (
+    Error,
+    Warning)
+
+from catracking.backends import DEFAULT_DISPATCH
+from catracking.breaker import DEFAULT_CACHE
+from catracking.core import get_config
+
+"""
+Cache backends keeping their values in each process, which can not share
+the state of the circuit breakers.
+"""
+LOCAL_CACHES = (
+    'django.core.cache.backends.dummy.DummyCache',
+    'django.core.cache.backends.locmem.LocMemCache',
+)
+
+"""
+Dispatch backends that do not deliver through celery, which
+`COMPILE_IN_WORKER` would bypass.
+"""
+NON_CELERY_DISPATCH = ('thread', 'sync', 'outbox', 'memory')
+
+
+def check_trackers(app_configs, **kwargs):
+    """
+    Reports the invalid tracker configurations and every missing required
+    key when django starts, instead of on the first request that needs it.
+    """
+    from catracking.middleware import TrackingMiddleware
+
+    errors = []
+    for ident, tracker_class in sorted(
+            TrackingMiddleware.TRACKERS_MAP.items()):
+        if ident not in getattr(settings, 'TRACKERS', {}):
+            continue
+        if not isinstance(settings.TRACKERS[ident], dict):
+            errors.append(Error(
+                'The {} tracker configuration must be a dict'.format(ident),
+                id='catracking.E001'))
+            continue
+        config = get_config(ident)
+        errors.extend(
+            Error(
+                'Missing {0} in {1} tracker configuration'.format(key, ident),
+                id='catracking.E002')
+            for key in tracker_class.REQUIRED_SETTINGS if key not in config)
+        if ('multiprocess' in config.get('INSTRUMENTATION', ()) and
+                not config.get('METRICS_DIR', None)):
+            errors.append(Error(
+                'The multiprocess instrumentation of the {} tracker '
+                'requires METRICS_DIR'.format(ident),
+                id='catracking.E003'))
+        dispatch = config.get('DISPATCH', DEFAULT_DISPATCH)
+        if (config.get('COMPILE_IN_WORKER', False) and
+                dispatch in NON_CELERY_DISPATCH):
+            errors.append(Error(
+                'COMPILE_IN_WORKER of the {0} tracker delivers through '
+                'celery, it can not be used with the {1} dispatch'.format(
+                    ident, dispatch),
+                id='catracking.E004'))
+        cache = config.get('BREAKER_CACHE', DEFAULT_CACHE)
+        if settings.CACHES.get(cache, {}).get('BACKEND') in LOCAL_CACHES:
+            errors.append(Warning(
+                'The circuit breaker of the {0} tracker uses the {1} cache, '
+                'which is not shared by the processes'.format(ident, cache),
+                hint='Set BREAKER_CACHE to a file based or shared cache.',
+                id='catracking.W001'))
+    return errors
@@ -1,3 +1,5 @@
+import functools
+import logging
 import six
 
 from abc import (
@@ -5,8 +7,17 @@ from abc import (
     abstractmethod)
 
 from django.conf import settings as django_settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 
-from catracking.tasks import SendTrackingDataTask
+from catracking import instrumentation
+from catracking.backends import get_backend
+
+logger = logging.getLogger(__name__)
+
+NOT_PROVIDED = object()
+
+_configs = {}
 
 
 class TrackerNotConfiguredError(Exception):
@@ -24,6 +35,65 @@ class MissingTrackerConfigurationError(Exception):
     pass
 
 
+class TrackerConfig(object):
+    """
+    Immutable snapshot of the configuration of a tracker, every key of the
+    configuration is available as an attribute.
+    """
+
+    def __init__(self, ident, values):
+        self.__dict__.update(values)
+        self.__dict__['_ident'] = ident
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Tracker configurations are immutable')
+
+    def __getattr__(self, name):
+        """
+        Only called for missing keys.
+        """
+        if name.startswith('_'):
+            raise AttributeError(name)
+        raise MissingTrackerConfigurationError(
+            'Missing {0} in {1} tracker configuration'.format(
+                name, self._ident))
+
+    def __contains__(self, key):
+        return not key.startswith('_') and key in self.__dict__
+
+    def get(self, key, default=NOT_PROVIDED):
+        if key in self:
+            return self.__dict__[key]
+        if default is NOT_PROVIDED:
+            return getattr(self, key)
+        return default
+
+
+def get_config(tracker_ident):
+    """
+    Returns the configuration snapshot of a tracker. It is built from the
+    `TRACKERS` setting when the app is ready, and again after the setting
+    changes.
+    """
+    try:
+        return _configs[tracker_ident]
+    except KeyError:
+        pass
+    try:
+        values = django_settings.TRACKERS[tracker_ident]
+    except (AttributeError, KeyError):
+        raise TrackerNotConfiguredError(
+            '{} tracker configuration does not exist'.format(tracker_ident))
+    config = _configs[tracker_ident] = TrackerConfig(tracker_ident, values)
+    return config
+
+
+@receiver(setting_changed)
+def reset_configs(setting, **kwargs):
+    if setting == 'TRACKERS':
+        _configs.clear()
+
+
 @six.add_metaclass(ABCMeta)
 class Tracker(object):
     """
@@ -31,7 +101,20 @@ class Tracker(object):
     The `send` function needs to be implemented in every tracker, that's
     the last thing the middleware calls in order to send the tracking data
     to the tracker endpoint.
+
+    Trackers that support a batch endpoint define `BATCH_ENDPOINT` and its
+    limits, so payloads can be packed together when `BATCH` is enabled in
+    the tracker configuration.
+
+    Keys listed in `REQUIRED_SETTINGS` are checked when django starts.
     """
+    REQUIRED_SETTINGS = ()
+    BATCH_ENDPOINT = None
+    BATCH_MAX_HITS = None
+    BATCH_MAX_BYTES = None
+    HIT_MAX_BYTES = None
+
+    _dispatches = None
 
     @abstractmethod
     def __init__(self):
@@ -57,22 +140,150 @@ class Tracker(object):
                 '{} tracker configuration does not exist'.format(cls.IDENT))
 
     @classmethod
-    def settings(cls, key):
+    def get_config(cls):
+        """
+        Returns the configuration snapshot of the tracker, see `TrackerConfig`.
+        """
+        return get_config(cls.IDENT)
+
+    @classmethod
+    def settings(cls, key, default=NOT_PROVIDED):
         """
         Returns a specific setting property of the tracker.
-        An error will be raised if the property is not defined.
+        An error will be raised if the property (or the tracker itself) is
+        not defined and no default was given.
+        """
+        try:
+            config = cls.get_config()
+        except TrackerNotConfiguredError:
+            if default is NOT_PROVIDED:
+                raise
+            return default
+        return config.get(key, default)
+
+    @classmethod
+    def batch_enabled(cls):
+        """
+        Batching is only possible for trackers with a batch endpoint and
+        needs to be turned on with `BATCH` in the tracker configuration.
+        """
+        return bool(cls.BATCH_ENDPOINT) and cls.settings('BATCH', False)
+
+    @classmethod
+    def pack(cls, items, payload=None):
+        """
+        Groups the items in lists that fit in a batch, respecting the
+        maximum number of hits and bytes of a batch. `payload` returns the
+        payload of an item, by default the item is the payload itself.
+
+        Payloads bigger than the maximum size of a hit would be discarded
+        by the tracker anyway, so they are dropped before being sent.
+        """
+        batch, batch_size = [], 0
+        for item in items:
+            item_payload = payload(item) if payload else item
+            size = len(item_payload)
+            if size > cls.HIT_MAX_BYTES:
+                logger.warning(
+                    'Hit exceeds the maximum size and will not be sent',
+                    extra={'tracker': cls.IDENT, 'payload': item_payload})
+                instrumentation.count(cls.IDENT, instrumentation.DROPS)
+                continue
+            if batch and (len(batch) == cls.BATCH_MAX_HITS or
+                          batch_size + 1 + size > cls.BATCH_MAX_BYTES):
+                yield batch
+                batch, batch_size = [], 0
+            batch_size += size + 1 if batch else size
+            batch.append(item)
+        if batch:
+            yield batch
+
+    @classmethod
+    def batches(cls, payload_bucket):
+        """
+        Packs the payloads into newline separated batches.
+        """
+        for batch in cls.pack(payload_bucket):
+            yield '\n'.join(batch)
+
+    @classmethod
+    def requeue(cls, payload, delay):
+        """
+        Prepares a payload to be sent again, `delay` seconds after it was
+        first sent. Trackers able to tell when a hit happened should
+        include the delay in it, or return `None` if it is too late for the
+        hit to be accepted.
+        """
+        return payload
+
+    @classmethod
+    def sample_key(cls, payload):
+        """
+        Returns the part of a payload that does not change when it is sent
+        again, which decides whether the `sample` log policy logs it.
+        Trackers adding random or time dependent parameters to their
+        payloads leave them out.
+        """
+        return payload
+
+    @classmethod
+    def backend(cls):
+        return get_backend(cls)
+
+    @classmethod
+    def instrument(cls):
+        """
+        Returns the instrument timing the stages of the tracker, see
+        `catracking.instrumentation`.
         """
+        return instrumentation.get_instrument(cls.IDENT)
+
+    def asend(self):
+        """
+        Awaitable `send`, for async views and middlewares (python 3 only).
+        The tracker is sent outside of the event loop, see `aio.send`.
+        """
+        from catracking import aio
+        return aio.send(self)
+
+    def dispatch(self, func, *args):
+        """
+        Calls `func` with `args`, the step of `send` handing the payloads
+        over (to the dispatch backend, to celery...). While the tracker is
+        compiled by `compile_dispatches`, the calls are collected instead.
+        """
+        if self._dispatches is None:
+            return func(*args)
+        self._dispatches.append(functools.partial(func, *args))
+
+    def compile_dispatches(self):
+        """
+        Runs `send` and returns the `dispatch` calls it made, without making
+        them, so `asend` compiles the hits and dispatches them in different
+        threads.
+        """
+        self._dispatches = []
         try:
-            return cls.base_settings()[key]
-        except KeyError:
-            raise MissingTrackerConfigurationError(
-                'Missing {0} in {1} tracker configuration'.format(
-                    key, cls.IDENT))
+            self.send()
+            return self._dispatches
+        finally:
+            self._dispatches = None
 
     @abstractmethod
-    def send(self, payload_bucket):
+    def send(self, payload_bucket, created=None):
+        """
+        Dispatches the payloads, with `created`, the list of their creation
+        timestamps, see `enqueue`.
+        """
+        self.dispatch(self.enqueue, payload_bucket, created)
+
+    def enqueue(self, payload_bucket, created=None):
         """
-        Instantiates a celery task for each payload in the bucket.
+        Hands the payloads to the dispatch backend of the tracker, chosen
+        with `DISPATCH` in the tracker configuration.
         """
-        for payload in payload_bucket:
-            SendTrackingDataTask().delay(self.IDENT, self.ENDPOINT, payload)
+        instrument = self.instrument()
+        with instrument.timer(instrumentation.ENQUEUE):
+            self.backend().send(payload_bucket, created)
+        if payload_bucket:
+            instrument.count(instrumentation.ENQUEUED, len(payload_bucket))
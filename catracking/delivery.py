@@ -0,0 +1,194 @@
+import logging
+import requests
+
+from datetime import datetime
+from time import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from catracking import (
+    buffers,
+    instrumentation,
+    transport)
+from catracking.models import TrackingDeadLetter
+
+logger = logging.getLogger(__name__)
+
+EXPIRED_DROP = 'drop'
+EXPIRED_DEAD_LETTER = 'dead_letter'
+DEFAULT_EXPIRED = EXPIRED_DROP
+EXPIRED_ERROR = 'Queue time limit exceeded'
+
+
+def creation_times(created, count):
+    """
+    Returns the creation timestamps of `count` payloads. `created` is
+    either a list with the timestamp of every payload, or a single one for
+    all of them, as sent by tasks queued before payloads carried their own.
+    """
+    if isinstance(created, (list, tuple)):
+        return list(created)
+    return [created] * count
+
+
+def earliest(timestamps):
+    timestamps = [timestamp for timestamp in timestamps if timestamp]
+    return min(timestamps) if timestamps else None
+
+
+def as_datetime(timestamp):
+    """
+    Returns the datetime of a timestamp, naive in the current time zone
+    when `USE_TZ` is disabled, as django stores it then.
+    """
+    value = datetime.fromtimestamp(timestamp, timezone.utc)
+    if settings.USE_TZ:
+        return value
+    return timezone.make_naive(value)
+
+
+def get_tracker_class(tracker_ident):
+    from catracking.middleware import TrackingMiddleware
+    return TrackingMiddleware.TRACKERS_MAP.get(tracker_ident)
+
+
+def expire(tracker_ident, endpoint, payloads):
+    """
+    Hands the hits queued for too long to be accepted by the tracker to its
+    `QUEUE_TIME_EXPIRED` policy: `drop` discards them and `dead_letter`
+    stores them as `TrackingDeadLetter`s. Either way, they are counted as
+    drops.
+    """
+    instrumentation.count(
+        tracker_ident, instrumentation.DROPS, len(payloads))
+    policy = transport.tracker_settings(tracker_ident).get(
+        'QUEUE_TIME_EXPIRED', DEFAULT_EXPIRED)
+    if policy == EXPIRED_DEAD_LETTER:
+        TrackingDeadLetter.objects.bulk_create([
+            TrackingDeadLetter(
+                tracker=tracker_ident, endpoint=endpoint, payload=payload,
+                attempts=0, error=EXPIRED_ERROR)
+            for payload in payloads])
+        return
+    logger.warning('Tracking hits expired in the queue', extra={
+        'tracker': tracker_ident, 'endpoint': endpoint,
+        'hits': len(payloads)})
+
+
+def requeue(tracker_ident, endpoint, payload, enqueued, now=None):
+    """
+    Returns the payload with the time it waited since it was `enqueued`
+    added to its hits, with `Tracker.requeue`, just before it is sent.
+    Batches hold one hit per line. Hits that are too old are handed to
+    `expire`, `None` is returned when none of them is left.
+    """
+    tracker_class = get_tracker_class(tracker_ident)
+    if enqueued is None or tracker_class is None:
+        return payload
+    delay = max(0, (time() if now is None else now) - enqueued)
+    if endpoint == tracker_class.BATCH_ENDPOINT:
+        hits = payload.splitlines()
+    else:
+        hits = [payload]
+    requeued, expired = [], []
+    for hit in hits:
+        requeued_hit = tracker_class.requeue(hit, delay)
+        if requeued_hit is None:
+            expired.append(hit)
+        else:
+            requeued.append(requeued_hit)
+    if expired:
+        expire(tracker_ident, endpoint, expired)
+    return '\n'.join(requeued) or None
+
+
+def delivery_fields(payload, created=None, enqueued=None, sent=None,
+                    round_trip=None):
+    """
+    Returns the delivery columns of the `TrackingRequest` of a payload.
+    `created` (when its first hit was created), `enqueued` and `sent` are
+    timestamps, the queue delay is the time between the last two.
+    """
+    return {
+        'hit_created': None if created is None else as_datetime(created),
+        'queue_delay': None if enqueued is None else max(0, sent - enqueued),
+        'round_trip': round_trip,
+        'payload_size': len(payload.encode('utf-8')),
+    }
+
+
+def post(tracker_ident, endpoint, payload):
+    """
+    Sends the payload with `transport.post`, timing the round trip.
+    Returns the response, when it was sent and the round trip, in seconds.
+    """
+    instrument = instrumentation.get_instrument(tracker_ident)
+    sent, started = time(), instrumentation.clock()
+    try:
+        response = transport.post(tracker_ident, endpoint, payload)
+    finally:
+        round_trip = instrumentation.clock() - started
+        instrument.timing(instrumentation.ROUND_TRIP, round_trip)
+    return response, sent, round_trip
+
+
+def deliver(tracker_ident, endpoint, payload, created=None, enqueued=None):
+    """
+    Sends a payload to the tracker endpoint and logs the delivery, the same
+    way `SendTrackingDataTask` does, for the deliveries that happen outside
+    of celery, counting its hits by response status. Returns the response
+    of the tracker.
+    """
+    response, sent, round_trip = post(tracker_ident, endpoint, payload)
+    instrument = instrumentation.get_instrument(tracker_ident)
+    hits = len(payload.splitlines())
+    instrument.status(response.status_code, hits)
+    if 200 <= response.status_code < 300:
+        instrument.count(instrumentation.DELIVERED, hits)
+    buffers.get_buffer(tracker_ident).log(
+        tracker=tracker_ident, endpoint=endpoint, payload=payload,
+        response_code=response.status_code, **delivery_fields(
+            payload, created, enqueued, sent, round_trip))
+    if not (200 <= response.status_code < 300):
+        logger.error('Bad response status from tracker', extra={
+            'tracker': tracker_ident, 'endpoint': endpoint,
+            'payload': payload})
+    return response
+
+
+def dead_letter(tracker_ident, endpoint, payload, attempts, error):
+    """
+    Stores a payload that could not be delivered as a `TrackingDeadLetter`,
+    counting its hits as drops.
+    """
+    instrumentation.count(
+        tracker_ident, instrumentation.DROPS, len(payload.splitlines()))
+    logger.error('Tracking data could not be delivered', extra={
+        'tracker': tracker_ident, 'endpoint': endpoint, 'payload': payload})
+    TrackingDeadLetter.objects.create(
+        tracker=tracker_ident, endpoint=endpoint, payload=payload,
+        attempts=attempts, error=str(error))
+
+
+def deliver_or_dead_letter(tracker_ident, endpoint, payload, created=None,
+                           enqueued=None):
+    """
+    Delivers a payload with `deliver`, for the dispatch backends that do
+    not retry (`sync` and `thread`). Payloads failing with a server error
+    or a connection failure (including an open circuit breaker) are handed
+    to `dead_letter` right away, as `SendTrackingDataTask` does once its
+    retries are exhausted.
+    """
+    try:
+        response = deliver(tracker_ident, endpoint, payload, created, enqueued)
+    except requests.RequestException as exc:
+        instrumentation.count(
+            tracker_ident, instrumentation.ROUND_TRIP_ERRORS)
+        dead_letter(tracker_ident, endpoint, payload, 1, exc)
+        return None
+    if response.status_code >= 500:
+        dead_letter(
+            tracker_ident, endpoint, payload, 1,
+            'Bad response status {}'.format(response.status_code))
+    return response
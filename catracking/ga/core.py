@@ -1,16 +1,76 @@
 import catracking.ga.parameters as parameters
+import logging
 import random
+import re
+import six
 import uuid
 
-from collections import OrderedDict
-from six.moves.urllib.parse import urlencode
+from six.moves.urllib.parse import (
+    parse_qsl,
+    quote_plus,
+    urlencode)
 from time import time
 
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    from collections import MutableMapping
+
 from django.utils.functional import cached_property
 
+from catracking import instrumentation
 from catracking.core import Tracker
 from catracking.ga.dimensions import CD25_US_GA_CLIENT_ID
 
+logger = logging.getLogger(__name__)
+
+QUOTED_KEYS_MAX = 10000
+
+RAW_TYPES = six.string_types + six.integer_types + (float,)
+
+PRODUCT_KEY = re.compile(r'^{}(\d+)(\D.*)$'.format(parameters.PRODUCT_PREFIX))
+
+"""
+Space left in a split hit for the cache buster, which is random.
+"""
+CACHE_BUSTER_SLACK = 5
+
+"""
+Parameters that change every time a hit is sent.
+"""
+VOLATILE_PARAMETERS = frozenset([
+    parameters.CACHE_BUSTER, parameters.QUEUE_TIME])
+
+_quoted_keys = {}
+
+
+def max_length(key):
+    """
+    Returns the maximum length of the parameter, or `None`.
+    """
+    limit = parameters.MAX_LENGTHS.get(key)
+    if limit is None:
+        limit = parameters.MAX_LENGTHS.get(key.rstrip('0123456789'))
+    return limit
+
+
+def truncate(key, value):
+    """
+    Cuts string values to the maximum length of the parameter, in bytes,
+    without splitting a character.
+    """
+    if not isinstance(value, six.string_types):
+        return value
+    limit = max_length(key)
+    if limit is None or len(value) * 4 <= limit:
+        return value
+    text = isinstance(value, six.text_type)
+    encoded = value.encode('utf-8') if text else value
+    if len(encoded) <= limit:
+        return value
+    truncated = encoded[:limit].decode('utf-8', 'ignore')
+    return truncated if text else truncated.encode('utf-8')
+
 
 class GoogleAnalyticsTracker(Tracker):
     """
@@ -19,7 +79,13 @@ class GoogleAnalyticsTracker(Tracker):
     request, the base structure of a hit should be the same.
     """
     IDENT = 'ga'
+    REQUIRED_SETTINGS = ('PROPERTY', 'DOCUMENT_HOSTNAME')
     ENDPOINT = 'https://www.google-analytics.com/collect'
+    BATCH_ENDPOINT = 'https://www.google-analytics.com/batch'
+    BATCH_MAX_HITS = 20
+    BATCH_MAX_BYTES = 16 * 1024
+    HIT_MAX_BYTES = 8 * 1024
+    QUEUE_TIME_MAX = 4 * 60 * 60 * 1000
 
     def __init__(self, request):
         super(GoogleAnalyticsTracker, self).__init__()
@@ -35,11 +101,50 @@ class GoogleAnalyticsTracker(Tracker):
         """
         random_string = str(uuid.uuid4().int % 2147483647)
         timestamp = str(int(time()))
-        hostname = GoogleAnalyticsTracker.settings('DOCUMENT_HOSTNAME')
+        hostname = GoogleAnalyticsTracker.get_config().DOCUMENT_HOSTNAME
         sections = len(hostname.replace('www.', '').split('.'))
         return 'GA1.{0}.{1}'.format(
             sections, '.'.join([random_string, timestamp]))
 
+    @classmethod
+    def requeue(cls, payload, delay):
+        """
+        Adds the delay to the queue time (`qt`) of the hit, so it is
+        attributed to the moment it happened. Measurement Protocol does not
+        process hits queued for more than 4 hours.
+        """
+        queue_time = int(delay * 1000)
+        if not queue_time:
+            return payload
+        values = parse_qsl(payload, keep_blank_values=True)
+        cache_buster = None
+        hit = []
+        for key, value in values:
+            if key == parameters.QUEUE_TIME:
+                queue_time += int(value)
+            elif key == parameters.CACHE_BUSTER:
+                cache_buster = value
+            else:
+                hit.append((key, value))
+        if queue_time > cls.QUEUE_TIME_MAX:
+            return None
+        hit.append((parameters.QUEUE_TIME, queue_time))
+        if cache_buster is not None:
+            hit.append((parameters.CACHE_BUSTER, cache_buster))
+        return urlencode(hit)
+
+    @classmethod
+    def sample_key(cls, payload):
+        """
+        Leaves out the cache buster (`z`), which is random, and the queue
+        time (`qt`), which grows every time the hit is sent.
+        """
+        return '\n'.join(
+            '&'.join(
+                token for token in hit.split('&')
+                if token.split('=', 1)[0] not in VOLATILE_PARAMETERS)
+            for hit in payload.splitlines())
+
     def get_root_chunk(self):
         if not self._root_chunk:
             self._root_chunk = RootHitChunk(self.request)
@@ -55,6 +160,17 @@ class GoogleAnalyticsTracker(Tracker):
         self.hits.append(event)
         return event
 
+    def emit(self, spec, action=None, label=None, value=None, **params):
+        """
+        Creates an event hit from an `EventSpec` of `catracking.ga.events`
+        and appends it to the hits pool. Custom dimensions and metrics are
+        given by parameter, e.g. `cd2='brand'`. An `EventSpecError` is
+        raised when the arguments do not match the spec.
+        """
+        event = spec.new_hit(action, label, value, **params)
+        self.hits.append(event)
+        return event
+
     def new_pageview(self):
         raise NotImplementedError('Pageview event is not implemented yet')
 
@@ -69,46 +185,321 @@ class GoogleAnalyticsTracker(Tracker):
         before merging the data.
         """
         compiled_hits = []
-        for hit in self.hits:
-            root_copy = self.get_root_chunk().copy()
-            root_copy.update(hit.compile())
-            compiled_hits.append(root_copy)
+        with self.instrument().timer(instrumentation.COMPILE):
+            for hit in self.hits:
+                root_copy = self.get_root_chunk().copy()
+                root_copy.update(hit.compile())
+                compiled_hits.append(root_copy)
         self.hits = compiled_hits
 
     def send(self):
-        self.compile_hits()
-        payload_bucket = [hit.encoded_url for hit in self.hits]
-        super(GoogleAnalyticsTracker, self).send(payload_bucket)
+        """
+        Hits are encoded with a `HitEncoder`, so the root chunk is only
+        encoded once for every hit of the request.
+
+        With `COMPILE_IN_WORKER`, hits are only described (see `describe`)
+        and a celery task compiles, encodes and sends them.
 
+        Every hit gets the time since its creation as queue time (`qt`),
+        hits older than `QUEUE_TIME_MAX` are not sent, see `expire_hits`.
+        """
+        instrument = self.instrument()
+        now = time()
+        self.expire_hits(now)
+        if self.settings('COMPILE_IN_WORKER', False):
+            if self.hits:
+                with instrument.timer(instrumentation.COMPILE):
+                    root, hits = self.describe(now)
+                self.dispatch(
+                    self.enqueue_described, root, hits, self.created(), now)
+            return
+        payload_bucket, created = [], []
+        if self.hits:
+            with instrument.timer(instrumentation.COMPILE):
+                root_chunk = self.get_root_chunk()
+                hits = [hit.compile() for hit in self.hits]
+            with instrument.timer(instrumentation.ENCODE):
+                encoder = HitEncoder(root_chunk, now)
+                for hit, hit_created in zip(hits, self.created()):
+                    payloads = self.fit(encoder, hit)
+                    payload_bucket.extend(payloads)
+                    created.extend([hit_created] * len(payloads))
+            instrument.count(instrumentation.HITS, len(payload_bucket))
+        super(GoogleAnalyticsTracker, self).send(payload_bucket, created)
+
+    def enqueue_described(self, root, hits, created, now):
+        """
+        Queues the hits described by `describe` in a `CompileTrackingDataTask`.
+        """
+        from catracking.tasks import CompileTrackingDataTask
+        instrument = self.instrument()
+        with instrument.timer(instrumentation.ENQUEUE):
+            CompileTrackingDataTask().delay(
+                self.IDENT, root, hits, created, now)
+        instrument.count(instrumentation.HITS, len(hits))
+        instrument.count(instrumentation.ENQUEUED, len(hits))
+
+    def created(self):
+        """
+        Returns the creation timestamp of every hit, `None` for the hits
+        that do not record it.
+        """
+        return [getattr(hit, 'created', None) for hit in self.hits]
 
-class BaseMeasurementProtocolHit(OrderedDict):
+    def expire_hits(self, now):
+        """
+        Removes the hits created more than `QUEUE_TIME_MAX` before `now`,
+        which would be ignored by Measurement Protocol, and hands them to
+        the `QUEUE_TIME_EXPIRED` policy of the tracker.
+        """
+        oldest = now - self.QUEUE_TIME_MAX / 1000.0
+        hits, expired = [], []
+        for hit in self.hits:
+            created = getattr(hit, 'created', None)
+            if created is not None and created < oldest:
+                expired.append(hit)
+            else:
+                hits.append(hit)
+        if not expired:
+            return
+        from catracking.delivery import expire
+        self.hits = hits
+        encoder = HitEncoder(self.get_root_chunk(), now)
+        expire(self.IDENT, self.ENDPOINT, [
+            encoder.encode(hit.compile()) for hit in expired])
+
+    def describe(self, now=None):
+        """
+        Returns the parameters of the root chunk and of every hit, with
+        their values as they were set, so they can be serialized and
+        encoded by `encode_description` somewhere else. With `now`, hits
+        include their queue time at that moment.
+        """
+        encoder = HitEncoder(self.get_root_chunk(), now)
+        described = []
+        for hit in self.hits:
+            items = hit.compile().raw_items()
+            queue_time = encoder.queue_time(hit)
+            if queue_time and parameters.QUEUE_TIME not in hit:
+                items.append((parameters.QUEUE_TIME, queue_time))
+            described.append(items)
+        return self.get_root_chunk().raw_items(), described
+
+    @classmethod
+    def encode_description(cls, root, hits):
+        """
+        Returns the payloads of hits described by `describe`.
+        """
+        return [
+            payload for payloads in cls.fit_description(root, hits)
+            for payload in payloads]
+
+    @classmethod
+    def fit_description(cls, root, hits):
+        """
+        Returns the payloads of every hit described by `describe`, see
+        `fit`.
+        """
+        encoder = HitEncoder(BaseMeasurementProtocolHit(root))
+        return [
+            cls.fit(encoder, BaseMeasurementProtocolHit(hit)) for hit in hits]
+
+    @classmethod
+    def fit(cls, encoder, hit):
+        """
+        Returns the payloads of a compiled hit: the hit itself, or the
+        hits it is split in when it is bigger than `HIT_MAX_BYTES` (see
+        `split`). Hits that still do not fit are rejected, as the tracker
+        would discard them.
+        """
+        payload = encoder.encode(hit)
+        if len(payload) <= cls.HIT_MAX_BYTES:
+            return [payload]
+        parts = cls.split(encoder, hit)
+        if parts is None:
+            logger.warning(
+                'Hit exceeds the maximum size and can not be split',
+                extra={'tracker': cls.IDENT, 'payload': payload})
+            cls.instrument().count(instrumentation.DROPS)
+            return []
+        return [encoder.encode(part) for part in parts]
+
+    @classmethod
+    def split(cls, encoder, hit):
+        """
+        Splits the products of a hit in hits with as many of them as fit in
+        `HIT_MAX_BYTES`, and at most `PRODUCTS_MAX`, re-indexed from 1.
+        Every hit repeats the rest of the parameters (event, transaction,
+        product action, queue time...), except the ones GA adds up, which
+        are only kept in the first one.
+
+        Returns `None` when the hit has no products, or when one of them
+        does not fit in a hit on its own.
+        """
+        context, products = [], {}
+        for key in hit._keys:
+            value = hit._values[key]
+            match = PRODUCT_KEY.match(key)
+            if match:
+                products.setdefault(int(match.group(1)), []).append(
+                    (match.group(2), value))
+            else:
+                context.append((key, value))
+        if not products:
+            return None
+        queue_time = encoder.queue_time(hit)
+        if queue_time and parameters.QUEUE_TIME not in hit:
+            context.append((parameters.QUEUE_TIME, queue_time))
+        first = BaseMeasurementProtocolHit(context)
+        rest = BaseMeasurementProtocolHit([
+            (key, value) for key, value in context
+            if not is_additive(key)])
+
+        budget = cls.HIT_MAX_BYTES - CACHE_BUSTER_SLACK
+        parts, current = [], []
+        size = len(encoder.encode(first))
+        for index in sorted(products):
+            product = product_chunk(len(current) + 1, products[index])
+            product_size = len(product.encode()) + 1
+            if current and (size + product_size > budget or
+                            len(current) == parameters.PRODUCTS_MAX):
+                parts.append(current)
+                current = []
+                size = len(encoder.encode(rest))
+                product = product_chunk(1, products[index])
+                product_size = len(product.encode()) + 1
+            if size + product_size > budget:
+                return None
+            current.append(product)
+            size += product_size
+        parts.append(current)
+
+        hits = []
+        for context_hit, part in zip([first] + [rest] * len(parts), parts):
+            split_hit = context_hit.copy()
+            for product in part:
+                split_hit.update(product)
+            hits.append(split_hit)
+        return hits
+
+
+def is_additive(key):
+    return key in parameters.ADDITIVE or (
+        key.startswith(parameters.CUSTOM_METRIC) and key[2:].isdigit())
+
+
+def product_chunk(index, params):
+    """
+    Returns a hit chunk with the parameters of a product at `index`.
+    """
+    prefix = '{0}{1}'.format(parameters.PRODUCT_PREFIX, index)
+    return BaseMeasurementProtocolHit([
+        (prefix + param, value) for param, value in params])
+
+
+class BaseMeasurementProtocolHit(MutableMapping):
     """
-    Base for any hit chunk. Adds more functionality to an OrderedDict.
+    Base for any hit chunk, an ordered mapping of Measurement Protocol
+    parameters.
+
+    Keys are kept in insertion order in `_keys` and their values, as they
+    were given, in `_values`. Values are only normalized when they are
+    read or encoded, see `normalize`.
     """
+    __slots__ = ('_keys', '_values')
+
+    RAW_PARAMETERS = frozenset([parameters.TRACKING_ID, parameters.USER_AGENT])
 
     def __init__(self, *args, **kwargs):
-        super(BaseMeasurementProtocolHit, self).__init__(*args, **kwargs)
+        self._keys = []
+        self._values = {}
+        super(BaseMeasurementProtocolHit, self).__init__()
+        if args or kwargs:
+            self.update(*args, **kwargs)
+
+    def normalize(self, key, value):
+        """
+        Values are sent as lowercase strings, except for the parameters in
+        `RAW_PARAMETERS`.
+        """
+        value = str(value)
+        if key in self.RAW_PARAMETERS:
+            return value
+        return value.lower()
 
     def __setitem__(self, key, value):
         """
         If the value being added to the dictionary is either `None` or an
-        empty string, the key should not exist.
+        empty string, the key should not exist. Strings longer than the
+        protocol allows for the parameter are truncated.
         """
         if not (value is None or value == ''):
-            value = str(value)
-            if key not in [parameters.TRACKING_ID, parameters.USER_AGENT]:
-                value = value.lower()
-            super(BaseMeasurementProtocolHit, self).__setitem__(
-                key, value)
+            value = truncate(key, value)
+            if key not in self._values:
+                self._keys.append(key)
+            self._values[key] = value
+
+    def __getitem__(self, key):
+        return self.normalize(key, self._values[key])
+
+    def __delitem__(self, key):
+        del self._values[key]
+        self._keys.remove(key)
+
+    def __contains__(self, key):
+        return key in self._values
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __repr__(self):
+        return '{0}({1!r})'.format(type(self).__name__, list(self.items()))
+
+    def update(self, *args, **kwargs):
+        """
+        Hit chunks are merged without normalizing their values, the other
+        mappings as `MutableMapping.update` does.
+        """
+        if len(args) == 1 and not kwargs and isinstance(
+                args[0], BaseMeasurementProtocolHit):
+            other = args[0]
+            keys, values = self._keys, self._values
+            for key in other._keys:
+                if key not in values:
+                    keys.append(key)
+                values[key] = other._values[key]
+        else:
+            super(BaseMeasurementProtocolHit, self).update(*args, **kwargs)
+
+    def raw_items(self):
+        """
+        Returns the parameters with their values as they were set, values
+        that can not be serialized as they are being converted to strings.
+        """
+        values = self._values
+        return [
+            (key, values[key] if isinstance(values[key], RAW_TYPES)
+             else str(values[key]))
+            for key in self._keys]
+
+    def items(self):
+        normalize = self.normalize
+        values = self._values
+        return [(key, normalize(key, values[key])) for key in self._keys]
 
     def copy(self):
         """
         When copying a hit chunk, the only thing that matters is its data, in
-        other words, its `items()`. This function gracelly overrides the
-        `OrderedDict` copy returning a base structure hit in any subclass
-        that copy was called.
+        other words, its `items()`. This function returns a base structure
+        hit in any subclass that copy was called.
         """
-        return BaseMeasurementProtocolHit(self.items())
+        copy = BaseMeasurementProtocolHit()
+        copy._keys = list(self._keys)
+        copy._values = dict(self._values)
+        return copy
 
     @property
     def encoded_url(self):
@@ -117,7 +508,32 @@ class BaseMeasurementProtocolHit(OrderedDict):
         Cache buster parameter should be the last in the querystring.
         """
         self[parameters.CACHE_BUSTER] = random.randint(1, 100000)
-        return urlencode(self)
+        return self.encode()
+
+    def encode(self, exclude=()):
+        """
+        Returns the querystring of the hit, without the parameters in
+        `exclude`. Values are normalized here, as `normalize` does, and the
+        quoted keys are cached, as hits use a small set of parameters.
+        """
+        quoted_keys = _quoted_keys
+        raw_parameters = self.RAW_PARAMETERS
+        values = self._values
+        fragments = []
+        for key in self._keys:
+            if key in exclude:
+                continue
+            try:
+                quoted_key = quoted_keys[key]
+            except KeyError:
+                quoted_key = quote_plus(str(key))
+                if len(quoted_keys) < QUOTED_KEYS_MAX:
+                    quoted_keys[key] = quoted_key
+            value = str(values[key])
+            if key not in raw_parameters:
+                value = value.lower()
+            fragments.append(quoted_key + '=' + quote_plus(value))
+        return '&'.join(fragments)
 
     def compile(self):
         """
@@ -139,12 +555,12 @@ class RootHitChunk(BaseMeasurementProtocolHit):
         self.request = request
         self[parameters.VERSION] = 1
         self[parameters.TRACKING_ID] = self.ga_property
+        self[parameters.DOCUMENT_HOSTNAME] = self.document_hostname
         self[parameters.CLIENT_ID] = self.client_id
         if self.user_id:
             self[parameters.USER_ID] = self.user_id
         self[parameters.USER_AGENT] = self.request.META.get(
             'HTTP_USER_AGENT', '')
-        self[parameters.DOCUMENT_HOSTNAME] = self.document_hostname
         self[CD25_US_GA_CLIENT_ID] = self.client_id
 
     @property
@@ -154,7 +570,7 @@ class RootHitChunk(BaseMeasurementProtocolHit):
         in our account that we are going to send the hits.
         Production and test/local environments currently have different ones.
         """
-        return GoogleAnalyticsTracker.settings('PROPERTY')
+        return GoogleAnalyticsTracker.get_config().PROPERTY
 
     @property
     def document_hostname(self):
@@ -164,7 +580,7 @@ class RootHitChunk(BaseMeasurementProtocolHit):
         and if we don't specify the document hostname, we can't identify
         what application sent it.
         """
-        return GoogleAnalyticsTracker.settings('DOCUMENT_HOSTNAME')
+        return GoogleAnalyticsTracker.get_config().DOCUMENT_HOSTNAME
 
     @property
     def client_id(self):
@@ -199,16 +615,93 @@ class RootHitChunk(BaseMeasurementProtocolHit):
             return 0
 
 
+class HitEncoder(object):
+    """
+    Encodes the hits of a request by concatenating encoded fragments,
+    instead of merging every hit into a copy of the root chunk and
+    encoding the result:
+
+    - the root parameters constant for the process (`PROCESS_PARAMETERS`),
+      encoded once per process.
+    - the rest of the root chunk, encoded once per request.
+    - the parameters of the hit itself.
+
+    With `now`, the time between the creation of each hit and `now` is
+    appended as queue time (`qt`). The cache buster is appended last. Hits
+    overriding a root parameter are merged with the root chunk, as
+    `compile_hits` does.
+    """
+    PROCESS_PARAMETERS = (
+        parameters.VERSION,
+        parameters.TRACKING_ID,
+        parameters.DOCUMENT_HOSTNAME)
+
+    _process_fragments = {}
+
+    def __init__(self, root_chunk, now=None):
+        self.root_chunk = root_chunk
+        self.now = now
+        self.prefix = '&'.join(fragment for fragment in (
+            self.process_fragment(root_chunk),
+            root_chunk.encode(exclude=self.PROCESS_PARAMETERS)) if fragment)
+
+    @classmethod
+    def process_fragment(cls, root_chunk):
+        values = tuple(root_chunk.get(key) for key in cls.PROCESS_PARAMETERS)
+        try:
+            return cls._process_fragments[values]
+        except KeyError:
+            fragment = cls._process_fragments[values] = urlencode([
+                (key, value)
+                for key, value in zip(cls.PROCESS_PARAMETERS, values)
+                if value is not None])
+            return fragment
+
+    def queue_time(self, hit):
+        """
+        Milliseconds between the creation of the hit and `now`, 0 when
+        either of them is unknown.
+        """
+        created = getattr(hit, 'created', None)
+        if created is None or self.now is None:
+            return 0
+        return max(0, int((self.now - created) * 1000))
+
+    def encode(self, hit):
+        queue_time = self.queue_time(hit)
+        if parameters.QUEUE_TIME in hit:
+            queue_time = 0
+        if any(key in self.root_chunk for key in hit):
+            merged = self.root_chunk.copy()
+            merged.update(hit)
+            if queue_time:
+                merged[parameters.QUEUE_TIME] = queue_time
+            return merged.encoded_url
+        fragments = [
+            self.prefix,
+            hit.encode(exclude=(parameters.CACHE_BUSTER,)),
+            '{0}={1}'.format(parameters.QUEUE_TIME, queue_time)
+            if queue_time else '',
+            '{0}={1}'.format(
+                parameters.CACHE_BUSTER, random.randint(1, 100000))]
+        return '&'.join(fragment for fragment in fragments if fragment)
+
+
 class HitProductsMixin(object):
     """
     Used whenever a hit chunk is able to contain products.
     For example, a custom event or a pageview.
+
+    Classes using it need `_transaction`, `_products` and `created` slots,
+    hits record the timestamp of their creation in `created`.
     """
+    __slots__ = ()
 
     def __init__(self):
         super(HitProductsMixin, self).__init__()
         self._transaction = None
         self._products = []
+        self.created = time()
 
     def new_transaction(self, id, affiliation=None, revenue=None):
         """
@@ -246,7 +739,7 @@ class HitProductsMixin(object):
 
 
 class PageViewHitChunk(HitProductsMixin, BaseMeasurementProtocolHit):
-    pass
+    __slots__ = ('_transaction', '_products', 'created')
 
 
 class EventHitChunk(HitProductsMixin, BaseMeasurementProtocolHit):
@@ -257,13 +750,24 @@ class EventHitChunk(HitProductsMixin, BaseMeasurementProtocolHit):
     Adds the base information required for an `event` hit type, any
     additional data can be appended to the object (custom dimensions, metrics)
     """
+    __slots__ = ('_transaction', '_products', 'created')
 
-    def __init__(self, category, action, label, value=0, non_interactive=0):
+    def __init__(self, category=None, action=None, label=None, value=0,
+                 non_interactive=0, normalized=None):
         """
         Events are non interactive by default, using `non_interactive=0`
         makes it interactive and will affect the bounce rate data
+
+        `normalized` takes the keys and values of event parameters already
+        validated and normalized (the static ones of an `EventSpec`), which
+        are used instead of the other arguments.
         """
         super(EventHitChunk, self).__init__()
+        if normalized is not None:
+            keys, values = normalized
+            self._keys = list(keys)
+            self._values = dict(values)
+            return
         self[parameters.HIT_TYPE] = parameters.HIT_TYPE_EVENT
         self[parameters.EVENT_CATEGORY] = category
         self[parameters.EVENT_ACTION] = action
@@ -279,6 +783,7 @@ class TransactionHitChunk(BaseMeasurementProtocolHit):
 
     Adds the information required for the `transaction` chunk in a hit.
     """
+    __slots__ = ()
 
     def __init__(self, id, affiliation=None, revenue=None):
         super(TransactionHitChunk, self).__init__()
@@ -288,11 +793,16 @@ class TransactionHitChunk(BaseMeasurementProtocolHit):
 
 
 class ProductHitChunk(BaseMeasurementProtocolHit):
+    """
+    Product parameters are prefixed with `pr<index>`.
+    """
+    __slots__ = ('index', 'prefix')
 
     def __init__(self, index, id=None, name=None, category=None, brand=None,
                  price=None, quantity=None):
         super(ProductHitChunk, self).__init__()
         self.index = index
+        self.prefix = 'pr{0}'.format(index)
         self[parameters.PRODUCT_ID] = id
         self[parameters.PRODUCT_NAME] = name
         self[parameters.PRODUCT_CATEGORY] = category
@@ -301,5 +811,14 @@ class ProductHitChunk(BaseMeasurementProtocolHit):
         self[parameters.PRODUCT_QUANTITY] = quantity
 
     def __setitem__(self, key, value):
-        key = 'pr{0}{1}'.format(self.index, key)
-        super(ProductHitChunk, self).__setitem__(key, value)
+        """
+        Values are truncated by the unprefixed parameter, and stored under
+        the prefixed one as `BaseMeasurementProtocolHit.__setitem__` does,
+        without truncating them again.
+        """
+        if not (value is None or value == ''):
+            value = truncate(key, value)
+            key = self.prefix + key
+            if key not in self._values:
+                self._keys.append(key)
+            self._values[key] = value
@@ -4,6 +4,10 @@ with proper docstring, explaining why was it created, possible values and when
 the event is triggered.
 
 """
+from catracking.ga import (
+    dimensions,
+    metrics)
+from catracking.ga.specs import EventSpec
 
 """
 Category for all events related to a brand interaction
@@ -161,3 +165,127 @@ Category for all events related to matching tool
 EVENT_CATEGORY_MATCHING_TOOL = 'matching tool'
 
 EVENT_ACTION_BRAND_CALL_ME_NOW = 'brand call me now'
+
+"""
+Custom dimensions describing the page and the user, carried by every event.
+
+"""
+PAGE_DIMENSIONS = (
+    dimensions.CD1_HS_USER_REGISTRATION,
+    dimensions.CD2_HS_PAGE_TYPE,
+    dimensions.CD3_HS_SITE_CATEGORY,
+    dimensions.CD5_HS_AUTHOR,
+    dimensions.CD7_HS_PAGE_VERSION,
+    dimensions.CD8_HS_SITE_VERSION,
+    dimensions.CD9_HS_RESP_DESIGN_BP,
+    dimensions.CD24_HS_USER_ID,
+    dimensions.CD53_HS_REFERRER_PAGE_TYPE,
+)
+
+"""
+Custom dimensions of the events of a lead, for the brand it was sent to.
+
+"""
+LEAD_DIMENSIONS = PAGE_DIMENSIONS + (
+    dimensions.CD36_HS_LEAD_TIMESTAMP,
+    dimensions.CD37_HS_LEAD_PAGE_TYPE,
+    dimensions.CD50_HS_BRAND_ID,
+    dimensions.CD57_HS_LEAD_TYPE,
+)
+
+"""
+Custom dimensions of the events of a form, describing why it failed.
+
+"""
+FORM_DIMENSIONS = PAGE_DIMENSIONS + (
+    dimensions.CD33_HS_ERROR_NAME,
+    dimensions.CD34_HS_ERROR_CODE,
+    dimensions.CD35_HS_ERROR_SPECIFICS,
+)
+
+"""
+Custom dimensions and metrics of the events of the matching tool wizard.
+
+"""
+WIZARD_DIMENSIONS = LEAD_DIMENSIONS + (
+    dimensions.CD38_HS_WIZ_NUMBER_STEPS,
+    dimensions.CD39_HS_WIZ_CURRENT_STEP,
+    dimensions.CD40_HS_WIZ_QUEST_STEP,
+    dimensions.CD41_HS_WIZ_ANSWER_TYPE,
+    dimensions.CD42_HS_WIZ_NUMBER_AVAIL_ANSW,
+    dimensions.CD43_HS_WIZ_START,
+    dimensions.CD44_HS_WIZ_QUEST_SERVED,
+    dimensions.CD45_HS_WIZ_QUEST_ANSWER,
+    dimensions.CD46_HS_WIZ_QUEST_ANSWERED,
+    dimensions.CD47_HS_WIZ_OUTCOME,
+    dimensions.CD48_HS_WIZ_NOF_BRANDS_MATCHED,
+    dimensions.CD49_HS_WIZ_RESULT_DELIVERED,
+    dimensions.CD51_HS_WIZ_CATEGORY,
+    dimensions.CD52_HS_WIZ_VERSION,
+)
+WIZARD_METRICS = (
+    metrics.CM25_HS_WIZ_NUMBER_STEPS,
+    metrics.CM26_HS_WIZ_CURRENT_STEP,
+    metrics.CM27_HS_WIZ_QUEST_TEXT,
+    metrics.CM28_HS_WIZ_ANSWER_TYPE,
+    metrics.CM29_HS_WIZ_NUMBER_AVAIL_ANSW,
+    metrics.CM30_HS_WIZ_START,
+    metrics.CM31_HS_WIZ_QUEST_SERVED,
+    metrics.CM32_HS_WIZ_QUEST_ANSWER,
+    metrics.CM33_HS_WIZ_QUESTION_ANSWERED,
+    metrics.CM34_HS_WIZ_OUTCOME,
+    metrics.CM35_HS_WIZ_NOF_BRANDS_MATCHED,
+    metrics.CM36_HS_WIZ_RESULT_DELIVERED,
+)
+
+"""
+Specs of the events above, to be sent with `GoogleAnalyticsTracker.emit`.
+e.g.: `tracker.emit(events.VERIFIED_LEAD, action=campaign, label='click')`
+
+"""
+SUBMIT_LEAD = EventSpec(
+    'submit lead', EVENT_CATEGORY_BRAND_INTERACTION, EVENT_ACTION_SUBMIT_LEAD,
+    dimensions=LEAD_DIMENSIONS, metrics=())
+
+VERIFIED_LEAD = EventSpec(
+    'verified lead', EVENT_CATEGORY_VERIFIED_LEAD,
+    labels=(EVENT_LABEL_CLICK, EVENT_LABEL_CALL, EVENT_LABEL_FORM),
+    dimensions=LEAD_DIMENSIONS, metrics=())
+
+LOGIN = EventSpec(
+    'login', EVENT_CATEGORY_ACCOUNT, EVENT_ACTION_LOGIN,
+    labels=('fail', 'success'), dimensions=FORM_DIMENSIONS, metrics=())
+SOCIAL_LOGIN = EventSpec(
+    'social login', EVENT_CATEGORY_ACCOUNT, EVENT_ACTION_SOCIAL_LOGIN,
+    labels=('fail', 'success'), dimensions=FORM_DIMENSIONS, metrics=())
+REGISTRATION = EventSpec(
+    'registration', EVENT_CATEGORY_ACCOUNT, EVENT_ACTION_REGISTRATION,
+    labels=('fail', 'success'), dimensions=FORM_DIMENSIONS, metrics=())
+SOCIAL_REGISTRATION = EventSpec(
+    'social registration', EVENT_CATEGORY_ACCOUNT,
+    EVENT_ACTION_SOCIAL_REGISTRATION, labels=('fail', 'success'),
+    dimensions=FORM_DIMENSIONS, metrics=())
+PASSWORD_REQUEST = EventSpec(
+    'password request', EVENT_CATEGORY_ACCOUNT, EVENT_ACTION_PASSWORD_REQUEST,
+    labels=('fail', 'success'), dimensions=FORM_DIMENSIONS, metrics=())
+PASSWORD_CHANGE = EventSpec(
+    'password change', EVENT_CATEGORY_ACCOUNT, EVENT_ACTION_PASSWORD_CHANGE,
+    labels=('fail', 'success'), dimensions=FORM_DIMENSIONS, metrics=())
+
+AFFILIATE = EventSpec(
+    'affiliate', EVENT_CATEGORY_AFFILIATE_EVENT,
+    dimensions=PAGE_DIMENSIONS + (dimensions.CD50_HS_BRAND_ID,), metrics=())
+
+PDF_DOWNLOAD = EventSpec(
+    'pdf download', EVENT_CATEGORY_PDF_DOWNLAOD, dimensions=PAGE_DIMENSIONS,
+    metrics=())
+
+SUBMIT_APPLICATION = EventSpec(
+    'submit application', EVENT_CATEGORY_CAREERS,
+    EVENT_ACTION_SUBMIT_APPLICATION, labels=('fail', 'success'),
+    dimensions=FORM_DIMENSIONS, metrics=())
+
+BRAND_CALL_ME_NOW = EventSpec(
+    'brand call me now', EVENT_CATEGORY_MATCHING_TOOL,
+    EVENT_ACTION_BRAND_CALL_ME_NOW, dimensions=WIZARD_DIMENSIONS,
+    metrics=WIZARD_METRICS)
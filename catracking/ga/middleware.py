@@ -35,6 +35,6 @@ class GoogleAnalyticsCookieMiddleware(MiddlewareMixin):
             response.set_cookie(
                 COOKIE_NAME,
                 request.session.pop('ga_cookie'),
-                domain=GoogleAnalyticsTracker.settings('COOKIE_DOMAIN'),
+                domain=GoogleAnalyticsTracker.get_config().COOKIE_DOMAIN,
                 expires=arrow.utcnow().shift(years=+2).datetime)
         return response
@@ -19,10 +19,15 @@ EVENT_VALUE = 'ev'
 EVENT_NON_INTERACTIVE = 'ni'
 HIT_TYPE_EVENT = 'event'
 DOCUMENT_HOSTNAME = 'dh'
+DOCUMENT_LOCATION = 'dl'
+DOCUMENT_PATH = 'dp'
+DOCUMENT_TITLE = 'dt'
+DOCUMENT_REFERRER = 'dr'
 TRANSACTION_ID = 'ti'
 TRANSACTION_AFFILIATION = 'ta'
 TRANSACTION_REVENUE = 'tr'
 TRANSACTION_TAX = 'tt'
+TRANSACTION_SHIPPING = 'ts'
 PRODUCT_ACTION = 'pa'
 PRODUCT_ID = 'id'
 PRODUCT_NAME = 'nm'
@@ -32,4 +37,45 @@ PRODUCT_VARIANT = 'va'
 PRODUCT_POSITION = 'ps'
 PRODUCT_PRICE = 'pr'
 PRODUCT_QUANTITY = 'qt'
+QUEUE_TIME = 'qt'
 CACHE_BUSTER = 'z'
+CUSTOM_DIMENSION = 'cd'
+CUSTOM_METRIC = 'cm'
+
+PRODUCT_PREFIX = 'pr'
+PRODUCTS_MAX = 200
+
+"""
+Maximum length, in bytes, of the values of the parameters. Product
+parameters are given without their `pr<index>` prefix, and indexed
+parameters (custom dimensions) without their index.
+"""
+MAX_LENGTHS = {
+    DOCUMENT_HOSTNAME: 100,
+    DOCUMENT_LOCATION: 2048,
+    DOCUMENT_PATH: 2048,
+    DOCUMENT_TITLE: 1500,
+    DOCUMENT_REFERRER: 2048,
+    EVENT_CATEGORY: 150,
+    EVENT_ACTION: 500,
+    EVENT_LABEL: 500,
+    TRANSACTION_ID: 500,
+    TRANSACTION_AFFILIATION: 500,
+    PRODUCT_ID: 500,
+    PRODUCT_NAME: 500,
+    PRODUCT_CATEGORY: 500,
+    PRODUCT_BRAND: 500,
+    PRODUCT_VARIANT: 500,
+    CUSTOM_DIMENSION: 150,
+}
+
+"""
+Parameters added up by Google Analytics, which can not be repeated when a
+hit is split.
+"""
+ADDITIVE = frozenset([
+    EVENT_VALUE,
+    TRANSACTION_REVENUE,
+    TRANSACTION_TAX,
+    TRANSACTION_SHIPPING,
+])
@@ -0,0 +1,135 @@
+"""
+Declarative specs for the events of `catracking.ga.events`.
+
+An `EventSpec` declares the category and action of an event, its allowed
+labels and the custom dimensions and metrics it carries. The static part
+of the event is normalized and encoded once, when the spec is created, and
+`GoogleAnalyticsTracker.emit` validates the arguments of every event
+before it is added to the tracker.
+"""
+from numbers import Number
+
+from six.moves.urllib.parse import urlencode
+
+from catracking.ga import (
+    dimensions,
+    metrics,
+    parameters)
+from catracking.ga.core import EventHitChunk
+
+
+def catalog(module, prefix):
+    """
+    Returns the parameters defined in `dimensions` or `metrics` that can
+    be sent in a hit, product scoped ones are sent within products.
+    """
+    return frozenset(
+        value for name, value in vars(module).items()
+        if name.startswith(prefix) and '_PS_' not in name)
+
+
+HIT_DIMENSIONS = catalog(dimensions, 'CD')
+HIT_METRICS = catalog(metrics, 'CM')
+
+
+class EventSpecError(ValueError):
+    """
+    Raised when a spec is invalid, or when an event does not match its spec.
+    """
+    pass
+
+
+class EventSpec(object):
+    """
+    Spec of an event. `action` and `labels` are left to `None` when they
+    are dynamic, and `dimensions` and `metrics` to `None` to allow every
+    hit scoped custom dimension and metric.
+    """
+
+    def __init__(self, name, category, action=None, labels=None,
+                 dimensions=None, metrics=None, non_interactive=1, value=0):
+        self.name = name
+        self.category = category
+        self.action = action
+        self.labels = None if labels is None else frozenset(
+            str(label).lower() for label in labels)
+        self.dimensions = self.validate_catalog(
+            dimensions, HIT_DIMENSIONS, 'dimension')
+        self.metrics = self.validate_catalog(metrics, HIT_METRICS, 'metric')
+
+        static = EventHitChunk(category, action, None, value, non_interactive)
+        self.keys = tuple(static)
+        self.static = frozenset(self.keys)
+        self.values = dict(static.items())
+        self.fragment = urlencode(static.items())
+
+    def __repr__(self):
+        return 'EventSpec({!r})'.format(self.name)
+
+    @staticmethod
+    def validate_catalog(declared, allowed, kind):
+        if declared is None:
+            return allowed
+        unknown = set(declared) - allowed
+        if unknown:
+            raise EventSpecError('Unknown custom {0} {1}'.format(
+                kind, ', '.join(sorted(unknown))))
+        return frozenset(declared)
+
+    def validate(self, action, label, params):
+        if (self.action is None) == (action is None):
+            raise EventSpecError(
+                'Event {0} {1} an action'.format(
+                    self.name,
+                    'requires' if self.action is None else 'does not take'))
+        if self.labels is not None and str(label).lower() not in self.labels:
+            raise EventSpecError(
+                'Invalid label {0!r} for event {1}'.format(label, self.name))
+        for key, value in params.items():
+            if key in self.metrics:
+                if not isinstance(value, Number) or isinstance(value, bool):
+                    raise EventSpecError(
+                        'Metric {0} of event {1} must be a number'.format(
+                            key, self.name))
+            elif key not in self.dimensions:
+                raise EventSpecError(
+                    'Event {0} does not carry {1}'.format(self.name, key))
+
+    def new_hit(self, action=None, label=None, value=None, **params):
+        """
+        Validates the arguments and returns the event hit.
+        """
+        self.validate(action, label, params)
+        hit = SpecEventHitChunk(self)
+        hit[parameters.EVENT_ACTION] = action
+        hit[parameters.EVENT_LABEL] = label
+        hit[parameters.EVENT_VALUE] = value
+        for key, param in params.items():
+            hit[key] = param
+        return hit
+
+
+class SpecEventHitChunk(EventHitChunk):
+    """
+    Event hit created from an `EventSpec`. It starts with the normalized
+    static parameters of the spec, which are encoded with the fragment of
+    the spec as long as they were not changed.
+    """
+    __slots__ = ('spec',)
+
+    def __init__(self, spec):
+        super(SpecEventHitChunk, self).__init__(
+            normalized=(spec.keys, spec.values))
+        self.spec = spec
+
+    def encode(self, exclude=()):
+        spec = self.spec
+        values = self._values
+        if any(key in exclude or values.get(key) is not spec.values[key]
+               for key in spec.keys):
+            return super(SpecEventHitChunk, self).encode(exclude)
+        dynamic = super(SpecEventHitChunk, self).encode(
+            spec.static.union(exclude) if exclude else spec.static)
+        if dynamic:
+            return spec.fragment + '&' + dynamic
+        return spec.fragment
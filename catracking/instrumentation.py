@@ -0,0 +1,322 @@
+"""
+Timers and counters for the stages of the tracking pipeline.
+
+Instrumentation is enabled per tracker with `INSTRUMENTATION`, the list of
+sinks that receive the measurements: `signal`, `logging`, `memory` or the
+path to a custom `Sink`. Trackers without sinks get a `NullInstrument`,
+whose timers do nothing, so disabled instrumentation costs a dictionary
+lookup per stage.
+"""
+import logging
+import math
+import threading
+
+from collections import deque
+
+from django.core.signals import setting_changed
+from django.dispatch import (
+    Signal,
+    receiver)
+from django.utils.module_loading import import_string
+
+try:
+    from time import perf_counter as clock
+except ImportError:  # python 2
+    from time import time as clock
+
+logger = logging.getLogger(__name__)
+
+INSTANTIATE = 'instantiate'
+COMPILE = 'compile'
+ENCODE = 'encode'
+ENQUEUE = 'enqueue'
+ROUND_TRIP = 'round_trip'
+LOG_INSERT = 'log_insert'
+
+HITS = 'hits'
+ENQUEUED = 'hits_enqueued'
+DELIVERED = 'hits_delivered'
+RETRIES = 'retries'
+DROPS = 'drops'
+ROUND_TRIP_ERRORS = 'round_trip_errors'
+LOGGED = 'logged'
+
+MEMORY_SAMPLES = 1000
+PERCENTILES = (50, 90, 99)
+
+SINKS = {
+    'signal': 'catracking.instrumentation.SignalSink',
+    'logging': 'catracking.instrumentation.LoggingSink',
+    'memory': 'catracking.instrumentation.MemorySink',
+    'multiprocess': 'catracking.multiprocess.MultiprocessSink',
+}
+
+"""
+Sent by the `signal` sink, with the `tracker` ident as sender and the
+`stage` and its `duration` in seconds.
+"""
+stage_timed = Signal()
+
+"""
+Sent by the `signal` sink, with the `tracker` ident as sender and the
+`name` and `value` of the counter.
+"""
+counted = Signal()
+
+_instruments = {}
+
+
+@receiver(setting_changed)
+def reset_instruments(setting, **kwargs):
+    if setting == 'TRACKERS':
+        _instruments.clear()
+
+
+class Sink(object):
+    """
+    Receives the measurements of the trackers using it.
+    """
+
+    def timing(self, tracker_ident, stage, duration):
+        pass
+
+    def count(self, tracker_ident, name, value):
+        pass
+
+    def status(self, tracker_ident, status_code, value):
+        """
+        Receives the status code of every response of the tracker, with
+        the number of hits it answered, counted as `status_<code>` unless
+        the sink handles it.
+        """
+        self.count(tracker_ident, 'status_{}'.format(status_code), value)
+
+
+class SignalSink(Sink):
+    """
+    Publishes the measurements with the `stage_timed` and `counted`
+    signals.
+    """
+
+    def timing(self, tracker_ident, stage, duration):
+        stage_timed.send(tracker_ident, stage=stage, duration=duration)
+
+    def count(self, tracker_ident, name, value):
+        counted.send(tracker_ident, name=name, value=value)
+
+
+class LoggingSink(Sink):
+    """
+    Logs the measurements to `catracking.instrumentation`, at debug level.
+    """
+
+    def timing(self, tracker_ident, stage, duration):
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                '%s %s took %.3fms', tracker_ident, stage, duration * 1000,
+                extra={'tracker': tracker_ident, 'stage': stage,
+                       'duration': duration})
+
+    def count(self, tracker_ident, name, value):
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                '%s %s +%s', tracker_ident, name, value,
+                extra={'tracker': tracker_ident, 'counter': name,
+                       'value': value})
+
+
+class Aggregator(object):
+    """
+    Keeps, in memory, the number and total duration of the timings of each
+    stage, the last `samples` durations for the percentiles, and the
+    counters.
+    """
+
+    def __init__(self, samples=MEMORY_SAMPLES):
+        self.samples = samples
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.timings = {}
+            self.counters = {}
+
+    def add_timing(self, tracker_ident, stage, duration):
+        key = (tracker_ident, stage)
+        with self.lock:
+            try:
+                timing = self.timings[key]
+            except KeyError:
+                timing = self.timings[key] = [
+                    0, 0.0, deque(maxlen=self.samples)]
+            timing[0] += 1
+            timing[1] += duration
+            timing[2].append(duration)
+
+    def add_count(self, tracker_ident, name, value):
+        key = (tracker_ident, name)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def count(self, tracker_ident, name):
+        return self.counters.get((tracker_ident, name), 0)
+
+    @staticmethod
+    def percentile(durations, percent):
+        """
+        Nearest rank percentile of sorted durations.
+        """
+        rank = int(math.ceil(percent / 100.0 * len(durations)))
+        return durations[max(0, min(rank, len(durations)) - 1)]
+
+    def summary(self, percentiles=PERCENTILES):
+        """
+        Returns the timings of every stage by tracker, with their count,
+        mean, maximum and percentiles (`p50`, ...) of the kept samples.
+        """
+        with self.lock:
+            timings = [
+                (key, count, total, sorted(durations))
+                for key, (count, total, durations) in self.timings.items()]
+        summary = {}
+        for (tracker_ident, stage), count, total, durations in timings:
+            stats = {
+                'count': count,
+                'mean': total / count,
+                'max': durations[-1],
+            }
+            for percent in percentiles:
+                stats['p{}'.format(percent)] = self.percentile(
+                    durations, percent)
+            summary.setdefault(tracker_ident, {})[stage] = stats
+        return summary
+
+
+"""
+Measurements received by the `memory` sink in the current process.
+"""
+aggregator = Aggregator()
+
+
+class MemorySink(Sink):
+    """
+    Adds the measurements to `catracking.instrumentation.aggregator`.
+    """
+
+    def timing(self, tracker_ident, stage, duration):
+        aggregator.add_timing(tracker_ident, stage, duration)
+
+    def count(self, tracker_ident, name, value):
+        aggregator.add_count(tracker_ident, name, value)
+
+
+class Timer(object):
+    """
+    Times the block it wraps, with a monotonic clock.
+    """
+    __slots__ = ('instrument', 'stage', 'start')
+
+    def __init__(self, instrument, stage):
+        self.instrument = instrument
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = clock()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.instrument.timing(self.stage, clock() - self.start)
+
+
+class NullTimer(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+NULL_TIMER = NullTimer()
+
+
+class Instrument(object):
+    """
+    Publishes the measurements of a tracker to its sinks.
+    """
+    enabled = True
+
+    def __init__(self, tracker_ident, sinks):
+        self.tracker_ident = tracker_ident
+        self.sinks = sinks
+
+    def timer(self, stage):
+        return Timer(self, stage)
+
+    def timing(self, stage, duration):
+        for sink in self.sinks:
+            sink.timing(self.tracker_ident, stage, duration)
+
+    def count(self, name, value=1):
+        for sink in self.sinks:
+            sink.count(self.tracker_ident, name, value)
+
+    def status(self, status_code, value=1):
+        for sink in self.sinks:
+            sink.status(self.tracker_ident, status_code, value)
+
+
+class NullInstrument(object):
+    """
+    Instrument of the trackers without sinks.
+    """
+    enabled = False
+
+    def timer(self, stage):
+        return NULL_TIMER
+
+    def timing(self, stage, duration):
+        pass
+
+    def count(self, name, value=1):
+        pass
+
+    def status(self, status_code, value=1):
+        pass
+
+
+NULL_INSTRUMENT = NullInstrument()
+
+
+def build_instrument(tracker_ident):
+    from catracking.transport import tracker_settings
+
+    sinks = [
+        import_string(SINKS.get(sink, sink))()
+        for sink in tracker_settings(tracker_ident).get('INSTRUMENTATION', ())]
+    if not sinks:
+        return NULL_INSTRUMENT
+    return Instrument(tracker_ident, sinks)
+
+
+def get_instrument(tracker_ident):
+    """
+    Returns the instrument of a tracker, built once from its configuration
+    and again after the `TRACKERS` setting changes.
+    """
+    try:
+        return _instruments[tracker_ident]
+    except KeyError:
+        instrument = _instruments[tracker_ident] = build_instrument(
+            tracker_ident)
+        return instrument
+
+
+def timer(tracker_ident, stage):
+    return get_instrument(tracker_ident).timer(stage)
+
+
+def count(tracker_ident, name, value=1):
+    get_instrument(tracker_ident).count(name, value)
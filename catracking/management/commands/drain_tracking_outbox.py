@@ -0,0 +1,120 @@
+import requests
+
+from time import (
+    sleep,
+    time)
+
+from django.core.management.base import BaseCommand
+
+from catracking import (
+    buffers,
+    delivery)
+from catracking.backends.outbox import OutboxBackend
+from catracking.middleware import TrackingMiddleware
+
+
+class Command(BaseCommand):
+    """
+    Ships the payloads appended to the local outbox by trackers using the
+    `outbox` dispatch, packing them in batches when the tracker supports it.
+
+    Payloads are removed from the outbox once the tracker endpoint answers
+    with a status lower than 500. Server errors and connection failures
+    leave them in the outbox, to be shipped again in the next round.
+    """
+    help = 'Ships the payloads of the local tracking outbox to the trackers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, default=500,
+            help='Payloads read from the outbox at a time, per tracker.')
+        parser.add_argument(
+            '--interval', type=float, default=1,
+            help='Seconds to wait when there is nothing to ship.')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Drains the outbox once and exits.')
+
+    def trackers(self):
+        return [
+            tracker_class
+            for tracker_class in TrackingMiddleware.TRACKERS_MAP.values()
+            if tracker_class.is_active() and
+            isinstance(tracker_class.backend(), OutboxBackend)]
+
+    def deliver(self, tracker_class, endpoint, payload, enqueued=None):
+        """
+        Returns whether the payload was acknowledged by the tracker.
+        """
+        try:
+            response = delivery.deliver(
+                tracker_class.IDENT, endpoint, payload, enqueued=enqueued)
+        except requests.RequestException:
+            return False
+        return response.status_code < 500
+
+    def requeue(self, tracker_class, rows):
+        """
+        Adds the time the rows waited in the outbox to their hits. Rows
+        too old to be sent are acknowledged, as they will never be.
+        """
+        now, requeued, expired = time(), [], []
+        for id, endpoint, payload, created in rows:
+            payload = delivery.requeue(
+                tracker_class.IDENT, endpoint, payload, created, now)
+            if payload is None:
+                expired.append(id)
+            else:
+                requeued.append((id, endpoint, payload, created))
+        if expired:
+            tracker_class.backend().outbox.acknowledge(expired)
+        return requeued
+
+    def ship(self, tracker_class, rows):
+        """
+        Sends the outbox rows and acknowledges the ones that were delivered.
+        Returns whether every row was acknowledged.
+        """
+        outbox = tracker_class.backend().outbox
+        rows = self.requeue(tracker_class, rows)
+        if tracker_class.batch_enabled():
+            shipped = set()
+            for batch in tracker_class.pack(rows, lambda row: row[2]):
+                payload = '\n'.join(row[2] for row in batch)
+                if not self.deliver(
+                        tracker_class, tracker_class.BATCH_ENDPOINT, payload,
+                        min(row[3] for row in batch)):
+                    return False
+                outbox.acknowledge([row[0] for row in batch])
+                shipped.update(row[0] for row in batch)
+            outbox.acknowledge(
+                [row[0] for row in rows if row[0] not in shipped])
+            return True
+        for id, endpoint, payload, created in rows:
+            if not self.deliver(tracker_class, endpoint, payload, created):
+                return False
+            outbox.acknowledge([id])
+        return True
+
+    def drain(self, limit):
+        """
+        Ships one round of payloads for each tracker.
+        Returns whether anything was shipped.
+        """
+        shipped = False
+        for tracker_class in self.trackers():
+            outbox = tracker_class.backend().outbox
+            rows = outbox.peek(tracker_class.IDENT, limit)
+            if rows and self.ship(tracker_class, rows):
+                shipped = True
+        return shipped
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                if not self.drain(options['limit']):
+                    if options['once']:
+                        break
+                    sleep(options['interval'])
+        finally:
+            buffers.flush_all()
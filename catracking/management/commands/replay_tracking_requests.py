@@ -0,0 +1,186 @@
+import arrow
+import requests
+import threading
+
+from multiprocessing.pool import ThreadPool
+from time import (
+    sleep,
+    time)
+
+from django.core.management.base import (
+    BaseCommand,
+    CommandError)
+from django.utils import timezone
+
+from catracking import (
+    delivery,
+    transport)
+from catracking.middleware import TrackingMiddleware
+from catracking.models import TrackingRequest
+
+
+class RateLimiter(object):
+    """
+    Token bucket shared by the replay threads, limiting the hits sent per
+    second. A rate of 0 means no limit.
+    """
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.allowance = rate
+        self.updated = time()
+        self.lock = threading.Lock()
+
+    def acquire(self, hits):
+        if not self.rate:
+            return
+        with self.lock:
+            now = time()
+            self.allowance = min(
+                self.rate, self.allowance + (now - self.updated) * self.rate)
+            self.updated = now
+            self.allowance -= hits
+            wait = -self.allowance / self.rate if self.allowance < 0 else 0
+        if wait:
+            sleep(wait)
+
+
+class Command(BaseCommand):
+    """
+    Sends again the hits of the tracking requests that failed (non 2xx
+    response) within a time range, and updates their response code.
+
+    Rows are streamed from the database, and the hits are sent in batches
+    by a pool of threads, a window of batches at a time, so memory usage
+    does not depend on the number of rows. Hits are re-encoded by the
+    tracker with the time they waited. Hits too old for the tracker to
+    accept them are handed to its `QUEUE_TIME_EXPIRED` policy, and the rows
+    left without hits are deleted, as they will never be sent.
+    """
+    help = 'Sends again the hits of failed tracking requests'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tracker', default='ga', help='Tracker ident.')
+        parser.add_argument(
+            '--since', help='Replay requests created since this date.')
+        parser.add_argument(
+            '--until', help='Replay requests created before this date.')
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Number of threads sending the batches.')
+        parser.add_argument(
+            '--rate', type=float, default=0,
+            help='Maximum hits sent per second, 0 for no limit.')
+        parser.add_argument(
+            '--window', type=int, default=100,
+            help='Batches sent before reporting progress.')
+
+    def tracker_class(self, ident):
+        try:
+            return TrackingMiddleware.TRACKERS_MAP[ident]
+        except KeyError:
+            raise CommandError('Unknown tracker {}'.format(ident))
+
+    def queryset(self, ident, since, until):
+        qs = TrackingRequest.objects.filter(tracker=ident).exclude(
+            response_code__gte=200, response_code__lt=300)
+        if since:
+            qs = qs.filter(created__gte=arrow.get(since).datetime)
+        if until:
+            qs = qs.filter(created__lt=arrow.get(until).datetime)
+        return qs.only('id', 'endpoint', 'payload', 'created').order_by('id')
+
+    def hits(self, rows):
+        """
+        Yields `(row id, payload)` for every hit of the rows, re-encoded
+        with the time they waited. Rows sent to a batch endpoint hold one
+        hit per line.
+        """
+        for row in rows:
+            self.stats['rows'] += 1
+            delay = (timezone.now() - row.created).total_seconds()
+            requeued, expired = [], []
+            for payload in row.payload.splitlines():
+                hit = self.tracker.requeue(payload, delay)
+                if hit is None:
+                    expired.append(payload)
+                else:
+                    requeued.append(hit)
+            if expired:
+                self.stats['expired'] += len(expired)
+                delivery.expire(self.tracker.IDENT, row.endpoint, expired)
+            if not requeued:
+                self.expired_rows.append(row.id)
+            for payload in requeued:
+                yield row.id, payload
+
+    def batches(self, hits):
+        if self.tracker.BATCH_ENDPOINT:
+            for batch in self.tracker.pack(hits, lambda hit: hit[1]):
+                yield self.tracker.BATCH_ENDPOINT, batch
+        else:
+            for hit in hits:
+                yield self.tracker.ENDPOINT, [hit]
+
+    def send(self, batch):
+        endpoint, hits = batch
+        self.limiter.acquire(len(hits))
+        try:
+            response = transport.post(
+                self.tracker.IDENT, endpoint,
+                '\n'.join(payload for _, payload in hits))
+        except requests.RequestException:
+            return hits, None
+        return hits, response.status_code
+
+    def update(self, results):
+        """
+        Records the response code of the replayed rows, and deletes the
+        rows whose hits all expired.
+        """
+        if self.expired_rows:
+            TrackingRequest.objects.filter(
+                pk__in=self.expired_rows).delete()
+            self.expired_rows = []
+        for hits, status_code in results:
+            if status_code is None:
+                self.stats['failed'] += len(hits)
+                continue
+            self.stats['sent'] += len(hits)
+            self.stats['batches'] += 1
+            TrackingRequest.objects.filter(
+                pk__in=set(id for id, _ in hits)).update(
+                    response_code=status_code)
+
+    def report(self):
+        elapsed = max(time() - self.started, 0.001)
+        self.stdout.write(
+            '{rows} rows, {sent} hits sent in {batches} batches, '
+            '{failed} failed, {expired} expired, {rate:.1f} hits/s'.format(
+                rate=self.stats['sent'] / elapsed, **self.stats))
+
+    def handle(self, *args, **options):
+        self.tracker = self.tracker_class(options['tracker'])
+        self.limiter = RateLimiter(options['rate'])
+        self.stats = dict.fromkeys(
+            ('rows', 'sent', 'batches', 'failed', 'expired'), 0)
+        self.expired_rows = []
+        self.started = time()
+
+        rows = self.queryset(
+            self.tracker.IDENT, options['since'], options['until']).iterator()
+        pool = ThreadPool(options['workers'])
+        try:
+            window = []
+            for batch in self.batches(self.hits(rows)):
+                window.append(batch)
+                if len(window) == options['window']:
+                    self.update(pool.map(self.send, window))
+                    self.report()
+                    window = []
+            self.update(pool.map(self.send, window))
+            self.report()
+        finally:
+            pool.close()
+            pool.join()
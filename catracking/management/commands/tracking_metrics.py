@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from catracking import multiprocess
+
+
+class Command(BaseCommand):
+    """
+    Prints the Prometheus text snapshot of the tracking counters written by
+    every process of the host, e.g. for the textfile collector of the node
+    exporter.
+    """
+    help = 'Prints the tracking counters of the host in the Prometheus format'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dir', action='append', dest='directories',
+            help='Directory with the counters files. Defaults to the '
+                 'METRICS_DIR of every tracker.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            multiprocess.snapshot(options['directories']), ending='')
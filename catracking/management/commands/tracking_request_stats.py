@@ -0,0 +1,121 @@
+import arrow
+import re
+
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+
+from catracking.instrumentation import Aggregator
+from catracking.models import TrackingRequest
+
+HIT_TYPE = re.compile(r'(?:^|&)t=([^&]*)')
+
+PERCENTILES = (50, 95, 99)
+
+"""
+Reported metrics, with their unit and the factor applied to the values.
+"""
+METRICS = (
+    ('queue_delay', 'ms', 1000),
+    ('round_trip', 'ms', 1000),
+    ('end_to_end', 'ms', 1000),
+    ('payload_size', 'B', 1),
+)
+
+
+def hit_type(payload):
+    """
+    Returns the hit type of the payload, `mixed` for batches with hits of
+    different types.
+    """
+    types = set()
+    for hit in payload.splitlines():
+        match = HIT_TYPE.search(hit)
+        types.add(match.group(1) if match else '-')
+    if len(types) == 1:
+        return types.pop()
+    return 'mixed' if types else '-'
+
+
+class Command(BaseCommand):
+    """
+    Reports the percentiles of the delivery columns of the tracking
+    requests logged within a time window, and their throughput, by tracker
+    and hit type. `end_to_end` is the time between the creation of the
+    first hit and the log of its delivery.
+
+    Rows are streamed from the database, only the values are kept.
+    """
+    help = 'Reports delivery percentiles and throughput of tracking requests'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tracker', help='Only report this tracker.')
+        parser.add_argument(
+            '--since', help='Requests created since this date. '
+                            'Defaults to an hour ago.')
+        parser.add_argument(
+            '--until', help='Requests created before this date. '
+                            'Defaults to now.')
+
+    def rows(self, tracker, since, until):
+        qs = TrackingRequest.objects.filter(
+            created__gte=since, created__lt=until)
+        if tracker:
+            qs = qs.filter(tracker=tracker)
+        return qs.values_list(
+            'tracker', 'payload', 'created', 'hit_created', 'queue_delay',
+            'round_trip', 'payload_size').iterator()
+
+    def collect(self, rows):
+        """
+        Returns the count and values of every metric by tracker and hit
+        type. Missing values (rows logged before they were recorded) are
+        skipped.
+        """
+        groups = defaultdict(lambda: {
+            'count': 0, 'values': defaultdict(list)})
+        for (tracker, payload, created, hit_created, queue_delay,
+             round_trip, payload_size) in rows:
+            group = groups[tracker, hit_type(payload)]
+            group['count'] += 1
+            values = group['values']
+            if queue_delay is not None:
+                values['queue_delay'].append(queue_delay)
+            if round_trip is not None:
+                values['round_trip'].append(round_trip)
+            if hit_created is not None:
+                values['end_to_end'].append(
+                    (created - hit_created).total_seconds())
+            if payload_size is not None:
+                values['payload_size'].append(payload_size)
+        return groups
+
+    def handle(self, *args, **options):
+        until = arrow.get(options['until']) if options['until'] else \
+            arrow.utcnow()
+        since = arrow.get(options['since']) if options['since'] else \
+            until.shift(hours=-1)
+        seconds = max((until - since).total_seconds(), 1)
+        groups = self.collect(self.rows(
+            options['tracker'], since.datetime, until.datetime))
+
+        self.stdout.write('{0:<12}{1:<12}{2:>10}{3:>12}  {4:<18}{5}'.format(
+            'tracker', 'type', 'requests', 'per second', 'metric',
+            ''.join('{:>12}'.format('p{}'.format(percent))
+                    for percent in PERCENTILES)))
+        for (tracker, kind), group in sorted(groups.items()):
+            prefix = '{0:<12}{1:<12}{2:>10}{3:>12.2f}'.format(
+                tracker, kind, group['count'], group['count'] / seconds)
+            for metric, unit, factor in METRICS:
+                values = sorted(group['values'][metric])
+                if not values:
+                    continue
+                self.stdout.write('{0}  {1:<18}{2}'.format(
+                    prefix, '{0} ({1})'.format(metric, unit), ''.join(
+                        '{:>12.1f}'.format(
+                            Aggregator.percentile(values, percent) * factor)
+                        for percent in PERCENTILES)))
+                prefix = ' ' * len(prefix)
+            if prefix.strip():
+                self.stdout.write(prefix)
@@ -1,11 +1,98 @@
-from collections import namedtuple
+import logging
 
 from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 from django.utils.module_loading import import_string
 
+from catracking import instrumentation
 from catracking.core import MissingTrackerConfigurationError
 from catracking.ga.core import GoogleAnalyticsTracker
-from catracking.mixins import MiddlewareMixin
+from catracking.mixins import (
+    MiddlewareMixin,
+    aio)
+
+logger = logging.getLogger(__name__)
+
+_containers = {}
+
+
+@receiver(setting_changed)
+def reset_containers(setting, **kwargs):
+    """
+    Trackers are resolved once per middleware class, and resolved again
+    when the `TRACKERS` setting changes.
+    """
+    if setting == 'TRACKERS':
+        _containers.clear()
+
+
+class Trackers(object):
+    """
+    The `request.trackers` object. Each tracker is only created when it is
+    accessed for the first time, so requests that do not track anything
+    do not pay for the trackers.
+
+    The middleware builds a subclass for the configured trackers, with
+    their idents in `_fields`, their classes in `_classes` and the idents
+    of the trackers with `DEFERRED_SEND` in `_deferred`.
+    """
+    _fields = ()
+    _classes = {}
+    _deferred = frozenset()
+
+    def __init__(self, request):
+        self._request = request
+
+    def __getattr__(self, name):
+        try:
+            tracker_class = self._classes[name]
+        except KeyError:
+            raise AttributeError(name)
+        with instrumentation.timer(name, instrumentation.INSTANTIATE):
+            tracker = self.__dict__[name] = tracker_class(self._request)
+        return tracker
+
+    def touched(self, deferred=False):
+        """
+        Returns the trackers created so far, either the ones sent in
+        `process_response` or the deferred ones.
+        """
+        trackers = self.__dict__
+        return [
+            trackers[ident] for ident in self._fields
+            if ident in trackers and (ident in self._deferred) == deferred]
+
+
+class DeferredSend(object):
+    """
+    Sends the trackers once the response has been delivered.
+
+    It replaces the `close` method of the response, which the server calls
+    after the last byte was sent to the client, on every django version
+    and under WSGI and ASGI. So it also works for streaming responses:
+    hits added while the stream is being produced are sent as well.
+    """
+
+    def __init__(self, trackers, close):
+        self.trackers = trackers
+        self.close = close
+
+    def __call__(self):
+        """
+        The response must still be closed (its closable objects and the
+        `request_finished` signal) when a tracker fails, so errors are only
+        logged.
+        """
+        try:
+            for tracker in self.trackers.touched(deferred=True):
+                try:
+                    tracker.send()
+                except Exception:
+                    logger.exception(
+                        'Deferred send of %s tracker failed', tracker.IDENT)
+        finally:
+            self.close()
 
 
 class TrackingMiddleware(MiddlewareMixin):
@@ -36,26 +123,70 @@ class TrackingMiddleware(MiddlewareMixin):
         except (ImportError, MissingTrackerConfigurationError):
             return tracker_class
 
+    def container(self):
+        """
+        Returns the `Trackers` class of the configured trackers. It is
+        built once per middleware class, as resolving the trackers reads
+        the settings and imports the custom trackers.
+        """
+        try:
+            return _containers[type(self)]
+        except KeyError:
+            pass
+        idents = self.trackers
+        classes = {
+            ident: self.resolve_tracker(self.TRACKERS_MAP[ident])
+            for ident in idents}
+        container = type('Trackers', (Trackers,), {
+            '_fields': tuple(idents),
+            '_classes': classes,
+            '_deferred': frozenset(
+                ident for ident in idents
+                if classes[ident].settings('DEFERRED_SEND', False))})
+        _containers[type(self)] = container
+        return container
+
     def process_view(self, request, view_func, view_args, view_kwargs):
         """
-        Creates a `trackers` object in the request and loops through the
-        configured trackers in django settings.
+        Creates a `trackers` object in the request, holding the configured
+        trackers in django settings.
 
         Available trackers from the package but not yet configured should
         not be added to the trackers object.
         """
-        Trackers = namedtuple('Trackers', ' '.join(self.trackers))
-        instances = {
-            tracker: self.resolve_tracker(self.TRACKERS_MAP[tracker])(request)
-            for tracker in self.trackers}
-        setattr(request, 'trackers', Trackers(**instances))
+        setattr(request, 'trackers', self.container()(request))
+
+    def touched_trackers(self, request):
+        """
+        Returns the trackers used by the request that are sent before
+        delivering the response. Trackers never accessed are not sent.
+        """
+        trackers = getattr(request, 'trackers', None)
+        if not isinstance(trackers, Trackers):
+            return []
+        return trackers.touched()
+
+    def defer(self, request, response):
+        """
+        Trackers with `DEFERRED_SEND` enabled are only sent once the
+        response has been delivered, see `DeferredSend`.
+        """
+        trackers = getattr(request, 'trackers', None)
+        if isinstance(trackers, Trackers) and trackers._deferred:
+            response.close = DeferredSend(trackers, response.close)
 
     def process_response(self, request, response):
         """
         After hitting the view and before delivering the response to the
         client, every event prepared from each tracker needs to be sent.
         """
-        if hasattr(request, 'trackers'):
-            for tracker in request.trackers._fields:
-                getattr(request.trackers, tracker).send()
+        for tracker in self.touched_trackers(request):
+            tracker.send()
+        self.defer(request, response)
         return response
+
+    def aprocess_response(self, request, response):
+        """
+        Awaitable `process_response`, used when the middleware runs async.
+        """
+        return aio.process_response(self, request, response)
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 13:30
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catracking', '0002_trackingrequest_created_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrackingRequestSummary',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tracker', models.CharField(max_length=48)),
+                ('endpoint', models.CharField(max_length=255)),
+                ('response_code', models.IntegerField()),
+                ('minute', models.DateTimeField()),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'tracking request summaries',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='trackingrequestsummary',
+            unique_together=set([('tracker', 'endpoint', 'response_code', 'minute')]),
+        ),
+    ]
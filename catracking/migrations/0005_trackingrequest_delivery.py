@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 14:10
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catracking', '0004_trackingdeadletter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trackingrequest',
+            name='hit_created',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='trackingrequest',
+            name='payload_size',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='trackingrequest',
+            name='queue_delay',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='trackingrequest',
+            name='round_trip',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
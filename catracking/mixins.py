@@ -1,16 +1,38 @@
+import six
+
+if six.PY3:
+    from catracking import aio
+else:
+    aio = None
+
 
 class MiddlewareMixin(object):
     """
     Adds compatibility from django 1.9 and django 1.11+.
     Unfortunately, django 1.9 does not have
     `django.utils.deprecation.MiddlewareMixin`, as it is available on 1.10
+
+    Middlewares are also async capable: when `get_response` is a coroutine
+    function (ASGI), the middleware is called as a coroutine and
+    `process_view` becomes one, so django does not run them through a
+    sync adapter.
     """
+    sync_capable = True
+    async_capable = True
 
     def __init__(self, get_response=None):
         self.get_response = get_response
+        self.is_async = aio is not None and aio.iscoroutinefunction(
+            get_response)
+        if self.is_async:
+            aio.mark_coroutine(self)
+            if hasattr(self, 'process_view'):
+                self.process_view = aio.as_coroutine(self.process_view)
         super(MiddlewareMixin, self).__init__()
 
     def __call__(self, request):
+        if self.is_async:
+            return aio.call(self, request)
         response = None
         if hasattr(self, 'process_request'):
             response = self.process_request(request)
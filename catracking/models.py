@@ -1,12 +1,59 @@
 from django.db import models
+from django.utils import timezone
 
 
 class TrackingRequest(models.Model):
+    """
+    A delivery to a tracker endpoint. Deliveries record when their first
+    hit was created, how long they waited between being enqueued and being
+    sent (`queue_delay`) and the duration of the HTTP request
+    (`round_trip`), both in seconds, and the size of the payload in bytes.
+    """
     tracker = models.CharField(max_length=48)
     endpoint = models.CharField(max_length=2048)
     payload = models.TextField()
     response_code = models.IntegerField()
-    created = models.DateTimeField(auto_now_add=True)
+    created = models.DateTimeField(default=timezone.now)
+    hit_created = models.DateTimeField(null=True, blank=True)
+    queue_delay = models.FloatField(null=True, blank=True)
+    round_trip = models.FloatField(null=True, blank=True)
+    payload_size = models.PositiveIntegerField(null=True, blank=True)
 
     def __str__(self):
         return '{0} - {1}'.format(self.tracker, self.response_code)
+
+
+class TrackingRequestSummary(models.Model):
+    """
+    Number of hits sent to a tracker endpoint in a minute, grouped by
+    response code. Used instead of one `TrackingRequest` per hit when the
+    tracker logs with the `aggregate` policy.
+    """
+    tracker = models.CharField(max_length=48)
+    endpoint = models.CharField(max_length=255)
+    response_code = models.IntegerField()
+    minute = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'tracking request summaries'
+        unique_together = ('tracker', 'endpoint', 'response_code', 'minute')
+
+    def __str__(self):
+        return '{0} - {1} ({2})'.format(
+            self.tracker, self.response_code, self.count)
+
+
+class TrackingDeadLetter(models.Model):
+    """
+    Hits that could not be delivered after exhausting their retries.
+    """
+    tracker = models.CharField(max_length=48)
+    endpoint = models.CharField(max_length=2048)
+    payload = models.TextField()
+    attempts = models.PositiveIntegerField()
+    error = models.TextField(blank=True)
+    created = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return '{0} - {1} attempts'.format(self.tracker, self.attempts)
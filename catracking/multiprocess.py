@@ -0,0 +1,421 @@
+"""
+Counters shared by every process of a host, for the `multiprocess`
+instrumentation sink.
+
+Each process writes its counters to its own memory mapped file in the
+`METRICS_DIR` of the tracker, so web and worker processes never wait on
+each other, or on a file lock. `collect` merges the files of every process
+and `exposition` renders them in the Prometheus text format.
+
+Files are laid out as a header with the used size, followed by entries of
+a key (a JSON list with the metric name and its labels) and its value, as
+a double. Entries are only appended, and the used size is updated after
+the entry is written, so the files can be read while they are written.
+
+When a process exits, its files are folded into the archive file of
+their tracker (see `archive`), so recycled processes do not leave files
+behind and counters do not go back.
+"""
+import atexit
+import fcntl
+import json
+import mmap
+import os
+import struct
+import threading
+
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from catracking import instrumentation
+from catracking.transport import tracker_settings
+
+FILE_SUFFIX = '.counters'
+ARCHIVE_NAME = 'archive'
+LOCK_NAME = '.lock'
+INITIAL_SIZE = 16 * 1024
+
+"""
+Upper bounds, in seconds, of the buckets of the stage histograms.
+"""
+BUCKETS = (
+    0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+    0.5, 1, 2.5, 5, 10)
+
+COUNTER_METRIC = 'catracking_{}_total'
+STATUS_METRIC = 'catracking_responses_total'
+STAGE_METRIC = 'catracking_stage_seconds'
+
+HELP = {
+    'catracking_hits_total': 'Hits created.',
+    'catracking_hits_enqueued_total':
+        'Hits handed to the dispatch backend.',
+    'catracking_hits_delivered_total':
+        'Hits delivered with a 2xx response.',
+    'catracking_retries_total': 'Deliveries scheduled again.',
+    'catracking_drops_total': 'Hits that will never be delivered.',
+    'catracking_round_trip_errors_total':
+        'Deliveries failed before a response.',
+    'catracking_logged_total': 'Tracking requests written.',
+    STATUS_METRIC: 'Responses of the tracker, by status code.',
+    STAGE_METRIC: 'Duration of the stages of the tracking pipeline.',
+}
+
+_header = struct.Struct('i4x')
+_length = struct.Struct('i')
+_value = struct.Struct('d')
+
+_files = {}
+_files_lock = threading.Lock()
+
+
+@receiver(setting_changed)
+def reset_files(setting, **kwargs):
+    if setting == 'TRACKERS':
+        _files.clear()
+
+
+def encode_key(key):
+    name, labels = key
+    return json.dumps([name, labels]).encode('utf-8')
+
+
+def decode_key(encoded):
+    name, labels = json.loads(encoded.decode('utf-8'))
+    return name, tuple(tuple(label) for label in labels)
+
+
+def read_entries(data):
+    """
+    Yields the key, value and offset of the value of every entry of the
+    contents of a counters file.
+    """
+    used = _header.unpack_from(data, 0)[0] if len(data) >= 8 else 0
+    offset = _header.size
+    while offset < used:
+        length = _length.unpack_from(data, offset)[0]
+        key = data[offset + 4:offset + 4 + length]
+        offset += 4 + length
+        offset += -offset % 8
+        yield decode_key(key), _value.unpack_from(data, offset)[0], offset
+        offset += _value.size
+
+
+class CounterFile(object):
+    """
+    Counters of the current process, only written by it. Increments of the
+    threads of the process are serialized by a lock of the process.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        size = os.fstat(self.fd).st_size
+        if size < INITIAL_SIZE:
+            os.ftruncate(self.fd, INITIAL_SIZE)
+            size = INITIAL_SIZE
+        self.size = size
+        self.map = mmap.mmap(self.fd, size)
+        self.offsets = {}
+        self.used = _header.size
+        for key, value, offset in read_entries(self.map):
+            self.offsets[key] = offset
+            self.used = offset + _value.size
+
+    def close(self):
+        self.map.close()
+        os.close(self.fd)
+
+    def grow(self, size):
+        while self.size < size:
+            self.size *= 2
+        self.map.close()
+        os.ftruncate(self.fd, self.size)
+        self.map = mmap.mmap(self.fd, self.size)
+
+    def allocate(self, key):
+        encoded = encode_key(key)
+        value_offset = self.used + 4 + len(encoded)
+        value_offset += -value_offset % 8
+        if value_offset + _value.size > self.size:
+            self.grow(value_offset + _value.size)
+        _length.pack_into(self.map, self.used, len(encoded))
+        self.map[self.used + 4:self.used + 4 + len(encoded)] = encoded
+        _value.pack_into(self.map, value_offset, 0.0)
+        self.used = value_offset + _value.size
+        _header.pack_into(self.map, 0, self.used)
+        self.offsets[key] = value_offset
+        return value_offset
+
+    def add(self, key, value):
+        with self.lock:
+            try:
+                offset = self.offsets[key]
+            except KeyError:
+                offset = self.allocate(key)
+            _value.pack_into(
+                self.map, offset,
+                _value.unpack_from(self.map, offset)[0] + value)
+
+
+def get_file(tracker_ident):
+    """
+    Returns the counters file of a tracker for the current process, or
+    `None` when the tracker has no `METRICS_DIR`. Forked processes open a
+    file of their own.
+    """
+    pid = os.getpid()
+    try:
+        file_pid, counter_file = _files[tracker_ident]
+        if file_pid == pid:
+            return counter_file
+    except KeyError:
+        pass
+    with _files_lock:
+        file_pid, counter_file = _files.get(tracker_ident, (None, None))
+        if file_pid != pid:
+            directory = tracker_settings(tracker_ident).get(
+                'METRICS_DIR', None)
+            counter_file = None
+            if directory:
+                counter_file = CounterFile(os.path.join(
+                    directory, '{0}-{1}{2}'.format(
+                        tracker_ident, pid, FILE_SUFFIX)))
+            _files[tracker_ident] = (pid, counter_file)
+        return counter_file
+
+
+def read_totals(path, totals):
+    """
+    Adds the counters of a file to `totals`.
+    """
+    with open(path, 'rb') as counters:
+        data = counters.read()
+    for key, value, offset in read_entries(data):
+        totals[key] += value
+
+
+@contextmanager
+def locked(directory, operation):
+    """
+    Holds a lock on the directory. Archiving takes it exclusively and
+    collecting shares it, so the counters of a process are never read
+    both from its file and from the archive, or from neither.
+    """
+    fd = os.open(
+        os.path.join(directory, LOCK_NAME), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, operation)
+        yield
+    finally:
+        os.close(fd)
+
+
+def archive(path):
+    """
+    Folds the counters file of a process that exited into the archive file
+    of its tracker, and removes it. The archive is rewritten and renamed
+    over the previous one.
+    """
+    directory, name = os.path.split(path)
+    tracker_ident = name[:-len(FILE_SUFFIX)].rsplit('-', 1)[0]
+    archive_path = os.path.join(directory, '{0}-{1}{2}'.format(
+        tracker_ident, ARCHIVE_NAME, FILE_SUFFIX))
+    if not os.path.exists(path):
+        return
+    with locked(directory, fcntl.LOCK_EX):
+        if not os.path.exists(path):
+            return
+        totals = defaultdict(float)
+        for file_path in (archive_path, path):
+            if os.path.exists(file_path):
+                read_totals(file_path, totals)
+        temporary_path = archive_path + '.tmp'
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        archive_file = CounterFile(temporary_path)
+        for key, value in totals.items():
+            archive_file.add(key, value)
+        archive_file.close()
+        os.rename(temporary_path, archive_path)
+        os.remove(path)
+
+
+@atexit.register
+def archive_files():
+    """
+    Closes the counters files of the current process and archives them.
+    Called when the process exits, and by celery worker processes, which
+    do not run `atexit` handlers.
+    """
+    pid = os.getpid()
+    with _files_lock:
+        for tracker_ident, (file_pid, counter_file) in list(_files.items()):
+            if file_pid != pid or counter_file is None:
+                continue
+            del _files[tracker_ident]
+            counter_file.close()
+            archive(counter_file.path)
+
+
+def mark_process_dead(pid, directories=None):
+    """
+    Archives the counters files of a process that was killed, and could
+    not archive them itself, e.g. from the gunicorn `child_exit` hook.
+    """
+    if directories is None:
+        directories = metrics_dirs()
+    suffix = '-{0}{1}'.format(pid, FILE_SUFFIX)
+    for directory in directories:
+        for name in os.listdir(directory):
+            if name.endswith(suffix):
+                archive(os.path.join(directory, name))
+
+
+def bucket(duration):
+    for upper_bound in BUCKETS:
+        if duration <= upper_bound:
+            return repr(float(upper_bound))
+    return '+Inf'
+
+
+class MultiprocessSink(instrumentation.Sink):
+    """
+    Adds the measurements to the counters file of the process: counts as
+    counters, status codes as a counter by code and timings as a
+    histogram by stage.
+    """
+
+    def timing(self, tracker_ident, stage, duration):
+        counter_file = get_file(tracker_ident)
+        if counter_file is None:
+            return
+        labels = (('stage', stage), ('tracker', tracker_ident))
+        counter_file.add((STAGE_METRIC + '_bucket', labels + (
+            ('le', bucket(duration)),)), 1)
+        counter_file.add((STAGE_METRIC + '_sum', labels), duration)
+        counter_file.add((STAGE_METRIC + '_count', labels), 1)
+
+    def count(self, tracker_ident, name, value):
+        counter_file = get_file(tracker_ident)
+        if counter_file is not None:
+            counter_file.add((
+                COUNTER_METRIC.format(name), (('tracker', tracker_ident),)),
+                value)
+
+    def status(self, tracker_ident, status_code, value):
+        counter_file = get_file(tracker_ident)
+        if counter_file is not None:
+            counter_file.add((STATUS_METRIC, (
+                ('code', str(status_code)), ('tracker', tracker_ident))),
+                value)
+
+
+def collect(directories):
+    """
+    Returns the sum of every counter in the files of the directories.
+    """
+    totals = defaultdict(float)
+    for directory in directories:
+        with locked(directory, fcntl.LOCK_SH):
+            for name in sorted(os.listdir(directory)):
+                if name.endswith(FILE_SUFFIX):
+                    read_totals(os.path.join(directory, name), totals)
+    return totals
+
+
+def format_value(value):
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+def format_sample(name, labels, value):
+    if labels:
+        name += '{' + ','.join(
+            '{0}="{1}"'.format(label, label_value)
+            for label, label_value in labels) + '}'
+    return '{0} {1}\n'.format(name, format_value(value))
+
+
+def le_order(labels):
+    le = dict(labels)['le']
+    return float('inf') if le == '+Inf' else float(le)
+
+
+def exposition(totals):
+    """
+    Renders the counters in the Prometheus text format. Histogram buckets
+    are stored by bucket, they are made cumulative here.
+    """
+    metrics = defaultdict(list)
+    for (name, labels), value in totals.items():
+        metric = name
+        for suffix in ('_bucket', '_sum', '_count'):
+            if name == STAGE_METRIC + suffix:
+                metric = STAGE_METRIC
+        metrics[metric].append((name, labels, value))
+
+    lines = []
+    for metric in sorted(metrics):
+        lines.append('# HELP {0} {1}\n'.format(
+            metric, HELP.get(metric, metric)))
+        if metric == STAGE_METRIC:
+            lines.append('# TYPE {} histogram\n'.format(metric))
+            lines.extend(histogram_samples(metrics[metric]))
+            continue
+        lines.append('# TYPE {} counter\n'.format(metric))
+        for name, labels, value in sorted(metrics[metric]):
+            lines.append(format_sample(name, labels, value))
+    return ''.join(lines)
+
+
+def histogram_samples(samples):
+    series = defaultdict(lambda: {'buckets': [], 'sum': 0, 'count': 0})
+    for name, labels, value in samples:
+        if name.endswith('_bucket'):
+            key = tuple(label for label in labels if label[0] != 'le')
+            series[key]['buckets'].append((labels, value))
+        else:
+            series[labels][name.rsplit('_', 1)[1]] = value
+
+    for labels in sorted(series):
+        cumulative = 0
+        buckets = dict(
+            (le_order(bucket_labels), value)
+            for bucket_labels, value in series[labels]['buckets'])
+        for upper_bound in BUCKETS + (float('inf'),):
+            cumulative += buckets.get(float(upper_bound), 0)
+            le = '+Inf' if upper_bound == float('inf') else repr(
+                float(upper_bound))
+            yield format_sample(
+                STAGE_METRIC + '_bucket', labels + (('le', le),), cumulative)
+        yield format_sample(
+            STAGE_METRIC + '_sum', labels, series[labels]['sum'])
+        yield format_sample(
+            STAGE_METRIC + '_count', labels, series[labels]['count'])
+
+
+def metrics_dirs():
+    """
+    Returns the `METRICS_DIR` of every configured tracker.
+    """
+    return sorted(set(
+        config['METRICS_DIR']
+        for config in getattr(settings, 'TRACKERS', {}).values()
+        if isinstance(config, dict) and config.get('METRICS_DIR')))
+
+
+def snapshot(directories=None):
+    """
+    Returns the Prometheus text snapshot of the counters of every process
+    of the host.
+    """
+    if directories is None:
+        directories = metrics_dirs()
+    return exposition(collect(directories))
@@ -0,0 +1,95 @@
+import os
+import sqlite3
+import threading
+
+from time import time
+
+DEFAULT_SYNCHRONOUS = 'NORMAL'
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS outbox ('
+    'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+    'tracker TEXT NOT NULL, '
+    'endpoint TEXT NOT NULL, '
+    'payload TEXT NOT NULL, '
+    'created REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS outbox_tracker ON outbox (tracker, id)',
+)
+
+_outboxes = {}
+_outboxes_lock = threading.Lock()
+
+
+class Outbox(object):
+    """
+    Local and crash-safe queue of payloads, stored in a SQLite database in
+    WAL mode. Appending a payload is a local write, so the request does not
+    depend on the broker or on the tracker endpoint.
+
+    With the `NORMAL` synchronous mode, commits are only synced to disk when
+    the WAL is checkpointed, which batches the fsync calls of many requests
+    while still surviving a crash of the application. `FULL` syncs on every
+    commit.
+
+    Payloads stay in the outbox until they are acknowledged by the drainer
+    (`drain_tracking_outbox` command).
+    """
+
+    def __init__(self, path, synchronous=DEFAULT_SYNCHRONOUS):
+        self.path = path
+        self.synchronous = synchronous
+        self.local = threading.local()
+
+    @property
+    def connection(self):
+        """
+        SQLite connections can not be shared with other threads or forked
+        processes, so each of them opens its own.
+        """
+        pid = os.getpid()
+        if getattr(self.local, 'pid', None) != pid:
+            connection = sqlite3.connect(self.path, timeout=10)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'PRAGMA synchronous={}'.format(self.synchronous))
+            with connection:
+                for statement in SCHEMA:
+                    connection.execute(statement)
+            self.local.pid = pid
+            self.local.connection = connection
+        return self.local.connection
+
+    def append(self, tracker_ident, endpoint, payloads):
+        created = time()
+        with self.connection as connection:
+            connection.executemany(
+                'INSERT INTO outbox (tracker, endpoint, payload, created) '
+                'VALUES (?, ?, ?, ?)',
+                [(tracker_ident, endpoint, payload, created)
+                 for payload in payloads])
+
+    def peek(self, tracker_ident, limit):
+        """
+        Returns the oldest payloads of a tracker, as
+        `(id, endpoint, payload, created)` rows, without removing them.
+        """
+        return self.connection.execute(
+            'SELECT id, endpoint, payload, created FROM outbox '
+            'WHERE tracker = ? ORDER BY id LIMIT ?',
+            (tracker_ident, limit)).fetchall()
+
+    def acknowledge(self, ids):
+        with self.connection as connection:
+            connection.executemany(
+                'DELETE FROM outbox WHERE id = ?', [(id,) for id in ids])
+
+    def __len__(self):
+        return self.connection.execute(
+            'SELECT COUNT(*) FROM outbox').fetchone()[0]
+
+
+def get_outbox(path, synchronous=DEFAULT_SYNCHRONOUS):
+    with _outboxes_lock:
+        if path not in _outboxes:
+            _outboxes[path] = Outbox(path, synchronous)
+        return _outboxes[path]
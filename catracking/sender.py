@@ -0,0 +1,223 @@
+import atexit
+import logging
+import os
+import threading
+
+from six.moves import queue
+from time import time
+
+from catracking.delivery import (
+    creation_times,
+    deliver_or_dead_letter,
+    earliest,
+    requeue)
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_DROP_OLDEST = 'drop_oldest'
+OVERFLOW_DROP_NEWEST = 'drop_newest'
+OVERFLOW_BLOCK = 'block'
+
+DEFAULT_QUEUE_SIZE = 1000
+DEFAULT_BATCH_SIZE = 20
+DEFAULT_MAX_LATENCY = 1
+DEFAULT_OVERFLOW = OVERFLOW_DROP_OLDEST
+DEFAULT_BLOCK_TIMEOUT = 0.1
+DEFAULT_DRAIN_TIMEOUT = 5
+
+STOP = object()
+
+_senders = {}
+_senders_lock = threading.Lock()
+
+
+class BackgroundSender(object):
+    """
+    Delivers the payloads of a tracker from a daemon thread of the current
+    process, so the request only pays for putting them in a queue.
+
+    The thread delivers the queued payloads once `batch_size` of them were
+    collected or the oldest one waited `max_latency` seconds, packing them
+    in batches if the tracker has batching enabled.
+
+    Payloads failing with a server error or a connection failure are
+    stored as dead letters, see `delivery.deliver_or_dead_letter`.
+
+    The queue is bounded. When it is full, the overflow policy decides what
+    happens to a new payload:
+        drop_oldest: the oldest queued payload is discarded to make room.
+        drop_newest: the new payload is discarded.
+        block: the request waits up to `block_timeout` seconds for room,
+               and the new payload is discarded if there is still none.
+    """
+
+    def __init__(self, tracker_class, queue_size=DEFAULT_QUEUE_SIZE,
+                 batch_size=DEFAULT_BATCH_SIZE,
+                 max_latency=DEFAULT_MAX_LATENCY, overflow=DEFAULT_OVERFLOW,
+                 block_timeout=DEFAULT_BLOCK_TIMEOUT):
+        self.tracker_class = tracker_class
+        self.batch_size = batch_size
+        self.max_latency = max_latency
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.queue = queue.Queue(queue_size)
+        self.dropped = 0
+        self.thread = threading.Thread(
+            target=self.run, name='catracking-{}'.format(tracker_class.IDENT))
+        self.thread.daemon = True
+
+    def start(self):
+        self.thread.start()
+
+    def drop(self, payload):
+        self.dropped += 1
+        logger.warning(
+            'Tracking queue is full, payload discarded',
+            extra={'tracker': self.tracker_class.IDENT, 'payload': payload})
+
+    def put(self, item):
+        if self.overflow == OVERFLOW_BLOCK:
+            try:
+                self.queue.put(item, timeout=self.block_timeout)
+            except queue.Full:
+                self.drop(item[1])
+            return
+        while True:
+            try:
+                self.queue.put_nowait(item)
+                return
+            except queue.Full:
+                if self.overflow == OVERFLOW_DROP_NEWEST:
+                    self.drop(item[1])
+                    return
+            try:
+                self.drop(self.queue.get_nowait()[1])
+            except queue.Empty:
+                pass
+
+    def send(self, endpoint, payload_bucket, created=None):
+        """
+        Queues the payloads, with their creation timestamps, see
+        `Tracker.send`.
+        """
+        enqueued = time()
+        for payload, payload_created in zip(
+                payload_bucket,
+                creation_times(created, len(payload_bucket))):
+            self.put((endpoint, payload, payload_created, enqueued))
+
+    def flush(self, items):
+        """
+        Delivers the items, one request per payload or batch. A failed
+        request does not prevent the others from being sent.
+        """
+        try:
+            items = self.requeue(items)
+        except Exception:
+            logger.exception(
+                'General failure sending tracking data',
+                extra={'tracker': self.tracker_class.IDENT})
+            return
+        for endpoint, payload, created, enqueued in self.requests(items):
+            try:
+                deliver_or_dead_letter(
+                    self.tracker_class.IDENT, endpoint, payload, created,
+                    enqueued)
+            except Exception:
+                logger.exception(
+                    'General failure sending tracking data',
+                    extra={'tracker': self.tracker_class.IDENT})
+
+    def requests(self, items):
+        """
+        Yields the endpoint, payload, creation and enqueue times of every
+        request needed to deliver the items.
+        """
+        if not self.tracker_class.batch_enabled():
+            for item in items:
+                yield item
+            return
+        for batch in self.tracker_class.pack(items, lambda i: i[1]):
+            yield (
+                self.tracker_class.BATCH_ENDPOINT,
+                '\n'.join(item[1] for item in batch),
+                earliest(item[2] for item in batch),
+                earliest(item[3] for item in batch))
+
+    def requeue(self, items):
+        """
+        Adds the time the payloads waited in the queue to their hits, and
+        leaves out the ones that are too old to be sent.
+        """
+        now, requeued = time(), []
+        for endpoint, payload, created, enqueued in items:
+            payload = requeue(
+                self.tracker_class.IDENT, endpoint, payload, enqueued, now)
+            if payload is not None:
+                requeued.append((endpoint, payload, created, enqueued))
+        return requeued
+
+    def run(self):
+        items, deadline = [], None
+        while True:
+            timeout = max(0, deadline - time()) if items else None
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            if item is STOP:
+                self.flush(items)
+                return
+            if item is not None:
+                if not items:
+                    deadline = time() + self.max_latency
+                items.append(item)
+            if items and (item is None or len(items) >= self.batch_size):
+                self.flush(items)
+                items = []
+
+    def stop(self, timeout=DEFAULT_DRAIN_TIMEOUT):
+        """
+        Delivers whatever is still queued and stops the thread, waiting up
+        to `timeout` seconds.
+        """
+        if not self.thread.is_alive():
+            return
+        try:
+            self.queue.put(STOP, timeout=timeout)
+        except queue.Full:
+            return
+        self.thread.join(timeout)
+
+
+def get_sender(tracker_class):
+    """
+    Returns the running sender of a tracker for the current process.
+    Threads do not survive a fork, so forked processes start a new one.
+    """
+    pid = os.getpid()
+    with _senders_lock:
+        sender_pid, sender = _senders.get(tracker_class.IDENT, (None, None))
+        if sender_pid != pid:
+            settings = tracker_class.settings
+            sender = BackgroundSender(
+                tracker_class,
+                settings('THREAD_QUEUE_SIZE', DEFAULT_QUEUE_SIZE),
+                settings('THREAD_BATCH_SIZE', DEFAULT_BATCH_SIZE),
+                settings('THREAD_MAX_LATENCY', DEFAULT_MAX_LATENCY),
+                settings('THREAD_OVERFLOW', DEFAULT_OVERFLOW),
+                settings('THREAD_BLOCK_TIMEOUT', DEFAULT_BLOCK_TIMEOUT))
+            sender.start()
+            _senders[tracker_class.IDENT] = (pid, sender)
+        return sender
+
+
+def stop_all():
+    pid = os.getpid()
+    for sender_pid, sender in list(_senders.values()):
+        if sender_pid == pid:
+            sender.stop(sender.tracker_class.settings(
+                'THREAD_DRAIN_TIMEOUT', DEFAULT_DRAIN_TIMEOUT))
+
+
+atexit.register(stop_all)
@@ -1,24 +1,97 @@
+import random
 import requests
 
+from multiprocessing.pool import ThreadPool
+from time import time
+
+from celery.signals import (
+    worker_process_init,
+    worker_process_shutdown,
+    worker_shutdown)
 from celery.task import Task
 from celery.utils.log import get_task_logger
+from django.db import connection
 
-from catracking.models import TrackingRequest
+from catracking import (
+    buffers,
+    delivery,
+    instrumentation,
+    multiprocess,
+    transport,
+    wire)
 
 logger = get_task_logger(__name__)
 
+DEFAULT_RETRY_MAX = 5
+DEFAULT_RETRY_BACKOFF = 4
+DEFAULT_RETRY_BACKOFF_MAX = 900
+
+
+@worker_process_init.connect
+def warm_up_sessions(**kwargs):
+    """
+    Every worker process opens the connections to the configured trackers
+    as soon as it starts.
+    """
+    from catracking.middleware import TrackingMiddleware
+    for ident, tracker_class in TrackingMiddleware.TRACKERS_MAP.items():
+        if tracker_class.is_active():
+            transport.warm_session(ident, tracker_class.ENDPOINT)
+
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def flush_buffers(**kwargs):
+    """
+    Buffered tracking request logs are written before the worker exits.
+    """
+    buffers.flush_all()
+
+
+@worker_process_shutdown.connect
+def archive_counters(**kwargs):
+    """
+    Worker processes exit without running `atexit` handlers, so their
+    counters files are archived here, see `multiprocess.archive_files`.
+    """
+    multiprocess.archive_files()
+
 
 class SendTrackingDataTask(Task):
     """
-    Sends the tracking data to the tracker endpoint.
+    Sends the tracking data to the tracker endpoint, through the keep-alive
+    session the worker process holds for the tracker.
 
     Sentry errors will be thrown in case any exception is raised or if
     the response status code is bad.
 
     A log object will be created containing information about the tracker, its
     endpoint and the payload. Those should be checked to verify if the
-    tracking data is being sent correctly.
+    tracking data is being sent correctly. Logs are buffered in the worker
+    and written in bulk, according to the tracker `LOG_*` settings.
+
+    `created` and `enqueued` are the timestamps of the creation of the
+    first hit of the payload and of the moment it was handed to celery, so
+    the log records how long the payload waited in the queue. That wait is
+    added to the queue time of the hits right before they are sent, see
+    `delivery.requeue`.
+
+    Hits failing with a server error or a connection failure (including an
+    open circuit breaker) are sent again by a new task, after a jittered
+    exponential backoff. Once `RETRY_MAX` retries are exhausted, the hit is
+    stored as a `TrackingDeadLetter`.
+
+    Delivered hits, responses, retries and drops are counted by hit, a
+    batch counting as many hits as it holds.
     """
+    created = None
+    enqueued = None
+    sent = None
+    round_trip = None
+
+    @property
+    def hits(self):
+        return len(self.payload.splitlines())
 
     @property
     def extra(self):
@@ -32,19 +105,166 @@ class SendTrackingDataTask(Task):
         logger.error('General failure sending tracking data', extra=self.extra)
 
     def create_tracking_request_log(self):
-        TrackingRequest.objects.create(
+        buffers.get_buffer(self.tracker_ident).log(
             tracker=self.tracker_ident, endpoint=self.endpoint,
-            payload=self.payload, response_code=self.response.status_code)
+            payload=self.payload, response_code=self.response.status_code,
+            **delivery.delivery_fields(
+                self.payload, self.created, self.enqueued, self.sent,
+                self.round_trip))
 
     def check_response(self):
         if not (200 <= self.response.status_code < 300):
             logger.error('Bad response status from tracker', extra=self.extra)
 
-    def run(self, tracker_ident, endpoint, payload):
+    def backoff(self):
+        """
+        Seconds to wait before the next attempt, with full jitter.
+        """
+        config = transport.tracker_settings(self.tracker_ident)
+        return random.uniform(0, min(
+            config.get('RETRY_BACKOFF_MAX', DEFAULT_RETRY_BACKOFF_MAX),
+            config.get('RETRY_BACKOFF', DEFAULT_RETRY_BACKOFF) *
+            2 ** self.attempt))
+
+    def retry_or_dead_letter(self, error):
+        config = transport.tracker_settings(self.tracker_ident)
+        instrument = instrumentation.get_instrument(self.tracker_ident)
+        if self.attempt < config.get('RETRY_MAX', DEFAULT_RETRY_MAX):
+            countdown = self.backoff()
+            SendTrackingDataTask().apply_async(
+                (self.tracker_ident, self.endpoint, self.payload), {
+                    'attempt': self.attempt + 1, 'created': self.created,
+                    'enqueued': self.sent},
+                countdown=countdown)
+            instrument.count(instrumentation.RETRIES, self.hits)
+            return
+        delivery.dead_letter(
+            self.tracker_ident, self.endpoint, self.payload,
+            self.attempt + 1, error)
+
+    def run(self, tracker_ident, endpoint, payload, attempt=0, created=None,
+            enqueued=None):
         self.tracker_ident = tracker_ident
         self.endpoint = endpoint
-        self.payload = payload
+        self.attempt = attempt
+        self.created = created
+        self.enqueued = enqueued
+        self.payload = delivery.requeue(
+            tracker_ident, endpoint, payload, enqueued)
+        if self.payload is None:
+            return
 
-        self.response = requests.post(endpoint, data=payload)
+        instrument = instrumentation.get_instrument(tracker_ident)
+        self.sent, self.round_trip = time(), None
+        try:
+            self.response, self.sent, self.round_trip = delivery.post(
+                tracker_ident, endpoint, self.payload)
+        except requests.RequestException as exc:
+            instrument.count(instrumentation.ROUND_TRIP_ERRORS)
+            self.retry_or_dead_letter(exc)
+            return
+        instrument.status(self.response.status_code, self.hits)
+        if 200 <= self.response.status_code < 300:
+            instrument.count(instrumentation.DELIVERED, self.hits)
         self.create_tracking_request_log()
         self.check_response()
+        if self.response.status_code >= 500:
+            self.retry_or_dead_letter(
+                'Bad response status {}'.format(self.response.status_code))
+
+
+class SendBulkTrackingDataTask(Task):
+    """
+    Sends every payload created during a request, received in a single
+    message, to the tracker endpoint.
+
+    Each payload is delivered as a `SendTrackingDataTask` would do it, but
+    running inside this worker, sequentially or with a pool of threads.
+    A failure in one payload does not prevent the others from being sent.
+    Threads of the pool close their database connection once they are
+    done, as the pool is discarded with them.
+
+    `created` holds the creation timestamp of every payload.
+    """
+
+    def deliver(self, item):
+        payload, created = item
+        try:
+            SendTrackingDataTask().run(
+                self.tracker_ident, self.endpoint, payload,
+                created=created, enqueued=self.enqueued)
+        except Exception:
+            logger.exception(
+                'General failure sending tracking data', extra={
+                    'tracker': self.tracker_ident,
+                    'endpoint': self.endpoint,
+                    'payload': payload})
+
+    def deliver_in_thread(self, item):
+        try:
+            self.deliver(item)
+        finally:
+            connection.close()
+
+    def run(self, tracker_ident, endpoint, payloads, concurrency=1,
+            created=None, enqueued=None):
+        self.tracker_ident = tracker_ident
+        self.endpoint = endpoint
+        self.enqueued = enqueued
+        items = list(zip(
+            payloads, delivery.creation_times(created, len(payloads))))
+
+        concurrency = min(concurrency, len(items))
+        if concurrency <= 1:
+            for item in items:
+                self.deliver(item)
+            return
+        pool = ThreadPool(concurrency)
+        try:
+            pool.map(self.deliver_in_thread, items)
+        finally:
+            pool.close()
+            pool.join()
+
+
+class SendPackedTrackingDataTask(Task):
+    """
+    Receives every payload created during a request in the compact wire
+    format (see `catracking.wire`), and delivers them as a
+    `SendBulkTrackingDataTask` does.
+    """
+
+    def run(self, tracker_ident, message, concurrency=1, created=None,
+            enqueued=None):
+        endpoint, payloads = wire.unpack(message)
+        SendBulkTrackingDataTask().run(
+            tracker_ident, endpoint, payloads, concurrency, created, enqueued)
+
+
+class CompileTrackingDataTask(Task):
+    """
+    Compiles and encodes the hits described by the web process (see
+    `GoogleAnalyticsTracker.describe`), and delivers the payloads as a
+    `SendBulkTrackingDataTask` does. `created` holds the creation
+    timestamp of every hit, which is the one of its payloads.
+    """
+
+    def run(self, tracker_ident, root, hits, created=None, enqueued=None):
+        from catracking.backends import get_backend
+        from catracking.middleware import TrackingMiddleware
+
+        tracker_class = TrackingMiddleware().resolve_tracker(
+            TrackingMiddleware.TRACKERS_MAP[tracker_ident])
+        with instrumentation.timer(tracker_ident, instrumentation.ENCODE):
+            payload_bucket, payload_created = [], []
+            for payloads, hit_created in zip(
+                    tracker_class.fit_description(root, hits),
+                    delivery.creation_times(created, len(hits))):
+                payload_bucket.extend(payloads)
+                payload_created.extend([hit_created] * len(payloads))
+            endpoint, items = get_backend(tracker_class).timed_payloads(
+                payload_bucket, payload_created)
+        SendBulkTrackingDataTask().run(
+            tracker_ident, endpoint, [item[0] for item in items],
+            tracker_class.settings('BULK_CONCURRENCY', 1),
+            [item[1] for item in items], enqueued)
@@ -35,6 +35,13 @@ class TrackingRequestAdminTest(TestCase):
             'event (c, a, l)',
             self.admin.payloadify(self.tracking_request))
 
+    def test_payloadify_ga_batch(self):
+        self.tracking_request.payload = \
+            't=event&ec=c&ea=a&el=l\nt=pageview\nt=event&ec=d&ea=b&el=m'
+        self.assertEquals(
+            'event (c, a, l); event (d, b, m)',
+            self.admin.payloadify(self.tracking_request))
+
     def test_payloadify_ga_no_event(self):
         self.tracking_request.payload = 't=pageview'
         self.assertEquals('', self.admin.payloadify(self.tracking_request))
@@ -42,3 +49,22 @@ class TrackingRequestAdminTest(TestCase):
     def test_payloadify_non_ga(self):
         self.tracking_request.tracker = 'somethingelse'
         self.assertEquals('', self.admin.payloadify(self.tracking_request))
+
+
+class TrackingRequestSummaryAdminTest(TestCase):
+
+    def setUp(self):
+        self.admin = admin.TrackingRequestSummaryAdmin(
+            models.TrackingRequestSummary, None)
+
+    def test_get_queryset(self):
+        mommy.make(
+            'catracking.TrackingRequestSummary',
+            minute=arrow.utcnow().datetime)
+        mommy.make(
+            'catracking.TrackingRequestSummary',
+            minute=arrow.utcnow().shift(hours=-4).datetime)
+        mommy.make(
+            'catracking.TrackingRequestSummary',
+            minute=arrow.utcnow().shift(hours=-6).datetime)
+        self.assertEquals(2, len(self.admin.get_queryset(None)))
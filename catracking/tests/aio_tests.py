@@ -0,0 +1,208 @@
+import mock
+import six
+import threading
+import unittest
+
+from django.contrib.sessions.backends.db import SessionStore
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings)
+
+from catracking.backends import memory
+from catracking.ga.middleware import (
+    COOKIE_NAME,
+    GoogleAnalyticsCookieMiddleware)
+from catracking.middleware import TrackingMiddleware
+from catracking.mixins import MiddlewareMixin
+
+if six.PY3:
+    import asyncio
+
+    from catracking import aio
+    from catracking.tests.coroutines import loop_thread
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+@unittest.skipUnless(six.PY3, 'async middlewares require python 3')
+class AsyncMiddlewareMixinTest(TestCase):
+
+    def setUp(self):
+        self.response = HttpResponse()
+        self.get_response = aio.as_coroutine(lambda request: self.response)
+
+    def test_init_sync(self):
+        middleware = MiddlewareMixin(mock.MagicMock())
+        self.assertFalse(middleware.is_async)
+        self.assertFalse(asyncio.iscoroutinefunction(middleware))
+
+    def test_init_async(self):
+        middleware = MiddlewareMixin(self.get_response)
+        self.assertTrue(middleware.is_async)
+        self.assertTrue(aio.iscoroutinefunction(middleware))
+        coroutine = middleware(None)
+        self.assertTrue(asyncio.iscoroutine(coroutine))
+        coroutine.close()
+
+    @mock.patch('catracking.aio.inspect')
+    def test_init_async_marked(self, p_inspect):
+        with mock.patch.dict('sys.modules', {'asgiref.sync': None}):
+            middleware = MiddlewareMixin(self.get_response)
+        p_inspect.markcoroutinefunction.assert_called_once_with(middleware)
+
+    def test_init_async_process_view(self):
+        middleware = TrackingMiddleware(self.get_response)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware.process_view))
+
+    def test_call(self):
+        middleware = MiddlewareMixin(self.get_response)
+        self.assertEquals(self.response, run(middleware(mock.MagicMock())))
+
+    def test_call_with_process_request(self):
+        middleware = MiddlewareMixin(self.get_response)
+        middleware.process_request = mock.MagicMock()
+        self.assertEquals(
+            middleware.process_request.return_value,
+            run(middleware(mock.MagicMock())))
+
+    def test_call_with_process_response(self):
+        middleware = MiddlewareMixin(self.get_response)
+        middleware.process_response = mock.MagicMock()
+        request = mock.MagicMock()
+        self.assertEquals(
+            middleware.process_response.return_value, run(middleware(request)))
+        middleware.process_response.assert_called_once_with(
+            request, self.response)
+
+
+@unittest.skipUnless(six.PY3, 'async middlewares require python 3')
+@override_settings(TRACKERS={'ga': {
+    'PROPERTY': 'UA-1', 'DOCUMENT_HOSTNAME': 'example.com',
+    'DISPATCH': 'memory'}})
+class AsyncTrackingMiddlewareTest(TestCase):
+
+    def setUp(self):
+        memory.clear()
+        self.request = RequestFactory().get('/')
+        self.request.session = {}
+
+    def tearDown(self):
+        memory.clear()
+
+    def view(self, request):
+        request.trackers.ga.new_event('category', 'action', 'label')
+        return HttpResponse()
+
+    @property
+    def get_response(self):
+        def get_response(request):
+            TrackingMiddleware.process_view(
+                self.middleware, request, None, None, None)
+            return self.view(request)
+        return aio.as_coroutine(get_response)
+
+    def test_call(self):
+        self.middleware = TrackingMiddleware(self.get_response)
+        run(self.middleware(self.request))
+        self.assertEquals(1, len(memory.sent))
+
+    def test_call_deferred(self):
+        self.middleware = TrackingMiddleware(self.get_response)
+        with self.settings(TRACKERS={'ga': {
+                'PROPERTY': 'UA-1', 'DOCUMENT_HOSTNAME': 'example.com',
+                'DISPATCH': 'memory', 'DEFERRED_SEND': True}}):
+            response = run(self.middleware(self.request))
+            self.assertEquals([], memory.sent)
+            response.close()
+        self.assertEquals(1, len(memory.sent))
+
+    def test_send_outside_event_loop(self):
+        tracker, threads = mock.MagicMock(), {}
+
+        def compile_dispatches():
+            threads['compile'] = threading.current_thread()
+            return [dispatch]
+
+        def dispatch():
+            threads['dispatch'] = threading.current_thread()
+
+        tracker.compile_dispatches.side_effect = compile_dispatches
+        thread = run(loop_thread(aio.send(tracker)))
+        self.assertNotEqual(thread, threads['compile'])
+        self.assertNotEqual(thread, threads['dispatch'])
+
+    def test_asend(self):
+        self.middleware = TrackingMiddleware()
+        self.middleware.process_view(self.request, None, None, None)
+        self.request.trackers.ga.new_event('category', 'action', 'label')
+        run(self.request.trackers.ga.asend())
+        self.assertEquals(1, len(memory.sent))
+
+
+@unittest.skipUnless(six.PY3, 'async middlewares require python 3')
+@override_settings(TRACKERS={'ga': {
+    'DOCUMENT_HOSTNAME': 'example.com', 'COOKIE_DOMAIN': '.example.com'}})
+class AsyncGoogleAnalyticsCookieMiddlewareTest(TestCase):
+
+    def test_call(self):
+        request = RequestFactory().get('/')
+        request.session = {}
+        middleware = GoogleAnalyticsCookieMiddleware(
+            aio.as_coroutine(lambda request: HttpResponse()))
+        response = run(middleware(request))
+        self.assertIn(COOKIE_NAME, response.cookies)
+        self.assertEquals({}, request.session)
+
+
+@unittest.skipUnless(six.PY3, 'async middlewares require python 3')
+@override_settings(TRACKERS={'ga': {
+    'PROPERTY': 'UA-1', 'DOCUMENT_HOSTNAME': 'example.com',
+    'COOKIE_DOMAIN': '.example.com', 'DISPATCH': 'memory'}})
+class AsyncDatabaseSessionTest(TransactionTestCase):
+
+    def setUp(self):
+        memory.clear()
+        session = SessionStore()
+        session['ga_cookie'] = 'GA1.2.111.222'
+        session.save()
+        self.request = RequestFactory().get('/')
+        self.request.COOKIES[COOKIE_NAME] = 'GA1.2.333.444'
+        self.request.session = SessionStore(session.session_key)
+
+    def tearDown(self):
+        memory.clear()
+
+    def view(self, request):
+        request.trackers.ga.new_event('category', 'action', 'label')
+        return HttpResponse()
+
+    def test_call(self):
+        def get_response(request):
+            TrackingMiddleware.process_view(
+                tracking_middleware, request, None, None, None)
+            return self.view(request)
+
+        tracking_middleware = TrackingMiddleware(
+            aio.as_coroutine(get_response))
+        middleware = GoogleAnalyticsCookieMiddleware(tracking_middleware)
+        load, threads = SessionStore.load, []
+
+        def record_load(session):
+            threads.append(threading.current_thread())
+            return load(session)
+
+        with mock.patch.object(SessionStore, 'load', record_load):
+            thread = run(loop_thread(middleware(self.request)))
+        self.assertEquals(1, len(threads))
+        self.assertNotEqual(thread, threads[0])
+        self.assertEquals(1, len(memory.sent))
+        self.assertIn('cid=111.222', memory.sent[0].payload)
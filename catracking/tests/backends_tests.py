@@ -0,0 +1,297 @@
+import mock
+import requests
+
+from django.test import (
+    TestCase,
+    override_settings)
+
+from catracking import (
+    backends,
+    wire)
+from catracking.backends import (
+    base,
+    celery,
+    memory,
+    outbox,
+    sync,
+    thread)
+from catracking.core import (
+    MissingTrackerConfigurationError,
+    Tracker)
+from catracking.models import TrackingDeadLetter
+from catracking.tests.wire_tests import PAYLOADS
+
+
+class MyTracker(Tracker):
+    IDENT = 'mytracker'
+    ENDPOINT = 'https://my.tracker.com'
+    BATCH_ENDPOINT = 'https://my.tracker.com/batch'
+    BATCH_MAX_HITS = 3
+    BATCH_MAX_BYTES = 10
+    HIT_MAX_BYTES = 4
+
+    def __init__(self):
+        pass
+
+    def send(self, payload_bucket):
+        super(MyTracker, self).send(payload_bucket)
+
+
+class CustomBackend(base.DispatchBackend):
+
+    def send(self, payload_bucket):
+        pass
+
+
+class GetBackendTest(TestCase):
+
+    def setUp(self):
+        backends._backends.clear()
+
+    def test_get_backend_default(self):
+        self.assertIsInstance(
+            backends.get_backend(MyTracker), celery.CeleryBackend)
+
+    def test_get_backend_names(self):
+        for name, path in backends.DISPATCH_BACKENDS.items():
+            with self.settings(TRACKERS={'mytracker': {'DISPATCH': name}}):
+                backend = backends.get_backend(MyTracker)
+                self.assertEquals(path, '{}.{}'.format(
+                    type(backend).__module__, type(backend).__name__))
+                self.assertEquals(MyTracker, backend.tracker_class)
+
+    @override_settings(TRACKERS={'mytracker': {
+        'DISPATCH': 'catracking.tests.backends_tests.CustomBackend'}})
+    def test_get_backend_custom(self):
+        self.assertIsInstance(backends.get_backend(MyTracker), CustomBackend)
+
+    @override_settings(TRACKERS={'mytracker': {'DISPATCH': 'invalid'}})
+    def test_get_backend_invalid(self):
+        with self.assertRaises(ImportError):
+            backends.get_backend(MyTracker)
+
+    def test_get_backend_is_cached(self):
+        self.assertIs(
+            backends.get_backend(MyTracker), backends.get_backend(MyTracker))
+
+
+class DispatchBackendTest(TestCase):
+
+    def setUp(self):
+        self.backend = CustomBackend(MyTracker)
+
+    def test_abstract_send(self):
+        with self.assertRaises(TypeError):
+            base.DispatchBackend(MyTracker)
+
+    def test_ident(self):
+        self.assertEquals('mytracker', self.backend.ident)
+
+    def test_payloads(self):
+        self.assertEquals(
+            ('https://my.tracker.com', ['1', '2']),
+            self.backend.payloads(['1', '2']))
+
+    @override_settings(TRACKERS={'mytracker': {'BATCH': True}})
+    def test_payloads_batch(self):
+        endpoint, payloads = self.backend.payloads(['1', '2', '3', '4'])
+        self.assertEquals('https://my.tracker.com/batch', endpoint)
+        self.assertEquals(['1\n2\n3', '4'], list(payloads))
+
+
+class CeleryBackendTest(TestCase):
+
+    def setUp(self):
+        self.backend = celery.CeleryBackend(MyTracker)
+
+    @mock.patch('catracking.backends.celery.time', return_value=20)
+    @mock.patch('catracking.backends.celery.SendTrackingDataTask.delay')
+    def test_send(self, p_delay, p_time):
+        self.backend.send(['1', '2'], [10, 11])
+        p_delay.assert_has_calls([
+            mock.call(
+                'mytracker', 'https://my.tracker.com', '1', created=10,
+                enqueued=20),
+            mock.call(
+                'mytracker', 'https://my.tracker.com', '2', created=11,
+                enqueued=20)
+        ])
+
+    @override_settings(TRACKERS={'mytracker': {'BATCH': True}})
+    @mock.patch('catracking.backends.celery.time', return_value=20)
+    @mock.patch('catracking.backends.celery.SendTrackingDataTask.delay')
+    def test_send_batch(self, p_delay, p_time):
+        self.backend.send(['1', '2', '3', '4'], [12, 11, None, None])
+        p_delay.assert_has_calls([
+            mock.call(
+                'mytracker', 'https://my.tracker.com/batch', '1\n2\n3',
+                created=11, enqueued=20),
+            mock.call(
+                'mytracker', 'https://my.tracker.com/batch', '4',
+                created=None, enqueued=20)
+        ])
+
+
+class CeleryBulkBackendTest(TestCase):
+
+    def setUp(self):
+        self.backend = celery.CeleryBulkBackend(MyTracker)
+
+    @mock.patch('catracking.backends.celery.time', return_value=20)
+    @mock.patch('catracking.backends.celery.SendTrackingDataTask.delay')
+    @mock.patch('catracking.backends.celery.SendBulkTrackingDataTask.delay')
+    def test_send(self, p_bulk_delay, p_delay, p_time):
+        self.backend.send(['1', '2', '3'], [10, 11, 12])
+        p_bulk_delay.assert_called_once_with(
+            'mytracker', 'https://my.tracker.com', ['1', '2', '3'], 1,
+            [10, 11, 12], 20)
+        p_delay.assert_not_called()
+
+    @override_settings(TRACKERS={'mytracker': {'BULK_CONCURRENCY': 4}})
+    @mock.patch('catracking.backends.celery.time', return_value=20)
+    @mock.patch('catracking.backends.celery.SendBulkTrackingDataTask.delay')
+    def test_send_concurrency(self, p_bulk_delay, p_time):
+        self.backend.send(['1'])
+        p_bulk_delay.assert_called_once_with(
+            'mytracker', 'https://my.tracker.com', ['1'], 4, [None], 20)
+
+    @mock.patch('catracking.backends.celery.SendBulkTrackingDataTask.delay')
+    def test_send_empty_bucket(self, p_bulk_delay):
+        self.backend.send([])
+        p_bulk_delay.assert_not_called()
+
+    @override_settings(TRACKERS={'mytracker': {'BATCH': True}})
+    @mock.patch('catracking.backends.celery.time', return_value=20)
+    @mock.patch('catracking.backends.celery.SendBulkTrackingDataTask.delay')
+    def test_send_batch(self, p_bulk_delay, p_time):
+        self.backend.send(['1', '2', '3', '4'], [12, 11, 13, None])
+        p_bulk_delay.assert_called_once_with(
+            'mytracker', 'https://my.tracker.com/batch',
+            ['1\n2\n3', '4'], 1, [11, None], 20)
+
+    @override_settings(TRACKERS={'mytracker': {
+        'WIRE_FORMAT': 'compact', 'BULK_CONCURRENCY': 2}})
+    @mock.patch(
+        'catracking.backends.celery.SendPackedTrackingDataTask.delay')
+    @mock.patch('catracking.backends.celery.SendBulkTrackingDataTask.delay')
+    def test_send_compact(self, p_bulk_delay, p_packed_delay):
+        self.backend.send(PAYLOADS, [10] * len(PAYLOADS))
+        p_bulk_delay.assert_not_called()
+        ident, message, concurrency, created, enqueued = \
+            p_packed_delay.call_args[0]
+        self.assertEquals(
+            ('mytracker', 2, [10] * len(PAYLOADS)),
+            (ident, concurrency, created))
+        self.assertIsNotNone(enqueued)
+        self.assertEquals(
+            ('https://my.tracker.com', PAYLOADS), wire.unpack(message))
+
+    @override_settings(TRACKERS={'mytracker': {'WIRE_FORMAT': 'compact'}})
+    @mock.patch('catracking.backends.celery.time', return_value=20)
+    @mock.patch(
+        'catracking.backends.celery.SendPackedTrackingDataTask.delay')
+    @mock.patch('catracking.backends.celery.SendBulkTrackingDataTask.delay')
+    def test_send_compact_not_smaller(self, p_bulk_delay, p_packed_delay,
+                                      p_time):
+        self.backend.send(['a=1', 'b=2'], [10, 11])
+        p_packed_delay.assert_not_called()
+        p_bulk_delay.assert_called_once_with(
+            'mytracker', 'https://my.tracker.com', ['a=1', 'b=2'], 1,
+            [10, 11], 20)
+
+    @override_settings(TRACKERS={'mytracker': {
+        'WIRE_FORMAT': 'compact', 'WIRE_COMPRESS_MIN': 0}})
+    @mock.patch(
+        'catracking.backends.celery.SendPackedTrackingDataTask.delay')
+    def test_send_compact_compress_min(self, p_packed_delay):
+        self.backend.send(PAYLOADS)
+        self.assertEquals(
+            wire.COMPRESSED, p_packed_delay.call_args[0][1][0])
+
+
+class SyncBackendTest(TestCase):
+
+    def setUp(self):
+        self.backend = sync.SyncBackend(MyTracker)
+
+    @mock.patch('catracking.backends.sync.time', return_value=20)
+    @mock.patch('catracking.backends.sync.deliver_or_dead_letter')
+    def test_send(self, p_deliver, p_time):
+        self.backend.send(['1', '2'], [10, 11])
+        p_deliver.assert_has_calls([
+            mock.call('mytracker', 'https://my.tracker.com', '1', 10, 20),
+            mock.call('mytracker', 'https://my.tracker.com', '2', 11, 20)
+        ])
+
+    @mock.patch('catracking.delivery.logger.error')
+    @mock.patch('catracking.delivery.transport.post')
+    def test_send_failure(self, p_post, p_error):
+        p_post.side_effect = [requests.Timeout, mock.Mock(status_code=200)]
+        self.backend.send(['1', '2'])
+        self.assertEquals(2, p_post.call_count)
+        dead_letter = TrackingDeadLetter.objects.get()
+        self.assertEquals('1', dead_letter.payload)
+        self.assertEquals(1, dead_letter.attempts)
+
+
+class ThreadBackendTest(TestCase):
+
+    @mock.patch('catracking.backends.thread.sender.get_sender')
+    def test_send(self, p_get_sender):
+        thread.ThreadBackend(MyTracker).send(['1', '2'], [10, 11])
+        p_get_sender.assert_called_once_with(MyTracker)
+        p_get_sender.return_value.send.assert_called_once_with(
+            'https://my.tracker.com', ['1', '2'], [10, 11])
+
+
+class OutboxBackendTest(TestCase):
+
+    def setUp(self):
+        self.backend = outbox.OutboxBackend(MyTracker)
+
+    @override_settings(TRACKERS={'mytracker': {}})
+    def test_outbox_without_path(self):
+        with self.assertRaises(MissingTrackerConfigurationError):
+            self.backend.outbox
+
+    @override_settings(TRACKERS={'mytracker': {
+        'OUTBOX_PATH': '/tmp/outbox.sqlite3'}})
+    @mock.patch('catracking.backends.outbox.outbox.get_outbox')
+    def test_outbox(self, p_get_outbox):
+        self.assertEquals(p_get_outbox.return_value, self.backend.outbox)
+        p_get_outbox.assert_called_once_with('/tmp/outbox.sqlite3', 'NORMAL')
+
+    @mock.patch('catracking.backends.outbox.OutboxBackend.outbox')
+    def test_send(self, p_outbox):
+        self.backend.send(['1', '2'])
+        p_outbox.append.assert_called_once_with(
+            'mytracker', 'https://my.tracker.com', ['1', '2'])
+
+    @mock.patch('catracking.backends.outbox.OutboxBackend.outbox')
+    def test_send_empty_bucket(self, p_outbox):
+        self.backend.send([])
+        p_outbox.append.assert_not_called()
+
+
+@override_settings(TRACKERS={'mytracker': {'DISPATCH': 'memory'}})
+class MemoryBackendTest(TestCase):
+
+    def setUp(self):
+        backends._backends.clear()
+        memory.clear()
+
+    def tearDown(self):
+        memory.clear()
+
+    def test_send(self):
+        MyTracker().send(['1', '2'])
+        self.assertEquals([
+            ('mytracker', 'https://my.tracker.com', '1'),
+            ('mytracker', 'https://my.tracker.com', '2')
+        ], memory.sent)
+        self.assertEquals('2', memory.sent[-1].payload)
+
+    def test_clear(self):
+        MyTracker().send(['1'])
+        memory.clear()
+        self.assertEquals([], memory.sent)
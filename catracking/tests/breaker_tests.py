@@ -0,0 +1,108 @@
+import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from catracking import breaker
+
+
+class CircuitBreakerTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.breaker = breaker.CircuitBreaker(
+            '/endpoint', threshold=2, window=60, reset_timeout=30,
+            check_interval=0)
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_init_defaults(self):
+        circuit_breaker = breaker.CircuitBreaker('/endpoint')
+        self.assertEquals(breaker.DEFAULT_THRESHOLD, circuit_breaker.threshold)
+        self.assertEquals(
+            breaker.DEFAULT_RESET_TIMEOUT, circuit_breaker.reset_timeout)
+
+    def test_allow_closed(self):
+        self.assertTrue(self.breaker.allow())
+
+    def test_record_failure_below_threshold(self):
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow())
+
+    @mock.patch('catracking.breaker.logger.warning')
+    def test_record_failure_opens_circuit(self, p_warning):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.assertFalse(self.breaker.allow())
+        p_warning.assert_called_once()
+
+    def test_record_success_resets_failures(self):
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertTrue(self.breaker.allow())
+
+    @mock.patch('catracking.breaker.logger.warning')
+    def test_open_circuit_is_shared(self, p_warning):
+        other = breaker.CircuitBreaker(
+            '/endpoint', threshold=2, check_interval=0)
+        self.breaker.record_failure()
+        other.record_failure()
+        self.assertFalse(self.breaker.allow())
+        self.assertFalse(other.allow())
+
+    def test_other_endpoint_not_affected(self):
+        other = breaker.CircuitBreaker('/other', threshold=1)
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.assertTrue(other.allow())
+
+    @mock.patch('catracking.breaker.time')
+    @mock.patch('catracking.breaker.logger.warning')
+    def test_allow_after_reset_timeout(self, p_warning, p_time):
+        p_time.return_value = 100
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        p_time.return_value = 131
+        self.assertTrue(self.breaker.allow())
+
+    @mock.patch('catracking.breaker.time')
+    def test_allow_checks_shared_state_once_per_interval(self, p_time):
+        self.breaker.check_interval = 1
+        p_time.return_value = 100
+        with mock.patch.object(self.breaker.cache, 'get') as p_get:
+            p_get.return_value = None
+            self.breaker.allow()
+            self.breaker.allow()
+            p_time.return_value = 101
+            self.breaker.allow()
+            self.assertEquals(2, p_get.call_count)
+
+    def test_record_success_without_failures_skips_cache(self):
+        with mock.patch.object(self.breaker.cache, 'delete') as p_delete:
+            self.breaker.record_success()
+            p_delete.assert_not_called()
+
+
+class GetBreakerTest(TestCase):
+
+    def setUp(self):
+        breaker._breakers.clear()
+
+    def tearDown(self):
+        breaker._breakers.clear()
+
+    def test_get_breaker(self):
+        circuit_breaker = breaker.get_breaker('ga', '/endpoint', {
+            'BREAKER_THRESHOLD': 1, 'BREAKER_WINDOW': 2,
+            'BREAKER_RESET_TIMEOUT': 3, 'BREAKER_CHECK_INTERVAL': 4})
+        self.assertEquals(1, circuit_breaker.threshold)
+        self.assertEquals(2, circuit_breaker.window)
+        self.assertEquals(3, circuit_breaker.reset_timeout)
+        self.assertEquals(4, circuit_breaker.check_interval)
+
+    def test_get_breaker_is_shared(self):
+        self.assertIs(
+            breaker.get_breaker('ga', '/endpoint', {}),
+            breaker.get_breaker('ga', '/endpoint', {}))
@@ -0,0 +1,292 @@
+import mock
+
+from django.db import DatabaseError
+from django.test import (
+    TestCase,
+    override_settings)
+
+from catracking import buffers
+from catracking.models import (
+    TrackingRequest,
+    TrackingRequestSummary)
+
+
+class TrackingRequestBufferTest(TestCase):
+
+    ROW = {
+        'tracker': 'ga', 'endpoint': '/endpoint', 'payload': 'p',
+        'response_code': 200}
+
+    def setUp(self):
+        self.buffer = buffers.TrackingRequestBuffer(size=3, age=60)
+
+    def test_init_defaults(self):
+        buffer = buffers.TrackingRequestBuffer()
+        self.assertEquals(buffers.DEFAULT_SIZE, buffer.size)
+        self.assertEquals(buffers.DEFAULT_AGE, buffer.age)
+        self.assertEquals(0, len(buffer))
+
+    def test_add_below_thresholds(self):
+        self.buffer.add(**self.ROW)
+        self.buffer.add(**self.ROW)
+        self.assertEquals(2, len(self.buffer))
+        self.assertEquals(0, TrackingRequest.objects.count())
+
+    def test_add_size_threshold(self):
+        for _ in range(3):
+            self.buffer.add(**self.ROW)
+        self.assertEquals(0, len(self.buffer))
+        self.assertEquals(3, TrackingRequest.objects.count())
+
+    @mock.patch('catracking.buffers.time')
+    def test_add_age_threshold(self, p_time):
+        p_time.return_value = 100
+        self.buffer.add(**self.ROW)
+        p_time.return_value = 160
+        self.buffer.add(**self.ROW)
+        self.assertEquals(0, len(self.buffer))
+        self.assertEquals(2, TrackingRequest.objects.count())
+
+    def test_add_keeps_hit_time(self):
+        self.buffer.add(**self.ROW)
+        created = self.buffer.rows[0].created
+        self.buffer.flush()
+        self.assertEquals(created, TrackingRequest.objects.get().created)
+
+    def test_flush_single_query(self):
+        self.buffer.add(**self.ROW)
+        self.buffer.add(**self.ROW)
+        with self.assertNumQueries(1):
+            self.buffer.flush()
+        self.assertEquals(2, TrackingRequest.objects.count())
+
+    def test_flush_empty(self):
+        with self.assertNumQueries(0):
+            self.buffer.flush()
+
+    @mock.patch('catracking.buffers.logger.exception')
+    def test_flush_failure_keeps_rows(self, p_exception):
+        self.buffer.add(**self.ROW)
+        with mock.patch.object(
+                TrackingRequest.objects, 'bulk_create',
+                side_effect=DatabaseError):
+            self.buffer.flush()
+        p_exception.assert_called_once()
+        self.assertEquals(1, len(self.buffer))
+        self.buffer.flush()
+        self.assertEquals(0, len(self.buffer))
+        self.assertEquals(1, TrackingRequest.objects.count())
+
+    @mock.patch('catracking.buffers.logger')
+    def test_flush_failure_drops_oldest_rows(self, p_logger):
+        buffer = buffers.TrackingRequestBuffer(size=2, age=60)
+        with mock.patch.object(
+                TrackingRequest.objects, 'bulk_create',
+                side_effect=DatabaseError):
+            for index in range(25):
+                buffer.add(**dict(self.ROW, payload=str(index)))
+        self.assertEquals(20, len(buffer))
+        self.assertEquals('5', buffer.rows[0].payload)
+        self.assertEquals(5, sum(
+            kwargs['extra']['rows']
+            for args, kwargs in p_logger.warning.call_args_list))
+
+    @mock.patch('catracking.buffers.time')
+    def test_flush_expired(self, p_time):
+        p_time.return_value = 100
+        self.buffer.add(**self.ROW)
+        p_time.return_value = 159
+        self.assertFalse(self.buffer.flush_expired())
+        self.assertEquals(1, len(self.buffer))
+        p_time.return_value = 160
+        self.assertTrue(self.buffer.flush_expired())
+        self.assertEquals(0, len(self.buffer))
+        self.assertEquals(1, TrackingRequest.objects.count())
+
+    def test_flush_expired_empty(self):
+        with self.assertNumQueries(0):
+            self.assertFalse(self.buffer.flush_expired())
+
+
+class TrackingRequestBufferPolicyTest(TestCase):
+
+    SUCCESS = dict(TrackingRequestBufferTest.ROW)
+    FAILURE = dict(TrackingRequestBufferTest.ROW, response_code=500)
+
+    def buffer(self, policy, **kwargs):
+        return buffers.TrackingRequestBuffer(policy=policy, **kwargs)
+
+    def test_log_all(self):
+        buffer = self.buffer(buffers.LOG_POLICY_ALL)
+        buffer.log(**self.SUCCESS)
+        buffer.log(**self.FAILURE)
+        self.assertEquals(2, TrackingRequest.objects.count())
+
+    def test_log_failures(self):
+        buffer = self.buffer(buffers.LOG_POLICY_FAILURES)
+        buffer.log(**self.SUCCESS)
+        buffer.log(**self.FAILURE)
+        self.assertEquals(
+            [500], list(TrackingRequest.objects.values_list(
+                'response_code', flat=True)))
+
+    def test_sampled_is_deterministic(self):
+        buffer = self.buffer(buffers.LOG_POLICY_SAMPLE, sample_rate=0.5)
+        self.assertEquals(buffer.sampled('a=1'), buffer.sampled('a=1'))
+
+    def test_sampled_ignores_volatile_parameters(self):
+        buffer = self.buffer(
+            buffers.LOG_POLICY_SAMPLE, sample_rate=0.5, tracker_ident='ga')
+        self.assertEquals(1, len(set(
+            buffer.sampled('cid=7&ec=a&qt={0}&z={1}'.format(queue_time, z))
+            for queue_time in (0, 100, 5000) for z in range(50))))
+        self.assertEquals(2, len(set(
+            buffer.sampled('cid={0}&ec=a&z=1'.format(cid))
+            for cid in range(50))))
+
+    def test_sampled_rate(self):
+        buffer = self.buffer(buffers.LOG_POLICY_SAMPLE, sample_rate=0.1)
+        sampled = [buffer.sampled('z={}'.format(i)) for i in range(10000)]
+        self.assertTrue(800 < sum(sampled) < 1200)
+
+    def test_sampled_no_rate(self):
+        buffer = self.buffer(buffers.LOG_POLICY_SAMPLE, sample_rate=0)
+        self.assertFalse(buffer.sampled('a=1'))
+
+    def test_sampled_full_rate(self):
+        buffer = self.buffer(buffers.LOG_POLICY_SAMPLE, sample_rate=1)
+        self.assertTrue(buffer.sampled('a=1'))
+
+    def test_log_sample(self):
+        buffer = self.buffer(buffers.LOG_POLICY_SAMPLE)
+        with mock.patch.object(buffer, 'sampled', side_effect=[True, False]):
+            buffer.log(**self.SUCCESS)
+            buffer.log(**self.SUCCESS)
+        buffer.log(**self.FAILURE)
+        self.assertEquals(2, TrackingRequest.objects.count())
+
+    def test_log_aggregate(self):
+        buffer = self.buffer(buffers.LOG_POLICY_AGGREGATE, age=60)
+        buffer.log(**self.SUCCESS)
+        buffer.log(**self.SUCCESS)
+        buffer.log(**self.FAILURE)
+        self.assertEquals(
+            [500], list(TrackingRequest.objects.values_list(
+                'response_code', flat=True)))
+        self.assertEquals(0, TrackingRequestSummary.objects.count())
+        buffer.flush()
+        self.assertEquals(
+            {200: 2, 500: 1}, dict(TrackingRequestSummary.objects.values_list(
+                'response_code', 'count')))
+
+    def test_flush_counters_increments_existing_summary(self):
+        buffer = self.buffer(buffers.LOG_POLICY_AGGREGATE, age=60)
+        buffer.log(**self.SUCCESS)
+        buffer.flush()
+        buffer.log(**self.SUCCESS)
+        buffer.flush()
+        self.assertEquals(2, TrackingRequestSummary.objects.get().count)
+
+    @mock.patch('catracking.buffers.time')
+    def test_count_age_threshold(self, p_time):
+        buffer = self.buffer(buffers.LOG_POLICY_AGGREGATE, age=60)
+        p_time.return_value = 100
+        buffer.log(**self.SUCCESS)
+        p_time.return_value = 160
+        buffer.log(**self.SUCCESS)
+        self.assertEquals({}, buffer.counters)
+        self.assertEquals(2, TrackingRequestSummary.objects.get().count)
+
+    @mock.patch('catracking.buffers.logger.exception')
+    def test_flush_counters_failure_keeps_counters(self, p_exception):
+        buffer = self.buffer(buffers.LOG_POLICY_AGGREGATE, age=60)
+        buffer.log(**self.SUCCESS)
+        with mock.patch.object(
+                TrackingRequestSummary.objects, 'filter',
+                side_effect=DatabaseError):
+            buffer.flush()
+        p_exception.assert_called_once()
+        self.assertEquals([1], list(buffer.counters.values()))
+        buffer.flush()
+        self.assertEquals(1, TrackingRequestSummary.objects.get().count)
+
+
+class GetBufferTest(TestCase):
+
+    def setUp(self):
+        buffers._buffers.clear()
+
+    def tearDown(self):
+        buffers._buffers.clear()
+
+    def test_get_buffer_defaults(self):
+        buffer = buffers.get_buffer('ga')
+        self.assertEquals(buffers.DEFAULT_SIZE, buffer.size)
+        self.assertEquals(buffers.DEFAULT_AGE, buffer.age)
+        self.assertEquals(buffers.LOG_POLICY_ALL, buffer.policy)
+        self.assertEquals(buffers.DEFAULT_SAMPLE_RATE, buffer.sample_rate)
+
+    @override_settings(TRACKERS={'ga': {
+        'LOG_POLICY': 'sample', 'LOG_SAMPLE_RATE': 0.5}})
+    def test_get_buffer_policy(self):
+        buffer = buffers.get_buffer('ga')
+        self.assertEquals(buffers.LOG_POLICY_SAMPLE, buffer.policy)
+        self.assertEquals(0.5, buffer.sample_rate)
+
+    @override_settings(TRACKERS={'ga': {
+        'LOG_BUFFER_SIZE': 100, 'LOG_BUFFER_AGE': 10}})
+    @mock.patch('catracking.buffers.start_flusher')
+    def test_get_buffer_settings(self, p_start_flusher):
+        buffer = buffers.get_buffer('ga')
+        self.assertEquals(100, buffer.size)
+        self.assertEquals(10, buffer.age)
+        p_start_flusher.assert_called_once_with()
+
+    @mock.patch('catracking.buffers.start_flusher')
+    def test_get_buffer_unbuffered_without_flusher(self, p_start_flusher):
+        buffers.get_buffer('ga')
+        p_start_flusher.assert_not_called()
+
+    @mock.patch('catracking.buffers.threading.Thread')
+    def test_start_flusher(self, p_thread):
+        flusher = buffers._flusher
+        buffers._flusher = (None, None)
+        try:
+            buffers.start_flusher()
+            buffers.start_flusher()
+        finally:
+            buffers._flusher = flusher
+        p_thread.assert_called_once_with(
+            target=buffers.run_flusher, name='catracking-buffers')
+        p_thread.return_value.start.assert_called_once_with()
+
+    @override_settings(TRACKERS={'ga': {'LOG_BUFFER_SIZE': 100}})
+    @mock.patch('catracking.buffers.connection')
+    @mock.patch('catracking.buffers.start_flusher')
+    def test_flush_expired(self, p_start_flusher, p_connection):
+        buffer = buffers.get_buffer('ga')
+        buffers.flush_expired()
+        p_connection.close.assert_not_called()
+        buffer.add(**TrackingRequestBufferTest.ROW)
+        buffer.oldest -= buffer.age
+        buffers.flush_expired()
+        p_connection.close.assert_called_once_with()
+        self.assertEquals(1, TrackingRequest.objects.count())
+
+    def test_get_buffer_is_shared(self):
+        self.assertIs(buffers.get_buffer('ga'), buffers.get_buffer('ga'))
+
+    @mock.patch('os.getpid')
+    def test_get_buffer_after_fork(self, p_getpid):
+        p_getpid.return_value = 1
+        buffer = buffers.get_buffer('ga')
+        p_getpid.return_value = 2
+        self.assertIsNot(buffer, buffers.get_buffer('ga'))
+
+    @override_settings(TRACKERS={'ga': {'LOG_BUFFER_SIZE': 100}})
+    @mock.patch('catracking.buffers.start_flusher', mock.Mock())
+    def test_flush_all(self):
+        buffers.get_buffer('ga').add(**TrackingRequestBufferTest.ROW)
+        buffers.flush_all()
+        self.assertEquals(0, len(buffers.get_buffer('ga')))
+        self.assertEquals(1, TrackingRequest.objects.count())
@@ -0,0 +1,89 @@
+from django.test import (
+    TestCase,
+    override_settings)
+
+from catracking.checks import check_trackers
+
+LOCMEM = 'django.core.cache.backends.locmem.LocMemCache'
+
+
+@override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': '/tmp/catracking'}})
+class CheckTrackersTest(TestCase):
+
+    def test_no_trackers(self):
+        self.assertEquals([], check_trackers(None))
+
+    @override_settings(TRACKERS={'other': {}})
+    def test_unknown_tracker(self):
+        self.assertEquals([], check_trackers(None))
+
+    @override_settings(TRACKERS={'ga': {
+        'PROPERTY': 'UA-1', 'DOCUMENT_HOSTNAME': 'example.com'}})
+    def test_valid(self):
+        self.assertEquals([], check_trackers(None))
+
+    @override_settings(TRACKERS={'ga': {}})
+    def test_missing_keys(self):
+        errors = check_trackers(None)
+        self.assertEquals(
+            ['Missing PROPERTY in ga tracker configuration',
+             'Missing DOCUMENT_HOSTNAME in ga tracker configuration'],
+            [error.msg for error in errors])
+        self.assertEquals(
+            {'catracking.E002'}, {error.id for error in errors})
+
+    @override_settings(TRACKERS={'ga': 'UA-1'})
+    def test_not_a_dict(self):
+        errors = check_trackers(None)
+        self.assertEquals(1, len(errors))
+        self.assertEquals('catracking.E001', errors[0].id)
+
+    @override_settings(TRACKERS={'ga': {
+        'PROPERTY': 'UA-1', 'DOCUMENT_HOSTNAME': 'example.com',
+        'INSTRUMENTATION': ['multiprocess']}})
+    def test_multiprocess_without_metrics_dir(self):
+        errors = check_trackers(None)
+        self.assertEquals(['catracking.E003'], [error.id for error in errors])
+
+    @override_settings(TRACKERS={'ga': {
+        'PROPERTY': 'UA-1', 'DOCUMENT_HOSTNAME': 'example.com',
+        'INSTRUMENTATION': ['multiprocess'], 'METRICS_DIR': '/tmp'}})
+    def test_multiprocess(self):
+        self.assertEquals([], check_trackers(None))
+
+    @override_settings(
+        TRACKERS={'ga': {
+            'PROPERTY': 'UA-1', 'DOCUMENT_HOSTNAME': 'example.com'}},
+        CACHES={'default': {
+            'BACKEND': LOCMEM}})
+    def test_local_breaker_cache(self):
+        errors = check_trackers(None)
+        self.assertEquals(['catracking.W001'], [error.id for error in errors])
+
+    @override_settings(
+        TRACKERS={'ga': {
+            'PROPERTY': 'UA-1', 'DOCUMENT_HOSTNAME': 'example.com',
+            'BREAKER_CACHE': 'shared'}},
+        CACHES={
+            'default': {'BACKEND': LOCMEM},
+            'shared': {
+                'BACKEND':
+                    'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': '/tmp/catracking'}})
+    def test_shared_breaker_cache(self):
+        self.assertEquals([], check_trackers(None))
+
+    @override_settings(TRACKERS={'ga': {
+        'PROPERTY': 'UA-1', 'DOCUMENT_HOSTNAME': 'example.com',
+        'COMPILE_IN_WORKER': True, 'DISPATCH': 'thread'}})
+    def test_compile_in_worker_without_celery(self):
+        errors = check_trackers(None)
+        self.assertEquals(['catracking.E004'], [error.id for error in errors])
+
+    @override_settings(TRACKERS={'ga': {
+        'PROPERTY': 'UA-1', 'DOCUMENT_HOSTNAME': 'example.com',
+        'COMPILE_IN_WORKER': True, 'DISPATCH': 'bulk'}})
+    def test_compile_in_worker(self):
+        self.assertEquals([], check_trackers(None))
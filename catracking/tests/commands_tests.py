@@ -0,0 +1,383 @@
+import arrow
+import mock
+import os
+import requests
+import shutil
+import six
+import tempfile
+
+from time import time
+
+from model_mommy import mommy
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import (
+    TestCase,
+    override_settings)
+
+from catracking import (
+    multiprocess,
+    outbox)
+from catracking.backends.outbox import OutboxBackend
+from catracking.ga.core import GoogleAnalyticsTracker
+from catracking.management.commands import (
+    drain_tracking_outbox,
+    replay_tracking_requests,
+    tracking_request_stats)
+from catracking.models import (
+    TrackingDeadLetter,
+    TrackingRequest)
+from catracking.tests.stub import StubEndpoint
+
+OUTBOX_PATH = os.path.join(tempfile.gettempdir(), 'catracking-tests')
+
+
+@override_settings(TRACKERS={'ga': {
+    'DISPATCH': 'outbox', 'OUTBOX_PATH': OUTBOX_PATH}})
+class DrainTrackingOutboxTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'outbox.sqlite3')
+        self.outbox = outbox.Outbox(self.path)
+        self.command = drain_tracking_outbox.Command()
+        patcher = mock.patch.object(
+            OutboxBackend, 'outbox', new_callable=mock.PropertyMock,
+            return_value=self.outbox)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_trackers(self):
+        self.assertEquals([GoogleAnalyticsTracker], self.command.trackers())
+
+    @override_settings(TRACKERS={'ga': {}})
+    def test_trackers_not_using_outbox(self):
+        self.assertEquals([], self.command.trackers())
+
+    def test_drain_to_stub_endpoint(self):
+        with StubEndpoint() as stub:
+            self.outbox.append('ga', stub.url('/collect'), ['a=1', 'a=2'])
+            call_command('drain_tracking_outbox', once=True)
+        self.assertEquals(
+            [('/collect', 'a=1'), ('/collect', 'a=2')],
+            [(path, payload.split('&qt=')[0])
+             for path, payload in stub.requests])
+        self.assertEquals(0, len(self.outbox))
+        self.assertEquals(2, TrackingRequest.objects.count())
+
+    @override_settings(TRACKERS={'ga': {
+        'DISPATCH': 'outbox', 'OUTBOX_PATH': OUTBOX_PATH, 'BATCH': True}})
+    def test_drain_batches_to_stub_endpoint(self):
+        payloads = ['a={}'.format(index) for index in range(25)]
+        with StubEndpoint() as stub:
+            self.outbox.append('ga', '/collect', payloads)
+            with mock.patch.object(
+                    GoogleAnalyticsTracker, 'BATCH_ENDPOINT',
+                    stub.url('/batch')):
+                call_command('drain_tracking_outbox', once=True, limit=30)
+        self.assertEquals(
+            [5, 20],
+            sorted(len(body.splitlines()) for _, body in stub.requests))
+        self.assertEquals(0, len(self.outbox))
+
+    def test_drain_server_error_keeps_payloads(self):
+        with StubEndpoint(status_code=503) as stub:
+            self.outbox.append('ga', stub.url('/collect'), ['a=1', 'a=2'])
+            call_command('drain_tracking_outbox', once=True)
+        self.assertEquals(1, len(stub.requests))
+        self.assertEquals(2, len(self.outbox))
+
+    def test_drain_client_error_acknowledges_payloads(self):
+        with StubEndpoint(status_code=400) as stub:
+            self.outbox.append('ga', stub.url('/collect'), ['a=1'])
+            call_command('drain_tracking_outbox', once=True)
+        self.assertEquals(0, len(self.outbox))
+        self.assertEquals(400, TrackingRequest.objects.get().response_code)
+
+    @mock.patch('catracking.transport.post')
+    def test_drain_connection_error_keeps_payloads(self, p_post):
+        p_post.side_effect = requests.ConnectionError
+        self.outbox.append('ga', '/collect', ['a=1'])
+        self.assertFalse(self.command.drain(10))
+        self.assertEquals(1, len(self.outbox))
+
+    @mock.patch('catracking.delivery.logger.warning')
+    def test_drain_acknowledges_expired_payloads(self, p_warning):
+        with StubEndpoint() as stub:
+            self.outbox.append(
+                'ga', stub.url('/collect'), ['t=event&qt=14399500'])
+            with mock.patch(
+                    'catracking.management.commands.drain_tracking_outbox.'
+                    'time', return_value=time() + 1):
+                call_command('drain_tracking_outbox', once=True)
+        self.assertEquals([], stub.requests)
+        self.assertEquals(0, len(self.outbox))
+        self.assertEquals(1, p_warning.call_count)
+
+    def test_drain_empty(self):
+        self.assertFalse(self.command.drain(10))
+
+    @mock.patch('catracking.management.commands.drain_tracking_outbox.sleep')
+    def test_handle_waits_when_empty(self, p_sleep):
+        p_sleep.side_effect = KeyboardInterrupt
+        with self.assertRaises(KeyboardInterrupt):
+            call_command('drain_tracking_outbox', interval=5)
+        p_sleep.assert_called_once_with(5)
+
+
+@override_settings(TRACKERS={'ga': {}})
+class ReplayTrackingRequestsTest(TestCase):
+
+    def setUp(self):
+        self.command = replay_tracking_requests.Command()
+        self.command.stats = dict.fromkeys(
+            ('rows', 'sent', 'batches', 'failed', 'expired'), 0)
+        self.command.expired_rows = []
+        self.command.tracker = GoogleAnalyticsTracker
+
+    def make(self, payload, response_code=500, tracker='ga', **kwargs):
+        return mommy.make(
+            'catracking.TrackingRequest', tracker=tracker, payload=payload,
+            response_code=response_code, **kwargs)
+
+    def replay(self, stub, **options):
+        out = six.StringIO()
+        with mock.patch.object(
+                GoogleAnalyticsTracker, 'BATCH_ENDPOINT', stub.url('/batch')):
+            call_command('replay_tracking_requests', stdout=out, **options)
+        return out.getvalue()
+
+    def test_tracker_class_unknown(self):
+        with self.assertRaises(CommandError):
+            self.command.tracker_class('unknown')
+
+    def test_queryset_failed_only(self):
+        failed = self.make('t=event', 500)
+        self.make('t=event', 200)
+        self.make('t=event', 299)
+        redirected = self.make('t=event', 302)
+        self.make('t=event', 500, tracker='other')
+        self.assertEquals(
+            [failed, redirected],
+            list(self.command.queryset('ga', None, None)))
+
+    def test_queryset_time_range(self):
+        self.make('t=event', created=arrow.get(2017, 1, 1).datetime)
+        in_range = self.make('t=event', created=arrow.get(2017, 1, 2).datetime)
+        self.make('t=event', created=arrow.get(2017, 1, 3).datetime)
+        self.assertEquals(
+            [in_range],
+            list(self.command.queryset('ga', '2017-01-02', '2017-01-03')))
+
+    def test_hits(self):
+        row = self.make(
+            't=event&z=1\nt=event&z=2',
+            created=arrow.utcnow().shift(minutes=-1).datetime)
+        hits = list(self.command.hits([row]))
+        self.assertEquals(2, len(hits))
+        self.assertEquals(row.id, hits[0][0])
+        self.assertTrue(hits[0][1].startswith('t=event&qt='))
+        self.assertTrue(hits[0][1].endswith('&z=1'))
+
+    def test_hits_expired(self):
+        row = self.make(
+            't=event', created=arrow.utcnow().shift(hours=-5).datetime)
+        self.assertEquals([], list(self.command.hits([row])))
+        self.assertEquals(1, self.command.stats['expired'])
+        self.assertEquals([row.id], self.command.expired_rows)
+
+    @mock.patch('catracking.delivery.logger.warning')
+    def test_replay_deletes_expired_rows(self, p_warning):
+        expired = self.make(
+            't=event&el=old',
+            created=arrow.utcnow().shift(hours=-5).datetime)
+        replayed = self.make('t=event&el=new')
+        with StubEndpoint() as stub:
+            out = self.replay(stub)
+        self.assertEquals(1, len(stub.requests))
+        self.assertIn('1 expired', out)
+        self.assertFalse(
+            TrackingRequest.objects.filter(pk=expired.pk).exists())
+        self.assertEquals(
+            200, TrackingRequest.objects.get(pk=replayed.pk).response_code)
+        p_warning.assert_called_once()
+
+    @override_settings(TRACKERS={'ga': {'QUEUE_TIME_EXPIRED': 'dead_letter'}})
+    def test_replay_dead_letters_expired_hits(self):
+        self.make(
+            't=event&el=old',
+            created=arrow.utcnow().shift(hours=-5).datetime)
+        with StubEndpoint() as stub:
+            self.replay(stub)
+        self.assertEquals([], stub.requests)
+        self.assertFalse(TrackingRequest.objects.exists())
+        self.assertEquals(
+            't=event&el=old', TrackingDeadLetter.objects.get().payload)
+
+    def test_replay_to_stub_endpoint(self):
+        rows = [self.make('t=event&el={}'.format(i)) for i in range(25)]
+        self.make('t=event&el=ok', 200)
+        with StubEndpoint() as stub:
+            out = self.replay(stub, workers=2)
+        self.assertEquals(
+            [5, 20],
+            sorted(len(body.splitlines()) for _, body in stub.requests))
+        self.assertEquals({'/batch'}, {path for path, _ in stub.requests})
+        self.assertIn('25 rows, 25 hits sent in 2 batches', out)
+        self.assertEquals(
+            [200] * 25, [TrackingRequest.objects.get(pk=row.pk).response_code
+                         for row in rows])
+
+    def test_replay_with_window(self):
+        for i in range(3):
+            self.make('t=event')
+        with StubEndpoint() as stub:
+            with mock.patch.object(
+                    GoogleAnalyticsTracker, 'BATCH_MAX_HITS', 1):
+                out = self.replay(stub, window=1)
+        self.assertEquals(3, len(stub.requests))
+        self.assertEquals(4, out.count('hits/s'))
+
+    @mock.patch('catracking.transport.post')
+    def test_replay_connection_error(self, p_post):
+        p_post.side_effect = requests.ConnectionError
+        row = self.make('t=event')
+        with StubEndpoint() as stub:
+            out = self.replay(stub)
+        self.assertIn('1 failed', out)
+        self.assertEquals(500, TrackingRequest.objects.get(
+            pk=row.pk).response_code)
+
+    def test_replay_without_batch_endpoint(self):
+        self.make('t=event&el=1')
+        self.make('t=event&el=2')
+        with StubEndpoint() as stub:
+            with mock.patch.object(
+                    GoogleAnalyticsTracker, 'ENDPOINT', stub.url('/collect')):
+                with mock.patch.object(
+                        GoogleAnalyticsTracker, 'BATCH_ENDPOINT', None):
+                    call_command(
+                        'replay_tracking_requests', stdout=six.StringIO())
+        self.assertEquals(
+            ['/collect', '/collect'], [path for path, _ in stub.requests])
+
+
+class RateLimiterTest(TestCase):
+
+    @mock.patch('catracking.management.commands.replay_tracking_requests.'
+                'sleep')
+    def test_acquire_no_rate(self, p_sleep):
+        limiter = replay_tracking_requests.RateLimiter(0)
+        limiter.acquire(1000)
+        p_sleep.assert_not_called()
+
+    @mock.patch('catracking.management.commands.replay_tracking_requests.'
+                'sleep')
+    @mock.patch('catracking.management.commands.replay_tracking_requests.'
+                'time')
+    def test_acquire(self, p_time, p_sleep):
+        p_time.return_value = 100
+        limiter = replay_tracking_requests.RateLimiter(10)
+        limiter.acquire(10)
+        p_sleep.assert_not_called()
+        limiter.acquire(5)
+        p_sleep.assert_called_once_with(0.5)
+
+
+class TrackingMetricsTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        multiprocess.CounterFile(os.path.join(
+            self.directory, 'ga-1.counters')).add(
+                ('catracking_hits_total', (('tracker', 'ga'),)), 3)
+
+    def call(self, *args):
+        stdout = six.StringIO()
+        call_command('tracking_metrics', *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_dir(self):
+        self.assertIn(
+            'catracking_hits_total{tracker="ga"} 3\n',
+            self.call('--dir', self.directory))
+
+    def test_metrics_dir(self):
+        with override_settings(TRACKERS={'ga': {
+                'METRICS_DIR': self.directory}}):
+            self.assertIn(
+                'catracking_hits_total{tracker="ga"} 3\n', self.call())
+
+
+class TrackingRequestStatsTest(TestCase):
+
+    def setUp(self):
+        created = arrow.get('2017-07-14T02:40:00+00:00')
+        for index in range(100):
+            mommy.make(
+                TrackingRequest, tracker='ga', response_code=200,
+                payload='v=1&t=event&ec=c',
+                created=created.shift(seconds=index).datetime,
+                hit_created=created.shift(seconds=index - 2).datetime,
+                queue_delay=(index + 1) / 1000.0, round_trip=0.1,
+                payload_size=index + 1)
+        mommy.make(
+            TrackingRequest, tracker='ga', response_code=200,
+            payload='v=1&t=event\nv=1&t=pageview',
+            created=created.datetime)
+        mommy.make(
+            TrackingRequest, tracker='other', response_code=200,
+            payload='v=1&t=pageview', created=created.datetime)
+
+    def call(self, *args):
+        stdout = six.StringIO()
+        call_command('tracking_request_stats', *args, stdout=stdout)
+        return stdout.getvalue().splitlines()
+
+    def test_hit_type(self):
+        hit_type = tracking_request_stats.hit_type
+        self.assertEquals('event', hit_type('v=1&t=event&ec=c'))
+        self.assertEquals('pageview', hit_type('t=pageview&v=1'))
+        self.assertEquals('mixed', hit_type('v=1&t=event\nv=1&t=pageview'))
+        self.assertEquals('event', hit_type('v=1&t=event\nv=1&t=event'))
+        self.assertEquals('-', hit_type('v=1&ut=event'))
+        self.assertEquals('-', hit_type(''))
+
+    def test_stats(self):
+        lines = self.call(
+            '--since', '2017-07-14T02:40:00+00:00',
+            '--until', '2017-07-14T02:41:40+00:00', '--tracker', 'ga')
+        self.assertEquals(
+            ['tracker', 'type', 'requests', 'per', 'second', 'metric',
+             'p50', 'p95', 'p99'], lines[0].split())
+        self.assertEquals(
+            ['ga', 'event', '100', '1.00', 'queue_delay', '(ms)',
+             '50.0', '95.0', '99.0'], lines[1].split())
+        self.assertEquals(
+            ['round_trip', '(ms)', '100.0', '100.0', '100.0'],
+            lines[2].split())
+        self.assertEquals(
+            ['end_to_end', '(ms)', '2000.0', '2000.0', '2000.0'],
+            lines[3].split())
+        self.assertEquals(
+            ['payload_size', '(B)', '50.0', '95.0', '99.0'],
+            lines[4].split())
+        self.assertEquals(['ga', 'mixed', '1', '0.01'], lines[5].split())
+        self.assertEquals(6, len(lines))
+
+    def test_stats_window(self):
+        lines = self.call(
+            '--since', '2017-07-14T02:41:00+00:00',
+            '--until', '2017-07-14T02:41:10+00:00')
+        self.assertEquals(
+            ['ga', 'event', '10', '1.00', 'queue_delay', '(ms)',
+             '65.0', '70.0', '70.0'], lines[1].split())
+        self.assertEquals(5, len(lines))
+
+    def test_stats_empty(self):
+        self.assertEquals(1, len(self.call()))
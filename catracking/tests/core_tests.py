@@ -7,6 +7,59 @@ from django.test import (
 from catracking import core
 
 
+class TrackerConfigTest(TestCase):
+
+    def setUp(self):
+        self.config = core.TrackerConfig('ga', {'PROPERTY': 'UA-1'})
+
+    def test_attribute(self):
+        self.assertEquals('UA-1', self.config.PROPERTY)
+
+    def test_missing_attribute(self):
+        with self.assertRaises(core.MissingTrackerConfigurationError):
+            self.config.DOCUMENT_HOSTNAME
+
+    def test_private_attribute(self):
+        with self.assertRaises(AttributeError):
+            self.config._missing
+
+    def test_immutable(self):
+        with self.assertRaises(AttributeError):
+            self.config.PROPERTY = 'UA-2'
+
+    def test_contains(self):
+        self.assertIn('PROPERTY', self.config)
+        self.assertNotIn('DOCUMENT_HOSTNAME', self.config)
+        self.assertNotIn('_ident', self.config)
+
+    def test_get(self):
+        self.assertEquals('UA-1', self.config.get('PROPERTY'))
+        self.assertEquals('UA-1', self.config.get('PROPERTY', 'UA-2'))
+        self.assertEquals(2, self.config.get('DOCUMENT_HOSTNAME', 2))
+        with self.assertRaises(core.MissingTrackerConfigurationError):
+            self.config.get('DOCUMENT_HOSTNAME')
+
+
+class GetConfigTest(TestCase):
+
+    def test_not_configured(self):
+        with self.assertRaises(core.TrackerNotConfiguredError):
+            core.get_config('ga')
+
+    @override_settings(TRACKERS={'ga': {'PROPERTY': 'UA-1'}})
+    def test_snapshot(self):
+        config = core.get_config('ga')
+        self.assertEquals('UA-1', config.PROPERTY)
+        self.assertIs(config, core.get_config('ga'))
+
+    @override_settings(TRACKERS={'ga': {'PROPERTY': 'UA-1'}})
+    def test_setting_changed(self):
+        core.get_config('ga')
+        with self.settings(TRACKERS={'ga': {'PROPERTY': 'UA-2'}}):
+            self.assertEquals('UA-2', core.get_config('ga').PROPERTY)
+        self.assertEquals('UA-1', core.get_config('ga').PROPERTY)
+
+
 class TrackerTest(TestCase):
 
     class MyAbstractTracker(core.Tracker):
@@ -20,11 +73,19 @@ class TrackerTest(TestCase):
         def __init__(self):
             pass
 
-        def send(self, payload_bucket):
-            super(TrackerTest.MyTracker, self).send(payload_bucket)
+        def send(self, payload_bucket, created=None):
+            super(TrackerTest.MyTracker, self).send(payload_bucket, created)
+
+    class MyBatchTracker(MyTracker):
+
+        BATCH_ENDPOINT = 'https://my.tracker.com/batch'
+        BATCH_MAX_HITS = 3
+        BATCH_MAX_BYTES = 10
+        HIT_MAX_BYTES = 4
 
     def setUp(self):
         self.tracker = self.MyTracker()
+        self.batch_tracker = self.MyBatchTracker()
 
     def test_abstract_init(self):
         with self.assertRaises(TypeError):
@@ -56,17 +117,98 @@ class TrackerTest(TestCase):
     def test_setttings_with_key(self):
         self.assertEquals(1, self.MyTracker.settings('valid_key'))
 
-    @mock.patch('catracking.core.SendTrackingDataTask.delay')
+    @override_settings(TRACKERS={'mytracker': {}})
+    def test_settings_with_default(self):
+        self.assertEquals(2, self.MyTracker.settings('invalid_key', 2))
+
+    @override_settings(TRACKERS={'mytracker': {'valid_key': 1}})
+    def test_settings_with_key_and_default(self):
+        self.assertEquals(1, self.MyTracker.settings('valid_key', 2))
+
+    def test_settings_default_without_trackers(self):
+        self.assertEquals(2, self.MyTracker.settings('invalid_key', 2))
+
+    @override_settings(TRACKERS={'mytracker': {'BATCH': True}})
+    def test_batch_enabled_without_batch_endpoint(self):
+        self.assertFalse(self.MyTracker.batch_enabled())
+
+    @override_settings(TRACKERS={'mytracker': {}})
+    def test_batch_enabled_not_configured(self):
+        self.assertFalse(self.MyBatchTracker.batch_enabled())
+
+    @override_settings(TRACKERS={'mytracker': {'BATCH': True}})
+    def test_batch_enabled(self):
+        self.assertTrue(self.MyBatchTracker.batch_enabled())
+
+    def test_batches_max_hits(self):
+        self.assertEquals(
+            ['1\n2\n3', '4'],
+            list(self.batch_tracker.batches(['1', '2', '3', '4'])))
+
+    def test_batches_max_bytes(self):
+        self.assertEquals(
+            ['aaaa\nbbbb', 'cc\ndd'],
+            list(self.batch_tracker.batches(['aaaa', 'bbbb', 'cc', 'dd'])))
+
+    @mock.patch('catracking.core.logger.warning')
+    def test_batches_hit_too_big(self, p_warning):
+        self.assertEquals(
+            ['a\nb'],
+            list(self.batch_tracker.batches(['a', 'bbbbb', 'b'])))
+        p_warning.assert_called_once()
+
+    def test_batches_empty(self):
+        self.assertEquals([], list(self.batch_tracker.batches([])))
+
+    @mock.patch('catracking.backends.celery.SendTrackingDataTask.delay')
     def test_send(self, p_send_tracking_data_task):
         self.tracker.send([1])
         p_send_tracking_data_task.assert_called_with(
-            'mytracker', 'https://my.tracker.com', 1)
+            'mytracker', 'https://my.tracker.com', 1, created=None,
+            enqueued=mock.ANY)
 
-    @mock.patch('catracking.core.SendTrackingDataTask.delay')
+    @mock.patch('catracking.backends.celery.SendTrackingDataTask.delay')
     def test_send_multiple_payloads(self, p_send_tracking_data_task):
-        self.tracker.send([1, 2, 3])
+        self.tracker.send([1, 2, 3], 10)
         p_send_tracking_data_task.assert_has_calls([
-            mock.call('mytracker', 'https://my.tracker.com', 1),
-            mock.call('mytracker', 'https://my.tracker.com', 2),
-            mock.call('mytracker', 'https://my.tracker.com', 3)
-        ])
+            mock.call('mytracker', 'https://my.tracker.com', payload,
+                      created=10, enqueued=mock.ANY)
+            for payload in (1, 2, 3)])
+
+    @override_settings(TRACKERS={'mytracker': {'DISPATCH': 'memory'}})
+    def test_send_backend(self):
+        with mock.patch('catracking.backends.memory.MemoryBackend.send') \
+                as p_send:
+            self.tracker.send([1, 2], 10)
+            p_send.assert_called_once_with([1, 2], 10)
+
+    def test_dispatch(self):
+        func = mock.MagicMock()
+        self.assertEquals(func.return_value, self.tracker.dispatch(func, 1))
+        func.assert_called_once_with(1)
+
+    def test_compile_dispatches(self):
+        func = mock.MagicMock()
+        with mock.patch.object(
+                self.tracker, 'send',
+                side_effect=lambda: self.tracker.dispatch(func, 1, 2)):
+            dispatches = self.tracker.compile_dispatches()
+        func.assert_not_called()
+        self.assertEquals(1, len(dispatches))
+        dispatches[0]()
+        func.assert_called_once_with(1, 2)
+        self.tracker.dispatch(func, 3)
+        func.assert_called_with(3)
+
+    def test_backend(self):
+        self.assertIs(self.MyTracker.backend(), self.MyTracker.backend())
+
+    def test_pack_with_payload(self):
+        self.assertEquals(
+            [[(1, 'aaaa'), (2, 'bbbb')], [(3, 'cc')]],
+            list(self.batch_tracker.pack(
+                [(1, 'aaaa'), (2, 'bbbb'), (3, 'cc')],
+                lambda item: item[1])))
+
+    def test_requeue(self):
+        self.assertEquals('a=1', self.MyTracker.requeue('a=1', 10))
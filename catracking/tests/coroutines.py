@@ -0,0 +1,13 @@
+"""
+Coroutines of the async tests, apart from them as python 2 can not parse
+them.
+"""
+import threading
+
+
+async def loop_thread(awaitable):
+    """
+    Awaits `awaitable` and returns the thread running the event loop.
+    """
+    await awaitable
+    return threading.current_thread()
@@ -0,0 +1,181 @@
+import mock
+import requests
+
+from datetime import datetime
+
+from django.test import (
+    TestCase,
+    override_settings)
+from django.utils import timezone
+
+from catracking import (
+    delivery,
+    instrumentation)
+from catracking.ga.core import GoogleAnalyticsTracker
+from catracking.models import (
+    TrackingDeadLetter,
+    TrackingRequest)
+
+
+class DeliverTest(TestCase):
+
+    def test_delivery_fields(self):
+        self.assertEquals({
+            'hit_created': datetime(2017, 7, 14, 2, 40, tzinfo=timezone.utc),
+            'queue_delay': 2,
+            'round_trip': 0.1,
+            'payload_size': 4,
+        }, delivery.delivery_fields(
+            u'p=\xe9', 1500000000, 1500000001, 1500000003, 0.1))
+
+    def test_delivery_fields_not_enqueued(self):
+        self.assertEquals({
+            'hit_created': None,
+            'queue_delay': None,
+            'round_trip': None,
+            'payload_size': 1,
+        }, delivery.delivery_fields('p'))
+
+    @mock.patch('catracking.delivery.time')
+    @mock.patch('catracking.delivery.transport.post')
+    def test_deliver_delivery_fields(self, p_post, p_time):
+        p_post.return_value.status_code = 200
+        p_time.return_value = 1500000010
+        delivery.deliver('ga', '/endpoint', 'p', 1500000000, 1500000004)
+        tracking_request = TrackingRequest.objects.get()
+        self.assertEquals(
+            datetime(2017, 7, 14, 2, 40, tzinfo=timezone.utc),
+            tracking_request.hit_created)
+        self.assertEquals(6, tracking_request.queue_delay)
+        self.assertIsNotNone(tracking_request.round_trip)
+        self.assertEquals(1, tracking_request.payload_size)
+
+    @override_settings(USE_TZ=False, TIME_ZONE='America/New_York')
+    @mock.patch('catracking.delivery.time')
+    @mock.patch('catracking.delivery.transport.post')
+    def test_deliver_delivery_fields_without_tz(self, p_post, p_time):
+        p_post.return_value.status_code = 200
+        p_time.return_value = 1500000010
+        self.assertEquals(
+            datetime(2017, 7, 13, 22, 40),
+            delivery.delivery_fields('p', 1500000000)['hit_created'])
+        delivery.deliver('ga', '/endpoint', 'p', 1500000000, 1500000004)
+        self.assertEquals(
+            datetime(2017, 7, 13, 22, 40),
+            TrackingRequest.objects.get().hit_created)
+
+    @mock.patch('catracking.delivery.transport.post')
+    def test_deliver(self, p_post):
+        p_post.return_value.status_code = 200
+        response = delivery.deliver('ga', '/endpoint', 'p')
+        self.assertEquals(p_post.return_value, response)
+        p_post.assert_called_once_with('ga', '/endpoint', 'p')
+        tracking_request = TrackingRequest.objects.get()
+        self.assertEquals('ga', tracking_request.tracker)
+        self.assertEquals('/endpoint', tracking_request.endpoint)
+        self.assertEquals('p', tracking_request.payload)
+        self.assertEquals(200, tracking_request.response_code)
+
+    @mock.patch('catracking.delivery.logger.error')
+    @mock.patch('catracking.delivery.transport.post')
+    def test_deliver_bad_response(self, p_post, p_error):
+        p_post.return_value.status_code = 500
+        delivery.deliver('ga', '/endpoint', 'p')
+        p_error.assert_called_once_with(
+            'Bad response status from tracker', extra={
+                'tracker': 'ga', 'endpoint': '/endpoint', 'payload': 'p'})
+
+    @mock.patch('catracking.delivery.logger.error')
+    @mock.patch('catracking.delivery.transport.post')
+    def test_deliver_or_dead_letter(self, p_post, p_error):
+        p_post.return_value.status_code = 200
+        self.assertEquals(
+            p_post.return_value,
+            delivery.deliver_or_dead_letter('ga', '/endpoint', 'p'))
+        self.assertFalse(TrackingDeadLetter.objects.exists())
+
+    @mock.patch('catracking.delivery.logger.error')
+    @mock.patch('catracking.delivery.transport.post')
+    def test_deliver_or_dead_letter_server_error(self, p_post, p_error):
+        p_post.return_value.status_code = 503
+        delivery.deliver_or_dead_letter('ga', '/batch', 'a\nb')
+        dead_letter = TrackingDeadLetter.objects.get()
+        self.assertEquals('a\nb', dead_letter.payload)
+        self.assertEquals('Bad response status 503', dead_letter.error)
+        self.assertEquals(1, TrackingRequest.objects.count())
+
+    @override_settings(TRACKERS={'ga': {'INSTRUMENTATION': ['memory']}})
+    @mock.patch('catracking.delivery.logger.error')
+    @mock.patch('catracking.delivery.transport.post')
+    def test_deliver_or_dead_letter_connection_failure(self, p_post, p_error):
+        instrumentation.aggregator.clear()
+        p_post.side_effect = requests.ConnectionError('refused')
+        self.assertIsNone(
+            delivery.deliver_or_dead_letter('ga', '/batch', 'a\nb'))
+        dead_letter = TrackingDeadLetter.objects.get()
+        self.assertEquals('refused', dead_letter.error)
+        self.assertEquals(1, dead_letter.attempts)
+        self.assertEquals(2, instrumentation.aggregator.count(
+            'ga', instrumentation.DROPS))
+        self.assertEquals(1, instrumentation.aggregator.count(
+            'ga', instrumentation.ROUND_TRIP_ERRORS))
+        instrumentation.aggregator.clear()
+
+
+class RequeueTest(TestCase):
+
+    ENDPOINT = GoogleAnalyticsTracker.ENDPOINT
+    BATCH_ENDPOINT = GoogleAnalyticsTracker.BATCH_ENDPOINT
+
+    def test_requeue(self):
+        self.assertEquals('t=event&qt=1500&z=1', delivery.requeue(
+            'ga', self.ENDPOINT, 't=event&qt=500&z=1', 10, 11))
+
+    def test_requeue_not_enqueued(self):
+        self.assertEquals('t=event', delivery.requeue(
+            'ga', self.ENDPOINT, 't=event', None))
+
+    def test_requeue_unknown_tracker(self):
+        self.assertEquals('t=event', delivery.requeue(
+            'mytracker', '/endpoint', 't=event', 10, 11))
+
+    @mock.patch('catracking.delivery.expire')
+    def test_requeue_batch(self, p_expire):
+        self.assertEquals('t=event&qt=1000\nt=event&qt=1001', delivery.requeue(
+            'ga', self.BATCH_ENDPOINT,
+            't=event\nt=event&qt=14400000\nt=event&qt=1', 10, 11))
+        p_expire.assert_called_once_with(
+            'ga', self.BATCH_ENDPOINT, ['t=event&qt=14400000'])
+
+    @mock.patch('catracking.delivery.expire')
+    def test_requeue_expired(self, p_expire):
+        self.assertIsNone(delivery.requeue(
+            'ga', self.ENDPOINT, 't=event', 10, 14411))
+        p_expire.assert_called_once_with('ga', self.ENDPOINT, ['t=event'])
+
+
+class ExpireTest(TestCase):
+
+    @mock.patch('catracking.delivery.logger.warning')
+    def test_expire_drop(self, p_warning):
+        delivery.expire('ga', '/endpoint', ['a=1', 'a=2'])
+        p_warning.assert_called_once_with(
+            'Tracking hits expired in the queue', extra={
+                'tracker': 'ga', 'endpoint': '/endpoint', 'hits': 2})
+        self.assertFalse(TrackingDeadLetter.objects.exists())
+
+    @override_settings(TRACKERS={'ga': {
+        'QUEUE_TIME_EXPIRED': 'dead_letter', 'INSTRUMENTATION': ['memory']}})
+    def test_expire_dead_letter(self):
+        instrumentation.aggregator.clear()
+        delivery.expire('ga', '/endpoint', ['a=1', 'a=2'])
+        self.assertEquals(
+            ['a=1', 'a=2'],
+            [dead_letter.payload for dead_letter in
+             TrackingDeadLetter.objects.order_by('id')])
+        dead_letter = TrackingDeadLetter.objects.first()
+        self.assertEquals('ga', dead_letter.tracker)
+        self.assertEquals(0, dead_letter.attempts)
+        self.assertEquals(delivery.EXPIRED_ERROR, dead_letter.error)
+        self.assertEquals(2, instrumentation.aggregator.count(
+            'ga', instrumentation.DROPS))
@@ -1,8 +1,16 @@
+import json
 import mock
 
 from collections import OrderedDict
+from decimal import Decimal
+from six.moves.urllib.parse import urlencode
 from time import time
 
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    from collections import MutableMapping
+
 from django.test import (
     TestCase,
     override_settings)
@@ -12,6 +20,8 @@ from catracking.ga import (
     parameters,
     metrics,
     events)
+from catracking.models import TrackingRequest
+from catracking.tests.stub import StubEndpoint
 
 
 class GoogleAnalyticsTrackerTest(TestCase):
@@ -64,11 +74,11 @@ class GoogleAnalyticsTrackerTest(TestCase):
         self.assertTrue(int(random_str) < 2147483647)
         self.assertTrue(timestamp <= str(int(time())))
 
-    @mock.patch('catracking.ga.core.RootHitChunk.__new__')
-    def test_get_root_chunk(self, p_init):
+    @mock.patch('catracking.ga.core.RootHitChunk')
+    def test_get_root_chunk(self, p_root_chunk):
         root_chunk = self.tracker.get_root_chunk()
-        p_init.assert_called_once()
-        self.assertTrue(bool(root_chunk))
+        p_root_chunk.assert_called_once_with(self.tracker.request)
+        self.assertEquals(p_root_chunk.return_value, root_chunk)
 
     @mock.patch('catracking.ga.core.RootHitChunk.__init__')
     def test_get_root_chunk_already_instantiated(self, p_init):
@@ -85,6 +95,71 @@ class GoogleAnalyticsTrackerTest(TestCase):
         self.assertIn(event, self.tracker.hits)
         self.assertIsInstance(event, core.EventHitChunk)
 
+    def test_requeue(self):
+        self.assertEquals(
+            't=event&el=a+b&qt=1500&z=1',
+            self.tracker.requeue('t=event&el=a+b&z=1', 1.5))
+
+    def test_sample_key(self):
+        self.assertEquals(
+            'v=1&cid=1.2\nv=1&cid=3.4',
+            self.tracker.sample_key(
+                'v=1&qt=100&cid=1.2&z=123\nv=1&cid=3.4&z=456'))
+
+    def test_requeue_adds_to_queue_time(self):
+        self.assertEquals(
+            't=event&qt=2000', self.tracker.requeue('t=event&qt=1000', 1))
+
+    def test_requeue_too_late(self):
+        self.assertIsNone(self.tracker.requeue('t=event', 4 * 60 * 60 + 1))
+
+    def test_requeue_no_delay(self):
+        self.assertEquals(
+            't=event&z=1', self.tracker.requeue('t=event&z=1', 0))
+
+    @mock.patch('catracking.core.Tracker.send')
+    @mock.patch('random.randint')
+    def test_send_queue_time(self, p_randint, p_send):
+        p_randint.return_value = 1
+        self.tracker._root_chunk = core.BaseMeasurementProtocolHit({'a': 1})
+        with mock.patch('catracking.ga.core.time', return_value=10):
+            self.tracker.new_event('Category', 'action', 'label')
+        with mock.patch('catracking.ga.core.time', return_value=12.5):
+            self.tracker.send()
+        self.assertEquals(
+            ['a=1&t=event&ec=category&ea=action&el=label&ev=0&ni=1'
+             '&qt=2500&z=1'], p_send.call_args[0][0])
+
+    @mock.patch('catracking.delivery.expire')
+    @mock.patch('catracking.core.Tracker.send')
+    def test_send_expired_hits(self, p_send, p_expire):
+        self.tracker._root_chunk = core.BaseMeasurementProtocolHit({'a': 1})
+        with mock.patch('catracking.ga.core.time', return_value=10):
+            self.tracker.new_event('Category', 'action', 'old')
+        with mock.patch('catracking.ga.core.time', return_value=14411):
+            self.tracker.new_event('Category', 'action', 'new')
+            self.tracker.send()
+        payloads = p_send.call_args[0][0]
+        self.assertEquals(1, len(payloads))
+        self.assertIn('el=new', payloads[0])
+        p_expire.assert_called_once_with('ga', self.tracker.ENDPOINT, [
+            mock.ANY])
+        self.assertIn('el=old', p_expire.call_args[0][2][0])
+        self.assertIn('qt=14401000', p_expire.call_args[0][2][0])
+
+    @mock.patch('catracking.delivery.expire')
+    @mock.patch('catracking.core.Tracker.send')
+    def test_send_identical_expired_hits(self, p_send, p_expire):
+        self.tracker._root_chunk = core.BaseMeasurementProtocolHit({'a': 1})
+        with mock.patch('catracking.ga.core.time', return_value=14410):
+            self.tracker.new_event('Category', 'action', 'label')
+        with mock.patch('catracking.ga.core.time', return_value=10):
+            self.tracker.new_event('Category', 'action', 'label')
+        with mock.patch('catracking.ga.core.time', return_value=14411):
+            self.tracker.send()
+        self.assertEquals(1, len(p_send.call_args[0][0]))
+        self.assertEquals(1, len(p_expire.call_args[0][2]))
+
     def test_new_pageview(self):
         with self.assertRaises(NotImplementedError):
             self.tracker.new_pageview()
@@ -100,11 +175,351 @@ class GoogleAnalyticsTrackerTest(TestCase):
     @mock.patch('random.randint')
     def test_send(self, p_randint, p_send):
         p_randint.return_value = 1
-        self.tracker.hits = [core.BaseMeasurementProtocolHit()] * 2
-        with mock.patch.object(self.tracker, 'compile_hits') as p_compile_hits:
+        self.tracker._root_chunk = core.BaseMeasurementProtocolHit({'a': 1})
+        self.tracker.hits = [core.BaseMeasurementProtocolHit({'b': 2})] * 2
+        self.tracker.send()
+        p_send.assert_called_with(
+            ['a=1&b=2&z=1', 'a=1&b=2&z=1'], [None, None])
+
+    @mock.patch('catracking.core.Tracker.send')
+    def test_send_created(self, p_send):
+        self.tracker._root_chunk = core.BaseMeasurementProtocolHit({'a': 1})
+        now = time()
+        with mock.patch('catracking.ga.core.time', return_value=now - 5):
+            self.tracker.new_event('Category', 'action', 'label')
+        with mock.patch('catracking.ga.core.time', return_value=now - 10):
+            self.tracker.new_event('Category', 'action', 'label')
+        self.tracker.send()
+        self.assertEquals([now - 5, now - 10], p_send.call_args[0][1])
+
+    @mock.patch('catracking.tasks.CompileTrackingDataTask.delay')
+    @mock.patch('catracking.core.Tracker.send')
+    def test_send_compile_in_worker(self, p_send, p_delay):
+        self.tracker._root_chunk = core.BaseMeasurementProtocolHit({'a': 1})
+        self.tracker.hits = [core.BaseMeasurementProtocolHit({'b': 'B'})]
+        with self.settings(TRACKERS={'ga': {'COMPILE_IN_WORKER': True}}):
+            with mock.patch('catracking.ga.core.time', return_value=20):
+                self.tracker.send()
+        p_delay.assert_called_once_with(
+            'ga', [('a', 1)], [[('b', 'B')]], [None], 20)
+        p_send.assert_not_called()
+
+    @mock.patch('catracking.tasks.CompileTrackingDataTask.delay')
+    def test_send_compile_in_worker_no_hits(self, p_delay):
+        with self.settings(TRACKERS={'ga': {'COMPILE_IN_WORKER': True}}):
+            self.tracker.send()
+        p_delay.assert_not_called()
+
+    def test_describe(self):
+        self.tracker._root_chunk = core.BaseMeasurementProtocolHit({'a': 1})
+        event = self.tracker.new_event('Category', 'action', 'label')
+        event.new_product('ID', price=Decimal('1.50'))
+        root, hits = self.tracker.describe()
+        self.assertEquals([('a', 1)], root)
+        self.assertEquals(
+            [('t', 'event'), ('ec', 'Category'), ('ea', 'action'),
+             ('el', 'label'), ('ev', 0), ('ni', 1), ('pr1id', 'ID'),
+             ('pr1pr', '1.50')], hits[0])
+
+    def test_describe_queue_time(self):
+        self.tracker._root_chunk = core.BaseMeasurementProtocolHit({'a': 1})
+        with mock.patch('catracking.ga.core.time', return_value=10):
+            self.tracker.new_event('Category', 'action', 'label')
+        root, hits = self.tracker.describe(11)
+        self.assertEquals(('qt', 1000), hits[0][-1])
+
+    @mock.patch('random.randint')
+    def test_encode_description(self, p_randint):
+        p_randint.return_value = 1
+        self.tracker._root_chunk = core.BaseMeasurementProtocolHit({'a': 1})
+        self.tracker.new_event('Category', 'action', 'label')
+        root, hits = json.loads(json.dumps(self.tracker.describe()))
+        self.assertEquals(
+            [self.tracker.get_root_chunk().encode() + '&' +
+             self.tracker.hits[0].encoded_url],
+            self.tracker.encode_description(root, hits))
+
+    @mock.patch('catracking.core.Tracker.send')
+    def test_send_no_hits(self, p_send):
+        with mock.patch.object(self.tracker, 'get_root_chunk') as p_root:
             self.tracker.send()
-            p_compile_hits.assert_called_once()
-            p_send.assert_called_with(['z=1', 'z=1'])
+            p_root.assert_not_called()
+        p_send.assert_called_with([], [])
+
+
+class HitEncoderTest(TestCase):
+
+    def setUp(self):
+        self.root_chunk = core.BaseMeasurementProtocolHit([
+            (parameters.VERSION, 1),
+            (parameters.TRACKING_ID, 'UA-1'),
+            (parameters.DOCUMENT_HOSTNAME, 'www.ca.com'),
+            (parameters.CLIENT_ID, '1.2')])
+        self.encoder = core.HitEncoder(self.root_chunk)
+        self.hit = core.EventHitChunk('category', 'action', 'label')
+
+    def test_prefix(self):
+        self.assertEquals(
+            'v=1&tid=UA-1&dh=www.ca.com&cid=1.2', self.encoder.prefix)
+
+    def test_process_fragment_cached(self):
+        core.HitEncoder._process_fragments.clear()
+        with mock.patch.object(
+                core, 'urlencode', wraps=core.urlencode) as p_urlencode:
+            core.HitEncoder(self.root_chunk)
+            core.HitEncoder(self.root_chunk)
+        self.assertEquals(1, p_urlencode.call_count)
+
+    @mock.patch('random.randint')
+    def test_encode(self, p_randint):
+        p_randint.return_value = 7
+        merged = self.root_chunk.copy()
+        merged.update(self.hit)
+        self.assertEquals(merged.encoded_url, self.encoder.encode(self.hit))
+        self.assertTrue(self.encoder.encode(self.hit).endswith('&z=7'))
+
+    @mock.patch('random.randint')
+    def test_encode_already_encoded_hit(self, p_randint):
+        p_randint.return_value = 7
+        self.hit.encoded_url
+        self.assertEquals(1, self.encoder.encode(self.hit).count('z='))
+
+    @mock.patch('random.randint')
+    def test_encode_hit_overriding_root(self, p_randint):
+        p_randint.return_value = 7
+        self.hit[parameters.DOCUMENT_HOSTNAME] = 'other.ca.com'
+        payload = self.encoder.encode(self.hit)
+        self.assertEquals(1, payload.count('dh='))
+        self.assertIn('dh=other.ca.com', payload)
+        self.assertTrue(payload.endswith('&z=7'))
+
+    @mock.patch('random.randint')
+    def test_encode_queue_time(self, p_randint):
+        p_randint.return_value = 7
+        self.hit.created = 10
+        encoder = core.HitEncoder(self.root_chunk, 10.25)
+        self.assertEquals(250, encoder.queue_time(self.hit))
+        self.assertTrue(encoder.encode(self.hit).endswith('&qt=250&z=7'))
+        self.hit[parameters.DOCUMENT_HOSTNAME] = 'other.ca.com'
+        self.assertTrue(encoder.encode(self.hit).endswith('&qt=250&z=7'))
+
+    def test_encode_queue_time_unknown(self):
+        self.assertEquals(0, self.encoder.queue_time(self.hit))
+        self.assertEquals(0, core.HitEncoder(self.root_chunk, 10).queue_time(
+            core.BaseMeasurementProtocolHit()))
+        self.assertNotIn('qt=', self.encoder.encode(self.hit))
+
+    @mock.patch('random.randint')
+    def test_encode_queue_time_set(self, p_randint):
+        p_randint.return_value = 7
+        self.hit.created = 10
+        self.hit[parameters.QUEUE_TIME] = 100
+        payload = core.HitEncoder(self.root_chunk, 20).encode(self.hit)
+        self.assertEquals(1, payload.count('qt='))
+        self.assertIn('qt=100', payload)
+
+    @mock.patch('random.randint')
+    def test_encode_empty(self, p_randint):
+        p_randint.return_value = 7
+        encoder = core.HitEncoder(core.BaseMeasurementProtocolHit())
+        self.assertEquals(
+            'z=7', encoder.encode(core.BaseMeasurementProtocolHit()))
+
+
+@override_settings(TRACKERS={'ga': {
+    'PROPERTY': 'XXX-YY', 'DOCUMENT_HOSTNAME': 'www.ca.com', 'BATCH': True,
+    'DISPATCH': 'sync'}})
+class GoogleAnalyticsTrackerBatchDeliveryTest(TestCase):
+
+    def setUp(self):
+        self.request = mock.MagicMock()
+        self.request.session = {}
+        self.request.META = {'HTTP_USER_AGENT': 'Chrome'}
+        self.request.COOKIES = {'_ga2017': 'GA1.2.12345.12345'}
+        self.tracker = core.GoogleAnalyticsTracker(self.request)
+
+    def send(self, endpoint):
+        with mock.patch.object(
+                core.GoogleAnalyticsTracker, 'BATCH_ENDPOINT', endpoint):
+            self.tracker.send()
+
+    def test_send_batches_to_stub_endpoint(self):
+        for index in range(25):
+            self.tracker.new_event('category', 'action', index)
+        with StubEndpoint() as stub:
+            self.send(stub.url('/batch'))
+        self.assertEquals(2, len(stub.requests))
+        self.assertEquals(
+            [20, 5], [len(body.splitlines()) for _, body in stub.requests])
+        self.assertEquals({'/batch'}, {path for path, _ in stub.requests})
+        self.assertIn('el=24', stub.requests[1][1])
+        self.assertEquals(2, TrackingRequest.objects.count())
+
+    @override_settings(TRACKERS={'ga': {
+        'PROPERTY': 'XXX-YY', 'DOCUMENT_HOSTNAME': 'www.ca.com',
+        'DISPATCH': 'sync'}})
+    def test_send_logs_creation_of_each_hit(self):
+        now = time()
+        with mock.patch('catracking.ga.core.time', return_value=now - 60):
+            self.tracker.new_event('category', 'action', 'first')
+        with mock.patch('catracking.ga.core.time', return_value=now - 30):
+            self.tracker.new_event('category', 'action', 'second')
+        with StubEndpoint() as stub:
+            with mock.patch.object(
+                    core.GoogleAnalyticsTracker, 'ENDPOINT',
+                    stub.url('/collect')):
+                self.tracker.send()
+        self.assertEquals(2, len(stub.requests))
+        logs = TrackingRequest.objects.order_by('hit_created')
+        self.assertIn('el=first', logs[0].payload)
+        self.assertIn('el=second', logs[1].payload)
+        self.assertEquals(30, round((
+            logs[1].hit_created - logs[0].hit_created).total_seconds()))
+
+    def test_send_batches_respect_max_bytes(self):
+        for index in range(10):
+            self.tracker.new_event('category', 'action', 'l' * 2000)
+        with StubEndpoint() as stub:
+            self.send(stub.url('/batch'))
+        for _, body in stub.requests:
+            self.assertTrue(len(body) <= core.GoogleAnalyticsTracker
+                            .BATCH_MAX_BYTES)
+        self.assertEquals(10, sum(
+            len(body.splitlines()) for _, body in stub.requests))
+
+    def test_send_drops_oversized_hits(self):
+        self.tracker.new_event('category', 'action', 'big')[
+            parameters.USER_AGENT] = 'a' * 9000
+        self.tracker.new_event('category', 'action', 'label')
+        with StubEndpoint() as stub:
+            self.send(stub.url('/batch'))
+        self.assertEquals(1, len(stub.requests))
+        self.assertEquals(1, len(stub.requests[0][1].splitlines()))
+        self.assertIn('el=label', stub.requests[0][1])
+
+    def test_send_splits_products_to_stub_endpoint(self):
+        event = self.tracker.new_event('category', 'action', 'label')
+        for index in range(100):
+            event.new_product('SKU-{}'.format(index), 'n' * 200)
+        with StubEndpoint() as stub:
+            self.send(stub.url('/batch'))
+        hits = [hit for _, body in stub.requests for hit in body.splitlines()]
+        self.assertTrue(len(hits) > 1)
+        self.assertTrue(all(
+            len(hit) <= core.GoogleAnalyticsTracker.HIT_MAX_BYTES
+            for hit in hits))
+        self.assertEquals(100, sum(hit.count('nm=') for hit in hits))
+
+
+class HitSizeTest(TestCase):
+
+    def setUp(self):
+        self.root_chunk = core.BaseMeasurementProtocolHit([
+            (parameters.VERSION, 1), (parameters.CLIENT_ID, '1.2')])
+        self.encoder = core.HitEncoder(self.root_chunk)
+        self.tracker = core.GoogleAnalyticsTracker
+        self.event = core.EventHitChunk('category', 'action', 'label', 10)
+
+    def test_truncate(self):
+        self.assertEquals('a' * 500, core.truncate('el', 'a' * 600))
+        self.assertEquals('a' * 150, core.truncate('cd12', 'a' * 600))
+        self.assertEquals('a' * 600, core.truncate('ua', 'a' * 600))
+        self.assertEquals('short', core.truncate('ec', 'short'))
+        self.assertEquals(10 ** 600, core.truncate('el', 10 ** 600))
+
+    def test_truncate_multibyte(self):
+        truncated = core.truncate('ec', u'\xe9' * 100)
+        self.assertEquals(u'\xe9' * 75, truncated)
+        self.assertEquals(150, len(truncated.encode('utf-8')))
+        self.assertEquals(u'a' + u'\xe9' * 74, core.truncate(
+            'ec', u'a' + u'\xe9' * 100))
+
+    def test_setitem_truncates(self):
+        self.event[parameters.EVENT_LABEL] = 'l' * 600
+        self.assertEquals('l' * 500, self.event[parameters.EVENT_LABEL])
+        product = self.event.new_product('ID', 'n' * 600)
+        product['cd3'] = 'd' * 200
+        self.assertEquals('n' * 500, self.event._products[0]['pr1nm'])
+        self.assertEquals('d' * 150, self.event._products[0]['pr1cd3'])
+
+    @mock.patch('random.randint')
+    def test_fit(self, p_randint):
+        p_randint.return_value = 7
+        self.assertEquals(
+            [self.encoder.encode(self.event)],
+            self.tracker.fit(self.encoder, self.event))
+
+    def test_split(self):
+        self.event.new_transaction('T-1', revenue=99)
+        self.event.set_product_action('purchase')
+        for index in range(40):
+            product = self.event.new_product(
+                'SKU-{}'.format(index), 'n' * 400)
+            product['cm1'] = 1
+        self.event['cm2'] = 5
+        self.event.compile()
+        self.event.created = 10
+        encoder = core.HitEncoder(self.root_chunk, 12)
+        hits = self.tracker.split(encoder, self.event)
+        self.assertEquals(3, len(hits))
+        self.assertEquals(
+            [18, 18, 4],
+            [len([key for key in hit if key.endswith('nm')]) for hit in hits])
+        for hit in hits:
+            self.assertEquals('t-1', hit['ti'])
+            self.assertEquals('purchase', hit['pa'])
+            self.assertEquals('2000', hit['qt'])
+            self.assertIn('pr1nm', hit)
+            self.assertEquals('1', hit['pr1cm1'])
+            self.assertTrue(len(encoder.encode(hit)) <= 8192)
+        self.assertEquals('sku-18', hits[1]['pr1id'])
+        self.assertEquals(('99', '10', '5'), (
+            hits[0]['tr'], hits[0]['ev'], hits[0]['cm2']))
+        for hit in hits[1:]:
+            for key in ('tr', 'ev', 'cm2'):
+                self.assertNotIn(key, hit)
+
+    def test_split_products_max(self):
+        for index in range(201):
+            self.event.new_product(index)
+        self.event.compile()
+        hits = self.tracker.split(self.encoder, self.event)
+        self.assertEquals(2, len(hits))
+        self.assertIn('pr200id', hits[0])
+        self.assertEquals('200', hits[1]['pr1id'])
+
+    def test_split_without_products(self):
+        self.assertIsNone(self.tracker.split(self.encoder, self.event))
+
+    def test_split_product_too_big(self):
+        product = self.event.new_product('ID')
+        for index in range(1, 60):
+            product['cd{}'.format(index)] = 'd' * 150
+        self.event.compile()
+        self.assertIsNone(self.tracker.split(self.encoder, self.event))
+
+    @override_settings(TRACKERS={'ga': {'INSTRUMENTATION': ['memory']}})
+    @mock.patch('catracking.ga.core.logger.warning')
+    def test_fit_rejects(self, p_warning):
+        from catracking import instrumentation
+        instrumentation.aggregator.clear()
+        self.event[parameters.USER_AGENT] = 'a' * 9000
+        self.assertEquals([], self.tracker.fit(self.encoder, self.event))
+        self.assertEquals(
+            'Hit exceeds the maximum size and can not be split',
+            p_warning.call_args[0][0])
+        self.assertEquals(1, instrumentation.aggregator.count(
+            'ga', instrumentation.DROPS))
+
+    def test_encode_description_splits(self):
+        for index in range(100):
+            self.event.new_product('SKU-{}'.format(index), 'n' * 200)
+        self.event.compile()
+        payloads = self.tracker.encode_description(
+            self.root_chunk.raw_items(), [self.event.raw_items()])
+        self.assertTrue(len(payloads) > 1)
+        self.assertEquals(100, sum(
+            payload.count('nm=') for payload in payloads))
 
 
 class BaseMeasurementProtocolHitTest(TestCase):
@@ -113,7 +528,36 @@ class BaseMeasurementProtocolHitTest(TestCase):
         self.hit = core.BaseMeasurementProtocolHit()
 
     def test_init(self):
-        self.assertIsInstance(self.hit, OrderedDict)
+        self.assertIsInstance(self.hit, MutableMapping)
+
+    def test_init_items(self):
+        self.assertEquals(
+            ['a', 'b'],
+            list(core.BaseMeasurementProtocolHit([('a', 1), ('b', 2)])))
+
+    def test_setitem_existing_key(self):
+        self.hit['a'] = 1
+        self.hit['b'] = 2
+        self.hit['a'] = 3
+        self.assertEquals([('a', '3'), ('b', '2')], self.hit.items())
+
+    def test_setitem_normalized_lazily(self):
+        self.hit['a'] = 'AAAA'
+        self.assertEquals('AAAA', self.hit._values['a'])
+        self.assertEquals('aaaa', self.hit['a'])
+
+    def test_delitem(self):
+        self.hit['a'] = 1
+        self.hit['b'] = 2
+        del self.hit['a']
+        self.assertEquals([('b', '2')], self.hit.items())
+        self.assertNotIn('a', self.hit)
+
+    def test_slots(self):
+        self.assertFalse(hasattr(self.hit, '__dict__'))
+        self.assertFalse(hasattr(
+            core.EventHitChunk('category', 'action', 'label'), '__dict__'))
+        self.assertFalse(hasattr(core.ProductHitChunk(1), '__dict__'))
 
     def test_setitem(self):
         self.hit['a'] = 1
@@ -154,6 +598,21 @@ class BaseMeasurementProtocolHitTest(TestCase):
         self.hit['b'] = 'a'
         self.assertEquals('a=1&b=a&z=2', self.hit.encoded_url)
 
+    @mock.patch('random.randint')
+    def test_encoded_url_quoting(self, p_randint):
+        p_randint.return_value = 2
+        self.hit['a b'] = 'A&B'
+        self.hit[parameters.USER_AGENT] = 'Mozilla/5.0 (X11)'
+        self.assertEquals(
+            urlencode([('a b', 'a&b'), (parameters.USER_AGENT,
+                       'Mozilla/5.0 (X11)'), ('z', 2)]),
+            self.hit.encoded_url)
+
+    def test_encode_exclude(self):
+        self.hit['a'] = 1
+        self.hit['b'] = 2
+        self.assertEquals('b=2', self.hit.encode(exclude=('a',)))
+
     @mock.patch('random.randint')
     def test_encoded_url_no_value(self, p_randint):
         p_randint.return_value = 2
@@ -291,6 +750,16 @@ class EventHitChunkTest(TestCase):
         self.assertEquals('0', self.hit[parameters.EVENT_VALUE])
         self.assertEquals('0', self.hit[parameters.EVENT_NON_INTERACTIVE])
 
+    def test_init_normalized(self):
+        values = {parameters.HIT_TYPE: 'event', parameters.EVENT_CATEGORY: 'c'}
+        hit = core.EventHitChunk(normalized=(
+            (parameters.HIT_TYPE, parameters.EVENT_CATEGORY), values))
+        self.assertEquals(
+            [('t', 'event'), ('ec', 'c')], list(hit.items()))
+        self.assertIsNotNone(hit.created)
+        hit[parameters.EVENT_ACTION] = 'a'
+        self.assertNotIn(parameters.EVENT_ACTION, values)
+
 
 class TransactionHitChunkTest(TestCase):
 
@@ -0,0 +1,195 @@
+import mock
+
+from six.moves.urllib.parse import parse_qsl
+
+from django.test import (
+    TestCase,
+    override_settings)
+
+from catracking.ga import (
+    core,
+    dimensions,
+    events,
+    metrics,
+    parameters,
+    specs)
+
+
+class EventSpecTest(TestCase):
+
+    def setUp(self):
+        self.spec = specs.EventSpec(
+            'test event', 'Test Category', labels=('Click', 'call'),
+            dimensions=[dimensions.CD2_HS_PAGE_TYPE],
+            metrics=[metrics.CM1_HS_BRAND_PAGEVIEW])
+
+    def test_init(self):
+        self.assertEquals('test event', self.spec.name)
+        self.assertEquals(frozenset(['click', 'call']), self.spec.labels)
+        self.assertEquals(
+            't=event&ec=test+category&ev=0&ni=1', self.spec.fragment)
+        self.assertEquals(
+            {'t': 'event', 'ec': 'test category', 'ev': '0', 'ni': '1'},
+            self.spec.values)
+
+    def test_init_static_action(self):
+        self.assertEquals(
+            't=event&ec=verified+lead&ea=submit+lead&ev=0&ni=1',
+            specs.EventSpec(
+                'test static action', events.EVENT_CATEGORY_VERIFIED_LEAD,
+                events.EVENT_ACTION_SUBMIT_LEAD).fragment)
+
+    def test_init_same_name(self):
+        spec = specs.EventSpec('test event', 'Test Category')
+        self.assertEquals(self.spec.fragment, spec.fragment)
+
+    def test_init_unknown_dimension(self):
+        with self.assertRaises(specs.EventSpecError):
+            specs.EventSpec('test unknown', 'category', dimensions=['cd999'])
+
+    def test_init_product_scoped_dimension(self):
+        with self.assertRaises(specs.EventSpecError):
+            specs.EventSpec(
+                'test product', 'category',
+                dimensions=[dimensions.CD10_PS_BRAND_ACCREDITED])
+
+    def test_init_any_dimension(self):
+        spec = specs.EventSpec('test any', 'category')
+        self.assertEquals(specs.HIT_DIMENSIONS, spec.dimensions)
+        self.assertIn(dimensions.CD2_HS_PAGE_TYPE, spec.dimensions)
+        self.assertNotIn(dimensions.CD10_PS_BRAND_ACCREDITED, spec.dimensions)
+        self.assertEquals(specs.HIT_METRICS, spec.metrics)
+
+    def test_validate_action_required(self):
+        with self.assertRaises(specs.EventSpecError):
+            self.spec.validate(None, 'click', {})
+
+    def test_validate_static_action(self):
+        with self.assertRaises(specs.EventSpecError):
+            events.LOGIN.validate('action', 'success', {})
+
+    def test_validate_label(self):
+        self.spec.validate('action', 'CLICK', {})
+        with self.assertRaises(specs.EventSpecError):
+            self.spec.validate('action', 'form', {})
+
+    def test_validate_dimension(self):
+        self.spec.validate(
+            'action', 'click', {dimensions.CD2_HS_PAGE_TYPE: 'brand'})
+        with self.assertRaises(specs.EventSpecError):
+            self.spec.validate(
+                'action', 'click', {dimensions.CD5_HS_AUTHOR: 'me'})
+
+    def test_validate_metric(self):
+        self.spec.validate(
+            'action', 'click', {metrics.CM1_HS_BRAND_PAGEVIEW: 1.5})
+        for value in ('1', True, None):
+            with self.assertRaises(specs.EventSpecError):
+                self.spec.validate(
+                    'action', 'click', {metrics.CM1_HS_BRAND_PAGEVIEW: value})
+
+    def test_new_hit(self):
+        hit = self.spec.new_hit('Action', 'Click', cd2='Brand', cm1=1)
+        self.assertIsInstance(hit, core.EventHitChunk)
+        self.assertEquals('action', hit[parameters.EVENT_ACTION])
+        self.assertEquals('click', hit[parameters.EVENT_LABEL])
+        self.assertEquals('brand', hit['cd2'])
+        self.assertEquals('1', hit['cm1'])
+
+    def test_new_hit_invalid(self):
+        with self.assertRaises(specs.EventSpecError):
+            self.spec.new_hit('action', 'click', cd5='me')
+
+
+class SpecEventHitChunkTest(TestCase):
+
+    def setUp(self):
+        self.hit = events.VERIFIED_LEAD.new_hit('Campaign', 'click', cd2='a')
+        self.event = core.EventHitChunk(
+            events.EVENT_CATEGORY_VERIFIED_LEAD, 'Campaign', 'click', 0, 1)
+        self.event['cd2'] = 'a'
+
+    def test_encode(self):
+        payload = self.hit.encode()
+        self.assertTrue(payload.startswith(events.VERIFIED_LEAD.fragment))
+        self.assertEquals(
+            sorted(parse_qsl(self.event.encode())), sorted(parse_qsl(payload)))
+
+    def test_encode_exclude(self):
+        self.assertNotIn('cd2', self.hit.encode(exclude=('cd2',)))
+        self.assertNotIn('ec=', self.hit.encode(exclude=('ec',)))
+
+    def test_encode_changed_static_value(self):
+        self.hit[parameters.EVENT_VALUE] = 10
+        self.event[parameters.EVENT_VALUE] = 10
+        self.assertEquals(
+            sorted(parse_qsl(self.event.encode())),
+            sorted(parse_qsl(self.hit.encode())))
+
+    def test_products(self):
+        self.hit.new_product('id')
+        self.assertIn('pr1id=id', self.hit.compile().encode())
+
+    def test_init(self):
+        self.assertEquals(events.VERIFIED_LEAD, self.hit.spec)
+        self.assertIsNotNone(self.hit.created)
+        self.assertEquals([], self.hit._products)
+        self.assertNotIn('cd2', events.VERIFIED_LEAD.values)
+
+
+class CatalogTest(TestCase):
+
+    def test_specs_declare_their_dimensions(self):
+        catalog = [
+            spec for spec in vars(events).values()
+            if isinstance(spec, specs.EventSpec)]
+        self.assertEquals(12, len(catalog))
+        for spec in catalog:
+            self.assertNotEqual(specs.HIT_DIMENSIONS, spec.dimensions)
+            self.assertIn(dimensions.CD2_HS_PAGE_TYPE, spec.dimensions)
+
+    def test_lead_dimensions(self):
+        events.VERIFIED_LEAD.validate(
+            'campaign', 'click', {dimensions.CD50_HS_BRAND_ID: 1234})
+        with self.assertRaises(specs.EventSpecError):
+            events.LOGIN.validate(
+                None, 'success', {dimensions.CD50_HS_BRAND_ID: 1234})
+
+    def test_wizard_metrics(self):
+        events.BRAND_CALL_ME_NOW.validate(
+            None, None, {metrics.CM26_HS_WIZ_CURRENT_STEP: 2})
+        with self.assertRaises(specs.EventSpecError):
+            events.SUBMIT_LEAD.validate(
+                None, None, {metrics.CM26_HS_WIZ_CURRENT_STEP: 2})
+
+
+@override_settings(
+    TRACKERS={'ga': {'PROPERTY': 'XXX-YY', 'DOCUMENT_HOSTNAME': 'www.ca.com'}})
+class EmitTest(TestCase):
+
+    def setUp(self):
+        self.request = mock.MagicMock()
+        self.request.session = {}
+        self.request.META = {}
+        self.request.COOKIES = {'_ga2017': 'GA1.2.12345.12345'}
+        self.tracker = core.GoogleAnalyticsTracker(self.request)
+
+    def test_emit(self):
+        hit = self.tracker.emit(events.LOGIN, label='success')
+        self.assertEquals([hit], self.tracker.hits)
+
+    def test_emit_invalid(self):
+        with self.assertRaises(specs.EventSpecError):
+            self.tracker.emit(events.LOGIN, label='maybe')
+        self.assertEquals([], self.tracker.hits)
+
+    @mock.patch('catracking.core.Tracker.send')
+    def test_send(self, p_send):
+        self.tracker.emit(events.VERIFIED_LEAD, 'campaign', 'form', cd2='a')
+        self.tracker.send()
+        payload = dict(parse_qsl(p_send.call_args[0][0][0]))
+        self.assertEquals('verified lead', payload['ec'])
+        self.assertEquals('campaign', payload['ea'])
+        self.assertEquals('form', payload['el'])
+        self.assertEquals('a', payload['cd2'])
+        self.assertEquals('XXX-YY', payload['tid'])
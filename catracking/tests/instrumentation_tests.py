@@ -0,0 +1,232 @@
+import mock
+import requests
+
+from django.test import (
+    RequestFactory,
+    TestCase,
+    override_settings)
+
+from catracking import (
+    buffers,
+    instrumentation)
+from catracking.backends import memory
+from catracking.ga.core import GoogleAnalyticsTracker
+from catracking.middleware import TrackingMiddleware
+from catracking.tasks import SendTrackingDataTask
+
+GA_CONFIG = {
+    'PROPERTY': 'UA-1',
+    'DOCUMENT_HOSTNAME': 'www.ca.com',
+    'DISPATCH': 'memory',
+    'INSTRUMENTATION': ['memory'],
+}
+
+
+class RecordingSink(instrumentation.Sink):
+    records = []
+
+    def timing(self, tracker_ident, stage, duration):
+        self.records.append((tracker_ident, stage))
+
+    def count(self, tracker_ident, name, value):
+        self.records.append((tracker_ident, name, value))
+
+
+class InstrumentTest(TestCase):
+
+    def test_disabled_without_sinks(self):
+        self.assertIs(
+            instrumentation.NULL_INSTRUMENT,
+            instrumentation.get_instrument('ga'))
+        self.assertIs(
+            instrumentation.NULL_TIMER,
+            instrumentation.timer('ga', instrumentation.COMPILE))
+
+    @override_settings(TRACKERS={'ga': {'INSTRUMENTATION': [
+        'signal', 'logging', 'memory',
+        'catracking.tests.instrumentation_tests.RecordingSink']}})
+    def test_sinks(self):
+        instrument = instrumentation.get_instrument('ga')
+        self.assertEquals(
+            [instrumentation.SignalSink, instrumentation.LoggingSink,
+             instrumentation.MemorySink, RecordingSink],
+            [type(sink) for sink in instrument.sinks])
+        self.assertIs(instrument, instrumentation.get_instrument('ga'))
+
+    @override_settings(TRACKERS={'ga': {
+        'INSTRUMENTATION': ['memory']}})
+    def test_reset_on_setting_changed(self):
+        instrument = instrumentation.get_instrument('ga')
+        with override_settings(TRACKERS={'ga': {}}):
+            self.assertIs(
+                instrumentation.NULL_INSTRUMENT,
+                instrumentation.get_instrument('ga'))
+        self.assertIsNot(instrument, instrumentation.get_instrument('ga'))
+
+    @override_settings(TRACKERS={'ga': {'INSTRUMENTATION': [
+        'catracking.tests.instrumentation_tests.RecordingSink']}})
+    def test_timer(self):
+        RecordingSink.records = []
+        with self.assertRaises(ValueError):
+            with instrumentation.timer('ga', instrumentation.COMPILE):
+                raise ValueError()
+        instrumentation.count('ga', instrumentation.HITS, 2)
+        self.assertEquals(
+            [('ga', 'compile'), ('ga', 'hits', 2)], RecordingSink.records)
+
+    @override_settings(TRACKERS={'ga': {'INSTRUMENTATION': ['signal']}})
+    def test_signal_sink(self):
+        timed, counted = mock.Mock(), mock.Mock()
+        instrumentation.stage_timed.connect(timed)
+        instrumentation.counted.connect(counted)
+        try:
+            instrumentation.get_instrument('ga').timing('encode', 0.5)
+            instrumentation.count('ga', 'hits')
+        finally:
+            instrumentation.stage_timed.disconnect(timed)
+            instrumentation.counted.disconnect(counted)
+        timed.assert_called_once_with(
+            signal=instrumentation.stage_timed, sender='ga',
+            stage='encode', duration=0.5)
+        counted.assert_called_once_with(
+            signal=instrumentation.counted, sender='ga', name='hits',
+            value=1)
+
+    @override_settings(TRACKERS={'ga': {'INSTRUMENTATION': ['logging']}})
+    @mock.patch('catracking.instrumentation.logger')
+    def test_logging_sink(self, p_logger):
+        instrumentation.get_instrument('ga').timing('encode', 0.5)
+        p_logger.debug.assert_called_once_with(
+            '%s %s took %.3fms', 'ga', 'encode', 500.0, extra={
+                'tracker': 'ga', 'stage': 'encode', 'duration': 0.5})
+
+
+class AggregatorTest(TestCase):
+
+    def test_summary(self):
+        aggregator = instrumentation.Aggregator(samples=100)
+        for duration in range(1, 201):
+            aggregator.add_timing('ga', 'encode', duration)
+        aggregator.add_count('ga', 'hits', 2)
+        aggregator.add_count('ga', 'hits', 3)
+        self.assertEquals({'ga': {'encode': {
+            'count': 200, 'mean': 100.5, 'max': 200,
+            'p50': 150, 'p90': 190, 'p99': 199}}}, aggregator.summary())
+        self.assertEquals(5, aggregator.count('ga', 'hits'))
+        self.assertEquals(0, aggregator.count('ga', 'logged'))
+
+        aggregator.clear()
+        self.assertEquals({}, aggregator.summary())
+
+    def test_percentile(self):
+        percentile = instrumentation.Aggregator.percentile
+        self.assertEquals(1, percentile([1], 99))
+        self.assertEquals(1, percentile([1, 2, 3, 4], 1))
+        self.assertEquals(2, percentile([1, 2, 3, 4], 50))
+        self.assertEquals(4, percentile([1, 2, 3, 4], 100))
+
+
+@override_settings(TRACKERS={'ga': GA_CONFIG})
+class PipelineTest(TestCase):
+
+    def setUp(self):
+        instrumentation.aggregator.clear()
+        memory.clear()
+
+    def stages(self):
+        return sorted(instrumentation.aggregator.summary().get('ga', {}))
+
+    def test_request(self):
+        request = RequestFactory().get('/')
+        request.session = {}
+        middleware = TrackingMiddleware()
+        middleware.process_view(request, None, None, None)
+        request.trackers.ga.new_event('category', 'action', 'label')
+        request.trackers.ga.new_event('category', 'action', 'label')
+        middleware.process_response(request, None)
+
+        self.assertEquals(
+            ['compile', 'encode', 'enqueue', 'instantiate'], self.stages())
+        self.assertEquals(
+            2, instrumentation.aggregator.count('ga', instrumentation.HITS))
+        self.assertEquals(2, instrumentation.aggregator.count(
+            'ga', instrumentation.ENQUEUED))
+        self.assertEquals(2, len(memory.sent))
+
+    def test_compile_hits(self):
+        tracker = GoogleAnalyticsTracker(RequestFactory().get('/'))
+        tracker.request.session = {}
+        tracker.new_event('category', 'action', 'label')
+        tracker.compile_hits()
+        self.assertEquals(['compile'], self.stages())
+
+    @mock.patch('catracking.tasks.CompileTrackingDataTask.delay')
+    @override_settings(TRACKERS={'ga': dict(
+        GA_CONFIG, COMPILE_IN_WORKER=True)})
+    def test_compile_in_worker(self, p_delay):
+        tracker = GoogleAnalyticsTracker(RequestFactory().get('/'))
+        tracker.request.session = {}
+        tracker.new_event('category', 'action', 'label')
+        tracker.send()
+        self.assertEquals(['compile', 'enqueue'], self.stages())
+
+    @mock.patch('catracking.tasks.transport.post')
+    def test_task(self, p_post):
+        p_post.return_value.status_code = 200
+        SendTrackingDataTask().run('ga', '/endpoint', 'a=1')
+        buffers.get_buffer('ga').flush()
+        self.assertEquals(['log_insert', 'round_trip'], self.stages())
+        self.assertEquals(
+            1, instrumentation.aggregator.count('ga', instrumentation.LOGGED))
+        self.assertEquals(1, instrumentation.aggregator.count(
+            'ga', instrumentation.DELIVERED))
+        self.assertEquals(
+            1, instrumentation.aggregator.count('ga', 'status_200'))
+
+    @mock.patch('catracking.tasks.SendTrackingDataTask.apply_async')
+    @mock.patch('catracking.tasks.transport.post')
+    def test_task_retries_and_drops(self, p_post, p_apply_async):
+        p_post.return_value.status_code = 503
+        SendTrackingDataTask().run('ga', '/endpoint', 'a=1')
+        SendTrackingDataTask().run('ga', '/endpoint', 'a=1', attempt=5)
+        aggregator = instrumentation.aggregator
+        self.assertEquals(1, aggregator.count('ga', instrumentation.RETRIES))
+        self.assertEquals(1, aggregator.count('ga', instrumentation.DROPS))
+        self.assertEquals(0, aggregator.count('ga', instrumentation.DELIVERED))
+        self.assertEquals(2, aggregator.count('ga', 'status_503'))
+
+    @mock.patch('catracking.tasks.SendTrackingDataTask.apply_async')
+    @mock.patch('catracking.tasks.transport.post')
+    def test_task_counts_hits_of_batches(self, p_post, p_apply_async):
+        p_post.return_value.status_code = 200
+        SendTrackingDataTask().run('ga', '/batch', 'a=1\na=2\na=3')
+        p_post.return_value.status_code = 503
+        SendTrackingDataTask().run('ga', '/batch', 'a=1\na=2')
+        SendTrackingDataTask().run('ga', '/batch', 'a=1\na=2', attempt=5)
+        aggregator = instrumentation.aggregator
+        self.assertEquals(3, aggregator.count('ga', instrumentation.DELIVERED))
+        self.assertEquals(3, aggregator.count('ga', 'status_200'))
+        self.assertEquals(4, aggregator.count('ga', 'status_503'))
+        self.assertEquals(2, aggregator.count('ga', instrumentation.RETRIES))
+        self.assertEquals(2, aggregator.count('ga', instrumentation.DROPS))
+
+    @mock.patch('catracking.delivery.transport.post')
+    def test_deliver(self, p_post):
+        from catracking import delivery
+        p_post.return_value.status_code = 200
+        delivery.deliver('ga', '/batch', 'a=1\na=2')
+        p_post.return_value.status_code = 400
+        delivery.deliver('ga', '/endpoint', 'a=1')
+        aggregator = instrumentation.aggregator
+        self.assertEquals(2, aggregator.count('ga', instrumentation.DELIVERED))
+        self.assertEquals(2, aggregator.count('ga', 'status_200'))
+        self.assertEquals(1, aggregator.count('ga', 'status_400'))
+
+    @mock.patch('catracking.tasks.SendTrackingDataTask.retry_or_dead_letter')
+    @mock.patch('catracking.tasks.transport.post')
+    def test_task_round_trip_error(self, p_post, p_retry):
+        p_post.side_effect = requests.ConnectionError()
+        SendTrackingDataTask().run('ga', '/endpoint', 'a=1')
+        self.assertEquals(['round_trip'], self.stages())
+        self.assertEquals(1, instrumentation.aggregator.count(
+            'ga', instrumentation.ROUND_TRIP_ERRORS))
@@ -1,6 +1,10 @@
 import mock
 
 from django.conf import settings
+from django.core.signals import request_finished
+from django.http import (
+    HttpResponse,
+    StreamingHttpResponse)
 from django.test import (
     TestCase,
     override_settings)
@@ -68,16 +72,61 @@ class TrackingMiddlewareTest(TestCase):
         self.assertTrue(hasattr(request, 'trackers'))
         self.assertTrue(hasattr(request.trackers, 'ga'))
 
+    def test_process_view_lazy_trackers(self):
+        request = mock.MagicMock()
+        self.middleware.process_view(request, None, None, None)
+        self.assertIsInstance(request.trackers, middleware.Trackers)
+        self.assertEquals(('ga',), request.trackers._fields)
+        self.assertNotIn('ga', request.trackers.__dict__)
+
+    def test_container(self):
+        container = self.middleware.container()
+        self.assertTrue(issubclass(container, middleware.Trackers))
+        self.assertEquals(('ga',), container._fields)
+        self.assertEquals(
+            {'ga': GoogleAnalyticsTracker}, container._classes)
+        self.assertEquals(frozenset(), container._deferred)
+
+    @mock.patch.object(middleware.TrackingMiddleware, 'resolve_tracker')
+    def test_container_resolved_once(self, p_resolve_tracker):
+        container = self.middleware.container()
+        self.assertIs(
+            container, middleware.TrackingMiddleware().container())
+        p_resolve_tracker.assert_called_once_with(GoogleAnalyticsTracker)
+
+    def test_container_setting_changed(self):
+        container = self.middleware.container()
+        with self.settings(TRACKERS={'ga': self.CUSTOM_TRACKER_VALID}):
+            self.assertEquals(
+                {'ga': CustomTracker}, self.middleware.container()._classes)
+        self.assertIsNot(container, self.middleware.container())
+
+    @override_settings(TRACKERS={'ga': {'DEFERRED_SEND': True}})
+    def test_container_deferred(self):
+        self.assertEquals(
+            frozenset(['ga']), self.middleware.container()._deferred)
+
     @mock.patch('catracking.middleware.GoogleAnalyticsTracker.send')
     def test_process_response(self, p_send):
         request = mock.MagicMock()
         response = mock.MagicMock()
         self.middleware.process_view(request, None, None, None)
+        request.trackers.ga
         self.assertEquals(
             response,
             self.middleware.process_response(request, response))
         p_send.assert_called_once()
 
+    @mock.patch('catracking.middleware.GoogleAnalyticsTracker.send')
+    def test_process_response_untouched_trackers(self, p_send):
+        request = mock.MagicMock()
+        response = mock.MagicMock()
+        self.middleware.process_view(request, None, None, None)
+        self.assertEquals(
+            response,
+            self.middleware.process_response(request, response))
+        p_send.assert_not_called()
+
     @mock.patch('catracking.middleware.GoogleAnalyticsTracker.send')
     def test_process_response_request_no_trackers(self, p_send):
         request = None
@@ -86,3 +135,98 @@ class TrackingMiddlewareTest(TestCase):
             response,
             self.middleware.process_response(request, response))
         p_send.assert_not_called()
+
+    @override_settings(TRACKERS={'ga': {'DEFERRED_SEND': True}})
+    @mock.patch('catracking.middleware.GoogleAnalyticsTracker.send')
+    def test_process_response_deferred(self, p_send):
+        request = mock.MagicMock()
+        response = HttpResponse()
+        self.middleware.process_view(request, None, None, None)
+        request.trackers.ga
+        self.assertEquals(
+            response,
+            self.middleware.process_response(request, response))
+        p_send.assert_not_called()
+        with mock.patch.object(request_finished, 'send') as p_finished:
+            response.close()
+        p_send.assert_called_once()
+        p_finished.assert_called_once_with(sender=response._handler_class)
+
+    @override_settings(TRACKERS={'ga': {'DEFERRED_SEND': True}})
+    @mock.patch('catracking.middleware.GoogleAnalyticsTracker.send')
+    def test_process_response_deferred_streaming(self, p_send):
+        request = mock.MagicMock()
+
+        def stream():
+            yield 'a'
+            request.trackers.ga.new_event('category', 'action', 'label')
+            yield 'b'
+
+        response = StreamingHttpResponse(stream())
+        self.middleware.process_view(request, None, None, None)
+        self.middleware.process_response(request, response)
+        self.assertEquals(b'ab', b''.join(response))
+        p_send.assert_not_called()
+        self.assertEquals(1, len(request.trackers.ga.hits))
+        response.close()
+        p_send.assert_called_once()
+
+
+class TrackersTest(TestCase):
+
+    class MyTrackers(middleware.Trackers):
+        _fields = ('ga', 'other')
+        _classes = {
+            'ga': mock.MagicMock(name='ga'),
+            'other': mock.MagicMock(name='other')}
+        _deferred = frozenset(['other'])
+
+    def setUp(self):
+        self.request = mock.MagicMock()
+        self.trackers = self.MyTrackers(self.request)
+
+    def test_lazy(self):
+        self.MyTrackers._classes['ga'].reset_mock()
+        self.assertEquals(
+            self.MyTrackers._classes['ga'].return_value, self.trackers.ga)
+        self.assertIs(self.trackers.ga, self.trackers.ga)
+        self.MyTrackers._classes['ga'].assert_called_once_with(self.request)
+
+    def test_unknown_tracker(self):
+        with self.assertRaises(AttributeError):
+            self.trackers.unknown
+
+    def test_touched(self):
+        self.assertEquals([], self.trackers.touched())
+        self.trackers.other
+        self.assertEquals([], self.trackers.touched())
+        self.trackers.ga
+        self.assertEquals([self.trackers.ga], self.trackers.touched())
+        self.assertEquals(
+            [self.trackers.other], self.trackers.touched(deferred=True))
+
+
+class DeferredSendTest(TestCase):
+
+    def setUp(self):
+        self.trackers = mock.MagicMock()
+        self.trackers.touched.return_value = [
+            mock.MagicMock(), mock.MagicMock()]
+        self.close = mock.MagicMock()
+
+    def test_call(self):
+        middleware.DeferredSend(self.trackers, self.close)()
+        self.trackers.touched.assert_called_once_with(deferred=True)
+        for tracker in self.trackers.touched.return_value:
+            tracker.send.assert_called_once_with()
+        self.close.assert_called_once_with()
+
+    @mock.patch('catracking.middleware.logger')
+    def test_call_tracker_error(self, p_logger):
+        first, second = self.trackers.touched.return_value
+        first.send.side_effect = ValueError
+        middleware.DeferredSend(self.trackers, self.close)()
+        second.send.assert_called_once_with()
+        p_logger.exception.assert_called_once_with(
+            'Deferred send of %s tracker failed', first.IDENT)
+        self.close.assert_called_once_with()
@@ -24,3 +24,24 @@ class TrackingRequestTest(TestCase):
 
     def test_str(self):
         self.assertEquals('ga - 200', self.tracking_request.__str__())
+
+
+class TrackingRequestSummaryTest(TestCase):
+
+    def setUp(self):
+        self.summary = mommy.make(
+            'catracking.TrackingRequestSummary', tracker='ga',
+            endpoint='/endpoint', response_code=200, count=10)
+
+    def test_str(self):
+        self.assertEquals('ga - 200 (10)', self.summary.__str__())
+
+
+class TrackingDeadLetterTest(TestCase):
+
+    def setUp(self):
+        self.dead_letter = mommy.make(
+            'catracking.TrackingDeadLetter', tracker='ga', attempts=6)
+
+    def test_str(self):
+        self.assertEquals('ga - 6 attempts', self.dead_letter.__str__())
@@ -0,0 +1,207 @@
+import mock
+import os
+import shutil
+import tempfile
+
+from django.test import (
+    RequestFactory,
+    TestCase,
+    override_settings)
+
+from catracking import (
+    instrumentation,
+    multiprocess)
+from catracking.views import metrics
+
+HITS = ('catracking_hits_total', (('tracker', 'ga'),))
+
+
+class MultiprocessTestCase(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.addCleanup(multiprocess._files.clear)
+
+    def path(self, name='ga-1.counters'):
+        return os.path.join(self.directory, name)
+
+
+class CounterFileTest(MultiprocessTestCase):
+
+    def test_add(self):
+        counter_file = multiprocess.CounterFile(self.path())
+        counter_file.add(HITS, 2)
+        counter_file.add(HITS, 3)
+        counter_file.add(('other', ()), 0.5)
+        self.assertEquals(
+            {HITS: 5, ('other', ()): 0.5},
+            multiprocess.collect([self.directory]))
+
+    def test_reopen(self):
+        counter_file = multiprocess.CounterFile(self.path())
+        counter_file.add(HITS, 2)
+        counter_file.close()
+
+        counter_file = multiprocess.CounterFile(self.path())
+        counter_file.add(HITS, 1)
+        counter_file.add(('other', ()), 1)
+        self.assertEquals(
+            {HITS: 3, ('other', ()): 1},
+            multiprocess.collect([self.directory]))
+
+    def test_grow(self):
+        counter_file = multiprocess.CounterFile(self.path())
+        keys = [('metric_{}'.format(index) * 10, ()) for index in range(500)]
+        for key in keys:
+            counter_file.add(key, 1)
+        self.assertGreater(counter_file.size, multiprocess.INITIAL_SIZE)
+        totals = multiprocess.collect([self.directory])
+        self.assertEquals(500, len(totals))
+        self.assertEquals({1}, set(totals.values()))
+
+    def test_collect_merges_processes(self):
+        multiprocess.CounterFile(self.path('ga-1.counters')).add(HITS, 2)
+        multiprocess.CounterFile(self.path('ga-2.counters')).add(HITS, 3)
+        with open(self.path('other.txt'), 'w') as other:
+            other.write('ignored')
+        self.assertEquals({HITS: 5}, multiprocess.collect([self.directory]))
+
+
+class ArchiveTest(MultiprocessTestCase):
+
+    def counter_files(self):
+        return sorted(
+            name for name in os.listdir(self.directory)
+            if name.endswith(multiprocess.FILE_SUFFIX))
+
+    def test_archive(self):
+        multiprocess.CounterFile(self.path('ga-1.counters')).add(HITS, 2)
+        multiprocess.CounterFile(self.path('ga-2.counters')).add(HITS, 3)
+        multiprocess.archive(self.path('ga-1.counters'))
+        self.assertEquals(
+            ['ga-2.counters', 'ga-archive.counters'], self.counter_files())
+        self.assertEquals({HITS: 5}, multiprocess.collect([self.directory]))
+        multiprocess.archive(self.path('ga-2.counters'))
+        self.assertEquals(['ga-archive.counters'], self.counter_files())
+        self.assertEquals({HITS: 5}, multiprocess.collect([self.directory]))
+
+    def test_archive_missing_file(self):
+        multiprocess.archive(self.path('ga-1.counters'))
+        self.assertEquals([], self.counter_files())
+
+    def test_archive_files(self):
+        with override_settings(TRACKERS={'ga': {
+                'METRICS_DIR': self.directory}}):
+            multiprocess.get_file('ga').add(HITS, 2)
+            multiprocess.archive_files()
+            self.assertEquals({}, multiprocess._files)
+            self.assertEquals(['ga-archive.counters'], self.counter_files())
+            multiprocess.get_file('ga').add(HITS, 1)
+            self.assertEquals(
+                {HITS: 3}, multiprocess.collect([self.directory]))
+
+    def test_mark_process_dead(self):
+        multiprocess.CounterFile(self.path('ga-12.counters')).add(HITS, 2)
+        multiprocess.CounterFile(self.path('ga-112.counters')).add(HITS, 3)
+        multiprocess.mark_process_dead(12, [self.directory])
+        self.assertEquals(
+            ['ga-112.counters', 'ga-archive.counters'], self.counter_files())
+        self.assertEquals({HITS: 5}, multiprocess.collect([self.directory]))
+
+
+class SinkTest(MultiprocessTestCase):
+
+    def test_disabled_without_metrics_dir(self):
+        with override_settings(TRACKERS={'ga': {}}):
+            self.assertIsNone(multiprocess.get_file('ga'))
+            multiprocess.MultiprocessSink().count('ga', 'hits', 1)
+
+    def test_file_per_process(self):
+        with override_settings(TRACKERS={'ga': {
+                'METRICS_DIR': self.directory}}):
+            counter_file = multiprocess.get_file('ga')
+            self.assertIs(counter_file, multiprocess.get_file('ga'))
+            self.assertEquals(
+                self.path('ga-{}.counters'.format(os.getpid())),
+                counter_file.path)
+            with mock.patch('os.getpid', return_value=-1):
+                self.assertEquals(
+                    self.path('ga--1.counters'),
+                    multiprocess.get_file('ga').path)
+
+    def test_sink(self):
+        with override_settings(TRACKERS={'ga': {
+                'INSTRUMENTATION': ['multiprocess'],
+                'METRICS_DIR': self.directory}}):
+            instrument = instrumentation.get_instrument('ga')
+            instrument.count(instrumentation.HITS, 2)
+            instrument.status(200)
+            instrument.status(200)
+            instrument.status(503)
+            instrument.timing(instrumentation.ROUND_TRIP, 0.2)
+            instrument.timing(instrumentation.ROUND_TRIP, 0.003)
+            instrument.timing(instrumentation.ROUND_TRIP, 60)
+
+        self.assertEquals(
+            '# HELP catracking_hits_total Hits created.\n'
+            '# TYPE catracking_hits_total counter\n'
+            'catracking_hits_total{tracker="ga"} 2\n'
+            '# HELP catracking_responses_total '
+            'Responses of the tracker, by status code.\n'
+            '# TYPE catracking_responses_total counter\n'
+            'catracking_responses_total{code="200",tracker="ga"} 2\n'
+            'catracking_responses_total{code="503",tracker="ga"} 1\n',
+            ''.join(
+                line for line in multiprocess.snapshot([self.directory])
+                .splitlines(True) if 'stage_seconds' not in line))
+
+        stages = [
+            line for line in multiprocess.snapshot([self.directory])
+            .splitlines() if line.startswith('catracking_stage_seconds')]
+        self.assertEquals(
+            len(multiprocess.BUCKETS) + 3, len(stages))
+        self.assertIn(
+            'catracking_stage_seconds_bucket'
+            '{stage="round_trip",tracker="ga",le="0.001"} 0', stages)
+        self.assertIn(
+            'catracking_stage_seconds_bucket'
+            '{stage="round_trip",tracker="ga",le="0.005"} 1', stages)
+        self.assertIn(
+            'catracking_stage_seconds_bucket'
+            '{stage="round_trip",tracker="ga",le="0.25"} 2', stages)
+        self.assertIn(
+            'catracking_stage_seconds_bucket'
+            '{stage="round_trip",tracker="ga",le="10.0"} 2', stages)
+        self.assertIn(
+            'catracking_stage_seconds_bucket'
+            '{stage="round_trip",tracker="ga",le="+Inf"} 3', stages)
+        self.assertIn(
+            'catracking_stage_seconds_count'
+            '{stage="round_trip",tracker="ga"} 3', stages)
+        self.assertIn(
+            'catracking_stage_seconds_sum'
+            '{stage="round_trip",tracker="ga"} 60.203', stages)
+
+    def test_snapshot_of_every_tracker(self):
+        with override_settings(TRACKERS={
+                'ga': {'METRICS_DIR': self.directory},
+                'other': {'METRICS_DIR': self.directory},
+                'none': {}}):
+            self.assertEquals([self.directory], multiprocess.metrics_dirs())
+            multiprocess.MultiprocessSink().count('ga', 'hits', 1)
+            self.assertIn(
+                'catracking_hits_total{tracker="ga"} 1',
+                multiprocess.snapshot())
+
+    def test_view(self):
+        with override_settings(TRACKERS={'ga': {
+                'METRICS_DIR': self.directory}}):
+            multiprocess.MultiprocessSink().count('ga', 'drops', 4)
+            response = metrics(RequestFactory().get('/metrics'))
+        self.assertEquals(200, response.status_code)
+        self.assertEquals(
+            'text/plain; version=0.0.4; charset=utf-8',
+            response['Content-Type'])
+        self.assertIn(
+            b'catracking_drops_total{tracker="ga"} 4', response.content)
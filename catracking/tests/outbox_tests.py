@@ -0,0 +1,61 @@
+import mock
+import os
+import shutil
+import tempfile
+
+from django.test import TestCase
+
+from catracking import outbox
+
+
+class OutboxTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'outbox.sqlite3')
+        self.outbox = outbox.Outbox(self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_connection_wal(self):
+        self.assertEquals(
+            'wal', self.outbox.connection.execute(
+                'PRAGMA journal_mode').fetchone()[0])
+
+    def test_connection_is_reused(self):
+        self.assertIs(self.outbox.connection, self.outbox.connection)
+
+    @mock.patch('os.getpid')
+    def test_connection_after_fork(self, p_getpid):
+        p_getpid.return_value = 1
+        connection = self.outbox.connection
+        p_getpid.return_value = 2
+        self.assertIsNot(connection, self.outbox.connection)
+
+    def test_append(self):
+        self.outbox.append('ga', '/endpoint', ['a', 'b'])
+        self.assertEquals(2, len(self.outbox))
+
+    def test_append_survives_new_connection(self):
+        self.outbox.append('ga', '/endpoint', ['a'])
+        self.assertEquals(1, len(outbox.Outbox(self.path)))
+
+    def test_peek(self):
+        self.outbox.append('ga', '/endpoint', ['a', 'b', 'c'])
+        self.outbox.append('other', '/other', ['d'])
+        rows = self.outbox.peek('ga', 2)
+        self.assertEquals(
+            [('/endpoint', 'a'), ('/endpoint', 'b')],
+            [(row[1], row[2]) for row in rows])
+        self.assertEquals(4, len(self.outbox))
+
+    def test_acknowledge(self):
+        self.outbox.append('ga', '/endpoint', ['a', 'b'])
+        first, second = self.outbox.peek('ga', 2)
+        self.outbox.acknowledge([first[0]])
+        self.assertEquals([second], self.outbox.peek('ga', 2))
+
+    def test_get_outbox_is_shared(self):
+        self.assertIs(
+            outbox.get_outbox(self.path), outbox.get_outbox(self.path))
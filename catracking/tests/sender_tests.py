@@ -0,0 +1,208 @@
+import mock
+
+from django.test import (
+    TestCase,
+    override_settings)
+
+from catracking import sender
+from catracking.core import Tracker
+from catracking.tests.stub import StubEndpoint
+
+
+def ITEM(payload):
+    return ('/endpoint', payload, None, mock.ANY)
+
+
+class MyTracker(Tracker):
+    IDENT = 'mytracker'
+    ENDPOINT = '/endpoint'
+    BATCH_ENDPOINT = '/batch'
+    BATCH_MAX_HITS = 2
+    BATCH_MAX_BYTES = 100
+    HIT_MAX_BYTES = 10
+
+    def __init__(self):
+        pass
+
+    def send(self):
+        pass
+
+
+class BackgroundSenderTest(TestCase):
+
+    def sender(self, **kwargs):
+        return sender.BackgroundSender(MyTracker, **kwargs)
+
+    def test_init(self):
+        background_sender = self.sender()
+        self.assertEquals(sender.DEFAULT_QUEUE_SIZE,
+                          background_sender.queue.maxsize)
+        self.assertTrue(background_sender.thread.daemon)
+        self.assertFalse(background_sender.thread.is_alive())
+
+    def test_send(self):
+        background_sender = self.sender()
+        with mock.patch('catracking.sender.time', return_value=20):
+            background_sender.send('/endpoint', ['a', 'b'], [10, 11])
+        self.assertEquals(
+            [('/endpoint', 'a', 10, 20), ('/endpoint', 'b', 11, 20)],
+            list(background_sender.queue.queue))
+
+    @mock.patch('catracking.sender.logger.warning')
+    def test_send_drop_oldest(self, p_warning):
+        background_sender = self.sender(
+            queue_size=2, overflow=sender.OVERFLOW_DROP_OLDEST)
+        background_sender.send('/endpoint', ['a', 'b', 'c'])
+        self.assertEquals(
+            ['b', 'c'], [item[1] for item in background_sender.queue.queue])
+        self.assertEquals(1, background_sender.dropped)
+
+    @mock.patch('catracking.sender.logger.warning')
+    def test_send_drop_newest(self, p_warning):
+        background_sender = self.sender(
+            queue_size=2, overflow=sender.OVERFLOW_DROP_NEWEST)
+        background_sender.send('/endpoint', ['a', 'b', 'c'])
+        self.assertEquals(
+            ['a', 'b'], [item[1] for item in background_sender.queue.queue])
+        self.assertEquals(1, background_sender.dropped)
+
+    @mock.patch('catracking.sender.logger.warning')
+    def test_send_block(self, p_warning):
+        background_sender = self.sender(
+            queue_size=1, overflow=sender.OVERFLOW_BLOCK, block_timeout=0.01)
+        background_sender.send('/endpoint', ['a', 'b'])
+        self.assertEquals(
+            ['a'], [item[1] for item in background_sender.queue.queue])
+        self.assertEquals(1, background_sender.dropped)
+
+    @mock.patch('catracking.sender.deliver_or_dead_letter')
+    def test_flush(self, p_deliver):
+        self.sender().flush([
+            ('/endpoint', 'a', 10, 20), ('/endpoint', 'b', None, 21)])
+        p_deliver.assert_has_calls([
+            mock.call('mytracker', '/endpoint', 'a', 10, 20),
+            mock.call('mytracker', '/endpoint', 'b', None, 21)
+        ])
+
+    @override_settings(TRACKERS={'mytracker': {'BATCH': True}})
+    @mock.patch('catracking.sender.deliver_or_dead_letter')
+    def test_flush_batch(self, p_deliver):
+        self.sender().flush([
+            ('/endpoint', 'a', 11, 21), ('/endpoint', 'b', 10, 20),
+            ('/endpoint', 'c', None, 22)])
+        p_deliver.assert_has_calls([
+            mock.call('mytracker', '/batch', 'a\nb', 10, 20),
+            mock.call('mytracker', '/batch', 'c', None, 22)
+        ])
+
+    @mock.patch('catracking.sender.deliver_or_dead_letter')
+    @mock.patch('catracking.sender.time')
+    @mock.patch('catracking.sender.requeue')
+    def test_flush_requeues(self, p_requeue, p_time, p_deliver):
+        p_time.return_value = 30
+        p_requeue.side_effect = [None, 'b&qt=1']
+        self.sender().flush([
+            ('/endpoint', 'a', 10, 20), ('/endpoint', 'b', 11, 21)])
+        p_requeue.assert_has_calls([
+            mock.call('mytracker', '/endpoint', 'a', 20, 30),
+            mock.call('mytracker', '/endpoint', 'b', 21, 30)])
+        p_deliver.assert_called_once_with(
+            'mytracker', '/endpoint', 'b&qt=1', 11, 21)
+
+    @mock.patch('catracking.sender.logger.exception')
+    @mock.patch('catracking.sender.deliver_or_dead_letter')
+    def test_flush_failure(self, p_deliver, p_exception):
+        p_deliver.side_effect = Exception
+        self.sender().flush([('/endpoint', 'a', None, 20)])
+        p_exception.assert_called_once()
+
+    @mock.patch('catracking.sender.logger.exception')
+    @mock.patch('catracking.sender.deliver_or_dead_letter')
+    def test_flush_failure_delivers_others(self, p_deliver, p_exception):
+        p_deliver.side_effect = [Exception, None, None]
+        self.sender().flush([
+            ('/endpoint', 'a', None, 20), ('/endpoint', 'b', None, 21),
+            ('/endpoint', 'c', None, 22)])
+        self.assertEquals(
+            ['a', 'b', 'c'],
+            [call[0][2] for call in p_deliver.call_args_list])
+        p_exception.assert_called_once()
+
+    @mock.patch('catracking.sender.BackgroundSender.flush')
+    def test_run_batch_size(self, p_flush):
+        background_sender = self.sender(batch_size=2, max_latency=60)
+        background_sender.send('/endpoint', ['a', 'b', 'c'])
+        background_sender.queue.put(sender.STOP)
+        background_sender.run()
+        p_flush.assert_has_calls([
+            mock.call([ITEM('a'), ITEM('b')]),
+            mock.call([ITEM('c')])
+        ])
+
+    @mock.patch('catracking.sender.BackgroundSender.flush')
+    def test_run_max_latency(self, p_flush):
+        background_sender = self.sender(batch_size=10, max_latency=0.01)
+        background_sender.start()
+        background_sender.send('/endpoint', ['a'])
+        background_sender.thread.join(0.2)
+        p_flush.assert_called_once_with([ITEM('a')])
+        background_sender.stop()
+
+    @mock.patch('catracking.sender.BackgroundSender.flush')
+    def test_stop_drains_queue(self, p_flush):
+        background_sender = self.sender(batch_size=10, max_latency=60)
+        background_sender.start()
+        background_sender.send('/endpoint', ['a', 'b'])
+        background_sender.stop()
+        self.assertFalse(background_sender.thread.is_alive())
+        p_flush.assert_called_once_with([ITEM('a'), ITEM('b')])
+
+    def test_stop_not_started(self):
+        self.sender().stop()
+
+    @mock.patch('catracking.buffers.get_buffer')
+    def test_delivery_to_stub_endpoint(self, p_get_buffer):
+        background_sender = self.sender(batch_size=10, max_latency=60)
+        background_sender.start()
+        with StubEndpoint() as stub:
+            background_sender.send(stub.url('/collect'), ['a=1', 'a=2'])
+            background_sender.stop()
+        self.assertEquals(
+            [('/collect', 'a=1'), ('/collect', 'a=2')], stub.requests)
+
+
+class GetSenderTest(TestCase):
+
+    def setUp(self):
+        sender._senders.clear()
+
+    def tearDown(self):
+        sender.stop_all()
+        sender._senders.clear()
+
+    def test_get_sender(self):
+        background_sender = sender.get_sender(MyTracker)
+        self.assertTrue(background_sender.thread.is_alive())
+        self.assertEquals(sender.DEFAULT_BATCH_SIZE,
+                          background_sender.batch_size)
+
+    @override_settings(TRACKERS={'mytracker': {
+        'THREAD_QUEUE_SIZE': 5, 'THREAD_BATCH_SIZE': 2,
+        'THREAD_MAX_LATENCY': 3, 'THREAD_OVERFLOW': 'block',
+        'THREAD_BLOCK_TIMEOUT': 4}})
+    def test_get_sender_settings(self):
+        background_sender = sender.get_sender(MyTracker)
+        self.assertEquals(5, background_sender.queue.maxsize)
+        self.assertEquals(2, background_sender.batch_size)
+        self.assertEquals(3, background_sender.max_latency)
+        self.assertEquals('block', background_sender.overflow)
+        self.assertEquals(4, background_sender.block_timeout)
+
+    def test_get_sender_is_shared(self):
+        self.assertIs(
+            sender.get_sender(MyTracker), sender.get_sender(MyTracker))
+
+    def test_stop_all(self):
+        background_sender = sender.get_sender(MyTracker)
+        sender.stop_all()
+        self.assertFalse(background_sender.thread.is_alive())
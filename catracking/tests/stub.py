@@ -0,0 +1,60 @@
+import threading
+import time
+
+from six.moves.BaseHTTPServer import (
+    BaseHTTPRequestHandler,
+    HTTPServer)
+from six.moves.socketserver import ThreadingMixIn
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class StubEndpoint(object):
+    """
+    Local HTTP endpoint that records the body of every POST it receives,
+    so delivery can be tested without reaching the real trackers.
+    Connections are kept alive, like the real trackers do.
+    """
+
+    def __init__(self, status_code=200, delay=0):
+        self.status_code = status_code
+        self.delay = delay
+        self.requests = []
+        self.connections = set()
+        endpoint = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                endpoint.connections.add(self.client_address)
+                endpoint.requests.append(
+                    (self.path, self.rfile.read(length).decode('utf-8')))
+                if endpoint.delay:
+                    time.sleep(endpoint.delay)
+                self.send_response(endpoint.status_code)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+
+    def url(self, path='/'):
+        return 'http://127.0.0.1:{0}{1}'.format(
+            self.server.server_address[1], path)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
@@ -1,10 +1,51 @@
 import mock
+import requests
 
-from django.test import TestCase
+from datetime import datetime
 
+from django.test import (
+    TestCase,
+    override_settings)
+from django.utils import timezone
+
+from catracking import wire
 from catracking.core import Tracker
-from catracking.models import TrackingRequest
-from catracking.tasks import SendTrackingDataTask
+from catracking.ga.core import GoogleAnalyticsTracker
+from catracking.models import (
+    TrackingDeadLetter,
+    TrackingRequest)
+from catracking.tasks import (
+    CompileTrackingDataTask,
+    SendBulkTrackingDataTask,
+    SendPackedTrackingDataTask,
+    SendTrackingDataTask,
+    flush_buffers,
+    warm_up_sessions)
+from catracking.tests.stub import StubEndpoint
+
+
+class WarmUpSessionsTest(TestCase):
+
+    @override_settings(TRACKERS={'ga': {}})
+    @mock.patch('catracking.tasks.transport.warm_session')
+    def test_warm_up_sessions(self, p_warm_session):
+        warm_up_sessions()
+        p_warm_session.assert_called_once_with(
+            'ga', 'https://www.google-analytics.com/collect')
+
+    @override_settings(TRACKERS={})
+    @mock.patch('catracking.tasks.transport.warm_session')
+    def test_warm_up_sessions_no_trackers(self, p_warm_session):
+        warm_up_sessions()
+        p_warm_session.assert_not_called()
+
+
+class FlushBuffersTest(TestCase):
+
+    @mock.patch('catracking.tasks.buffers.flush_all')
+    def test_flush_buffers(self, p_flush_all):
+        flush_buffers()
+        p_flush_all.assert_called_once()
 
 
 class SendTrackingDataTaskTest(TestCase):
@@ -24,6 +65,7 @@ class SendTrackingDataTaskTest(TestCase):
         self.task.tracker_ident = self.MyTracker.IDENT
         self.task.endpoint = self.MyTracker.ENDPOINT
         self.task.payload = 'p'
+        self.task.attempt = 0
         self.task.response = mock.MagicMock()
         self.task.response.status_code = 200
 
@@ -47,6 +89,40 @@ class SendTrackingDataTaskTest(TestCase):
         self.assertEquals('p', tracking_request.payload)
         self.assertEquals(200, tracking_request.response_code)
 
+    @mock.patch('catracking.delivery.time')
+    @mock.patch('catracking.delivery.instrumentation.clock')
+    @mock.patch('catracking.tasks.transport.post')
+    def test_run_logs_delivery(self, p_post, p_clock, p_time):
+        p_post.return_value.status_code = 200
+        p_time.return_value = 1500000010
+        p_clock.side_effect = [5, 5.25]
+        self.task.run(
+            self.MyTracker.IDENT, self.MyTracker.ENDPOINT, u'p=\xe9',
+            created=1500000000, enqueued=1500000009.5)
+        tracking_request = TrackingRequest.objects.get()
+        self.assertEquals(
+            datetime(2017, 7, 14, 2, 40, tzinfo=timezone.utc),
+            tracking_request.hit_created)
+        self.assertEquals(0.5, tracking_request.queue_delay)
+        self.assertEquals(0.25, tracking_request.round_trip)
+        self.assertEquals(4, tracking_request.payload_size)
+
+    @mock.patch('catracking.delivery.expire')
+    @mock.patch('catracking.tasks.transport.post')
+    def test_run_requeues_payload(self, p_post, p_expire):
+        p_post.return_value.status_code = 200
+        endpoint = GoogleAnalyticsTracker.ENDPOINT
+        with mock.patch('catracking.delivery.time', return_value=12):
+            self.task.run('ga', endpoint, 't=event&qt=500', enqueued=10)
+        p_post.assert_called_once_with('ga', endpoint, 't=event&qt=2500')
+        self.assertEquals(
+            't=event&qt=2500', TrackingRequest.objects.get().payload)
+
+        with mock.patch('catracking.delivery.time', return_value=14410):
+            self.task.run('ga', endpoint, 't=event&qt=500', enqueued=10)
+        self.assertEquals(1, p_post.call_count)
+        p_expire.assert_called_once_with('ga', endpoint, ['t=event&qt=500'])
+
     @mock.patch('catracking.tasks.logger.error')
     def test_check_response_more_than_299(self, p_error):
         self.task.response.status_code = 300
@@ -69,16 +145,16 @@ class SendTrackingDataTaskTest(TestCase):
         self.task.check_response()
         p_error.assert_not_called()
 
-    @mock.patch('requests.post')
+    @mock.patch('catracking.tasks.transport.post')
     def test_run(self, p_post):
         response = mock.MagicMock()
         response.status_code = 200
         p_post.return_value = response
         self.task.run(self.MyTracker.IDENT, self.MyTracker.ENDPOINT, 'p')
         p_post.assert_called_once_with(
-            self.MyTracker.ENDPOINT, data='p')
+            self.MyTracker.IDENT, self.MyTracker.ENDPOINT, 'p')
 
-    @mock.patch('requests.post')
+    @mock.patch('catracking.tasks.transport.post')
     @mock.patch('catracking.tasks.logger.error')
     def test_run_bad_response(self, p_error, p_post):
         response = mock.MagicMock()
@@ -86,7 +162,185 @@ class SendTrackingDataTaskTest(TestCase):
         p_post.return_value = response
         self.task.run(self.MyTracker.IDENT, self.MyTracker.ENDPOINT, 'p')
         p_post.assert_called_once_with(
-            self.MyTracker.ENDPOINT, data='p')
+            self.MyTracker.IDENT, self.MyTracker.ENDPOINT, 'p')
         p_error.assert_called_once_with(
             'Bad response status from tracker',
             extra=self.task.extra)
+
+    @mock.patch('random.uniform')
+    def test_backoff(self, p_uniform):
+        self.task.attempt = 2
+        self.task.backoff()
+        p_uniform.assert_called_once_with(0, 16)
+
+    @override_settings(TRACKERS={'mytracker': {
+        'RETRY_BACKOFF': 1, 'RETRY_BACKOFF_MAX': 10}})
+    @mock.patch('random.uniform')
+    def test_backoff_max(self, p_uniform):
+        self.task.attempt = 8
+        self.task.backoff()
+        p_uniform.assert_called_once_with(0, 10)
+
+    @mock.patch('catracking.tasks.SendTrackingDataTask.backoff')
+    @mock.patch('catracking.tasks.SendTrackingDataTask.apply_async')
+    def test_retry_or_dead_letter_retry(self, p_apply_async, p_backoff):
+        p_backoff.return_value = 3
+        self.task.attempt = 1
+        self.task.created = 10
+        self.task.sent = 20
+        self.task.retry_or_dead_letter('error')
+        p_apply_async.assert_called_once_with(
+            ('mytracker', '/endpoint', 'p'),
+            {'attempt': 2, 'created': 10, 'enqueued': 20}, countdown=3)
+        self.assertFalse(TrackingDeadLetter.objects.exists())
+
+    @override_settings(TRACKERS={'mytracker': {'RETRY_MAX': 1}})
+    @mock.patch('catracking.delivery.logger.error')
+    @mock.patch('catracking.tasks.SendTrackingDataTask.apply_async')
+    def test_retry_or_dead_letter_exhausted(self, p_apply_async, p_error):
+        self.task.attempt = 1
+        self.task.retry_or_dead_letter('error')
+        p_apply_async.assert_not_called()
+        p_error.assert_called_once_with(
+            'Tracking data could not be delivered', extra=self.task.extra)
+        dead_letter = TrackingDeadLetter.objects.get()
+        self.assertEquals('mytracker', dead_letter.tracker)
+        self.assertEquals('/endpoint', dead_letter.endpoint)
+        self.assertEquals('p', dead_letter.payload)
+        self.assertEquals(2, dead_letter.attempts)
+        self.assertEquals('error', dead_letter.error)
+
+    @mock.patch('catracking.tasks.SendTrackingDataTask.retry_or_dead_letter')
+    @mock.patch('catracking.tasks.transport.post')
+    def test_run_connection_error(self, p_post, p_retry):
+        error = requests.ConnectionError()
+        p_post.side_effect = error
+        self.task.run(self.MyTracker.IDENT, self.MyTracker.ENDPOINT, 'p', 2)
+        p_retry.assert_called_once_with(error)
+        self.assertEquals(2, self.task.attempt)
+        self.assertFalse(TrackingRequest.objects.exists())
+
+    @mock.patch('catracking.tasks.logger.error')
+    @mock.patch('catracking.tasks.SendTrackingDataTask.retry_or_dead_letter')
+    @mock.patch('catracking.tasks.transport.post')
+    def test_run_server_error(self, p_post, p_retry, p_error):
+        p_post.return_value.status_code = 503
+        self.task.run(self.MyTracker.IDENT, self.MyTracker.ENDPOINT, 'p')
+        p_retry.assert_called_once_with('Bad response status 503')
+        self.assertEquals(503, TrackingRequest.objects.get().response_code)
+
+    @mock.patch('catracking.tasks.SendTrackingDataTask.retry_or_dead_letter')
+    @mock.patch('catracking.tasks.transport.post')
+    def test_run_client_error_not_retried(self, p_post, p_retry):
+        p_post.return_value.status_code = 400
+        with mock.patch('catracking.tasks.logger.error'):
+            self.task.run(self.MyTracker.IDENT, self.MyTracker.ENDPOINT, 'p')
+        p_retry.assert_not_called()
+
+
+class SendBulkTrackingDataTaskTest(TestCase):
+
+    def setUp(self):
+        self.task = SendBulkTrackingDataTask()
+
+    @mock.patch('catracking.tasks.SendTrackingDataTask.run')
+    def test_run(self, p_run):
+        self.task.run(
+            'mytracker', '/endpoint', ['a', 'b'], 1, [10, 11], 20)
+        p_run.assert_has_calls([
+            mock.call('mytracker', '/endpoint', 'a', created=10, enqueued=20),
+            mock.call('mytracker', '/endpoint', 'b', created=11, enqueued=20)
+        ])
+
+    @mock.patch('catracking.tasks.SendTrackingDataTask.run')
+    def test_run_shared_created(self, p_run):
+        self.task.run('mytracker', '/endpoint', ['a', 'b'], 1, 10, 20)
+        p_run.assert_has_calls([
+            mock.call('mytracker', '/endpoint', 'a', created=10, enqueued=20),
+            mock.call('mytracker', '/endpoint', 'b', created=10, enqueued=20)
+        ])
+
+    @mock.patch('catracking.tasks.logger.exception')
+    @mock.patch('catracking.tasks.SendTrackingDataTask.run')
+    def test_run_failure_does_not_stop_delivery(self, p_run, p_exception):
+        p_run.side_effect = [Exception, None]
+        self.task.run('mytracker', '/endpoint', ['a', 'b'])
+        self.assertEquals(2, p_run.call_count)
+        p_exception.assert_called_once_with(
+            'General failure sending tracking data', extra={
+                'tracker': 'mytracker', 'endpoint': '/endpoint',
+                'payload': 'a'})
+
+    @mock.patch('catracking.tasks.ThreadPool')
+    @mock.patch('catracking.tasks.SendTrackingDataTask.run')
+    def test_run_sequential_does_not_create_pool(self, p_run, p_pool):
+        self.task.run('mytracker', '/endpoint', ['a'], concurrency=4)
+        p_pool.assert_not_called()
+
+    @mock.patch('catracking.tasks.connection')
+    @mock.patch('catracking.tasks.SendTrackingDataTask.run')
+    def test_run_concurrently_closes_connections(self, p_run, p_connection):
+        p_run.side_effect = [Exception, None, None]
+        with mock.patch('catracking.tasks.logger.exception'):
+            self.task.run('mytracker', '/endpoint', ['a', 'b', 'c'], 2)
+        self.assertEquals(3, p_connection.close.call_count)
+
+    @mock.patch('catracking.tasks.ThreadPool')
+    @mock.patch('catracking.tasks.SendTrackingDataTask.run')
+    def test_run_concurrently_closes_pool(self, p_run, p_pool):
+        p_pool.return_value.map.side_effect = KeyboardInterrupt
+        with self.assertRaises(KeyboardInterrupt):
+            self.task.run('mytracker', '/endpoint', ['a', 'b'], 2)
+        p_pool.return_value.close.assert_called_once_with()
+        p_pool.return_value.join.assert_called_once_with()
+
+    @mock.patch(
+        'catracking.tasks.SendTrackingDataTask.create_tracking_request_log')
+    def test_run_concurrently_against_stub_endpoint(self, p_log):
+        with StubEndpoint() as stub:
+            self.task.run(
+                'mytracker', stub.url('/collect'),
+                [str(index) for index in range(10)], concurrency=4)
+        self.assertEquals(
+            sorted(str(index) for index in range(10)),
+            sorted(body for _, body in stub.requests))
+        self.assertEquals(10, p_log.call_count)
+
+
+class SendPackedTrackingDataTaskTest(TestCase):
+
+    @mock.patch('catracking.tasks.SendBulkTrackingDataTask.run')
+    def test_run(self, p_run):
+        message = wire.pack('/endpoint', ['a=1&b=2', 'a=1\nb=2'])
+        SendPackedTrackingDataTask().run('mytracker', message, 3, 10, 20)
+        p_run.assert_called_once_with(
+            'mytracker', '/endpoint', ['a=1&b=2', 'a=1\nb=2'], 3, 10, 20)
+
+
+@override_settings(TRACKERS={'ga': {
+    'PROPERTY': 'UA-1', 'DOCUMENT_HOSTNAME': 'www.ca.com'}})
+class CompileTrackingDataTaskTest(TestCase):
+
+    def setUp(self):
+        self.task = CompileTrackingDataTask()
+        self.root = [('v', 1), ('tid', 'UA-1'), ('cid', '1.2')]
+        self.hits = [[('t', 'event'), ('el', 'A')], [('t', 'event')]]
+
+    @mock.patch('random.randint', mock.Mock(return_value=5))
+    @mock.patch('catracking.tasks.SendBulkTrackingDataTask.run')
+    def test_run(self, p_run):
+        self.task.run('ga', self.root, self.hits, [10, 11], 20)
+        p_run.assert_called_once_with(
+            'ga', GoogleAnalyticsTracker.ENDPOINT, [
+                'v=1&tid=UA-1&cid=1.2&t=event&el=a&z=5',
+                'v=1&tid=UA-1&cid=1.2&t=event&z=5'], 1, [10, 11], 20)
+
+    @override_settings(TRACKERS={'ga': {'BATCH': True, 'BULK_CONCURRENCY': 2}})
+    @mock.patch('random.randint', mock.Mock(return_value=5))
+    @mock.patch('catracking.tasks.SendBulkTrackingDataTask.run')
+    def test_run_batch(self, p_run):
+        self.task.run('ga', self.root, self.hits)
+        p_run.assert_called_once_with(
+            'ga', GoogleAnalyticsTracker.BATCH_ENDPOINT, [
+                'v=1&tid=UA-1&cid=1.2&t=event&el=a&z=5\n'
+                'v=1&tid=UA-1&cid=1.2&t=event&z=5'], 2, [None], None)
@@ -0,0 +1,155 @@
+import mock
+import requests
+
+from django.test import (
+    TestCase,
+    override_settings)
+
+from catracking import (
+    breaker,
+    transport)
+from catracking.tests.stub import StubEndpoint
+
+
+class TransportTest(TestCase):
+
+    def setUp(self):
+        transport._sessions.clear()
+        breaker._breakers.clear()
+
+    def tearDown(self):
+        transport._sessions.clear()
+        breaker._breakers.clear()
+
+    def test_tracker_settings_no_trackers(self):
+        self.assertEquals({}, transport.tracker_settings('ga'))
+
+    @override_settings(TRACKERS={'ga': {'a': 1}})
+    def test_tracker_settings(self):
+        self.assertEquals(1, transport.tracker_settings('ga').a)
+
+    def test_retry_policy(self):
+        retry = transport.retry_policy(3)
+        self.assertEquals(3, retry.connect)
+        self.assertEquals(0, retry.read)
+        self.assertEquals(0, retry.status)
+        self.assertTrue(retry.is_retry('POST', 500) is False)
+
+    @override_settings(TRACKERS={'ga': {
+        'HTTP_READ_TIMEOUT': 0.2, 'HTTP_RETRIES': 3}})
+    def test_post_read_timeout_not_retried(self):
+        with StubEndpoint(delay=0.5) as stub:
+            with self.assertRaises(requests.RequestException):
+                transport.post('ga', stub.url('/collect'), 'a=1')
+        self.assertEquals([('/collect', 'a=1')], stub.requests)
+
+    @override_settings(TRACKERS={'ga': {
+        'HTTP_POOL_SIZE': 4, 'HTTP_RETRIES': 1}})
+    def test_build_session(self):
+        session = transport.build_session('ga')
+        adapter = session.get_adapter('https://www.google-analytics.com')
+        self.assertEquals(4, adapter._pool_maxsize)
+        self.assertEquals(1, adapter.max_retries.connect)
+
+    def test_build_session_defaults(self):
+        session = transport.build_session('ga')
+        adapter = session.get_adapter('http://127.0.0.1')
+        self.assertEquals(transport.DEFAULT_POOL_SIZE, adapter._pool_maxsize)
+        self.assertEquals(
+            transport.DEFAULT_RETRIES, adapter.max_retries.connect)
+
+    def test_get_session_is_shared(self):
+        self.assertIs(transport.get_session('ga'), transport.get_session('ga'))
+
+    def test_get_session_per_tracker(self):
+        self.assertIsNot(
+            transport.get_session('ga'), transport.get_session('other'))
+
+    @mock.patch('os.getpid')
+    def test_get_session_after_fork(self, p_getpid):
+        p_getpid.return_value = 1
+        session = transport.get_session('ga')
+        p_getpid.return_value = 2
+        self.assertIsNot(session, transport.get_session('ga'))
+
+    def test_timeout_defaults(self):
+        self.assertEquals(
+            (transport.DEFAULT_CONNECT_TIMEOUT,
+             transport.DEFAULT_READ_TIMEOUT),
+            transport.timeout('ga'))
+
+    @override_settings(TRACKERS={'ga': {
+        'HTTP_CONNECT_TIMEOUT': 1, 'HTTP_READ_TIMEOUT': 2}})
+    def test_timeout(self):
+        self.assertEquals((1, 2), transport.timeout('ga'))
+
+    def test_post_keeps_connection_alive(self):
+        with StubEndpoint() as stub:
+            transport.post('ga', stub.url('/collect'), 'a=1')
+            transport.post('ga', stub.url('/collect'), 'a=2')
+        self.assertEquals(
+            [('/collect', 'a=1'), ('/collect', 'a=2')], stub.requests)
+        self.assertEquals(1, len(stub.connections))
+
+    @mock.patch('catracking.transport.get_session')
+    def test_post_with_timeout(self, p_get_session):
+        p_get_session.return_value.post.return_value.status_code = 200
+        transport.post('ga', '/endpoint', 'a=1')
+        p_get_session.return_value.post.assert_called_once_with(
+            '/endpoint', data='a=1', timeout=transport.timeout('ga'))
+
+    @mock.patch('catracking.transport.get_session')
+    def test_post_circuit_open(self, p_get_session):
+        with mock.patch.object(
+                breaker.CircuitBreaker, 'allow', return_value=False):
+            with self.assertRaises(breaker.CircuitOpenError):
+                transport.post('ga', '/endpoint', 'a=1')
+        p_get_session.return_value.post.assert_not_called()
+
+    @mock.patch('catracking.transport.get_session')
+    def test_post_records_server_error(self, p_get_session):
+        p_get_session.return_value.post.return_value.status_code = 503
+        with mock.patch.object(
+                breaker.CircuitBreaker, 'record_failure') as p_failure:
+            transport.post('ga', '/endpoint', 'a=1')
+            p_failure.assert_called_once()
+
+    @mock.patch('catracking.transport.get_session')
+    def test_post_records_connection_error(self, p_get_session):
+        p_get_session.return_value.post.side_effect = requests.Timeout
+        with mock.patch.object(
+                breaker.CircuitBreaker, 'record_failure') as p_failure:
+            with self.assertRaises(requests.Timeout):
+                transport.post('ga', '/endpoint', 'a=1')
+            p_failure.assert_called_once()
+
+    @mock.patch('catracking.transport.get_session')
+    def test_post_records_success(self, p_get_session):
+        p_get_session.return_value.post.return_value.status_code = 400
+        with mock.patch.object(
+                breaker.CircuitBreaker, 'record_success') as p_success:
+            transport.post('ga', '/endpoint', 'a=1')
+            p_success.assert_called_once()
+
+    @override_settings(TRACKERS={'ga': {'BREAKER_THRESHOLD': 2}})
+    def test_post_opens_circuit_against_stub_endpoint(self):
+        with StubEndpoint(status_code=500) as stub:
+            for _ in range(2):
+                transport.post('ga', stub.url('/collect'), 'a=1')
+            with self.assertRaises(breaker.CircuitOpenError):
+                transport.post('ga', stub.url('/collect'), 'a=1')
+        self.assertEquals(2, len(stub.requests))
+
+    @mock.patch('catracking.transport.get_session')
+    def test_warm_session(self, p_get_session):
+        transport.warm_session('ga', '/endpoint')
+        p_get_session.return_value.head.assert_called_once_with(
+            '/endpoint', timeout=transport.timeout('ga'))
+
+    @mock.patch('catracking.transport.logger.warning')
+    @mock.patch('catracking.transport.get_session')
+    def test_warm_session_error(self, p_get_session, p_warning):
+        p_get_session.return_value.head.side_effect = \
+            requests.ConnectionError
+        transport.warm_session('ga', '/endpoint')
+        p_warning.assert_called_once()
@@ -0,0 +1,59 @@
+import base64
+import json
+import zlib
+
+from django.test import TestCase
+
+from catracking import wire
+
+PAYLOADS = [
+    'v=1&tid=UA-1&dh=www.ca.com&cid=1.2&ua=Mozilla&t=event&ec=a&z={}'.format(
+        index) for index in range(20)]
+
+
+class WireTest(TestCase):
+
+    def roundtrip(self, payloads, **kwargs):
+        return wire.unpack(wire.pack('/endpoint', payloads, **kwargs))
+
+    def test_pack_unpack(self):
+        self.assertEquals(('/endpoint', PAYLOADS), self.roundtrip(PAYLOADS))
+
+    def test_pack_unpack_batches(self):
+        payloads = ['\n'.join(PAYLOADS[:15]), '\n'.join(PAYLOADS[15:])]
+        self.assertEquals(('/endpoint', payloads), self.roundtrip(payloads))
+
+    def test_pack_unpack_empty(self):
+        self.assertEquals(('/endpoint', ['']), self.roundtrip(['']))
+        self.assertEquals(('/endpoint', []), self.roundtrip([]))
+
+    def test_pack_unpack_quoted_values(self):
+        payloads = ['el=a%26b+c&ua=Mozilla%2F5.0']
+        self.assertEquals(('/endpoint', payloads), self.roundtrip(payloads))
+
+    def test_pack_uncompressed(self):
+        self.assertEquals(
+            [wire.UNCOMPRESSED, '/endpoint', ['a=1', 'b=2'],
+             [[[0, 1]], [[0]]]],
+            wire.pack('/endpoint', ['a=1&b=2', 'a=1']))
+
+    def test_pack_compression(self):
+        message = wire.pack('/endpoint', ['a=1'], compress_min=0)
+        self.assertEquals(wire.COMPRESSED, message[0])
+        self.assertEquals(
+            ['/endpoint', ['a=1'], [[[0]]]],
+            json.loads(zlib.decompress(base64.b64decode(message[1]))))
+        self.assertEquals(('/endpoint', ['a=1']), wire.unpack(message))
+
+    def test_pack_smaller_than_plain(self):
+        plain = wire.size(['/endpoint', PAYLOADS])
+        self.assertLess(wire.size(wire.pack('/endpoint', PAYLOADS)), plain)
+        self.assertLess(
+            wire.size(wire.pack('/endpoint', PAYLOADS, compress_min=0)) * 3,
+            plain)
+
+    def test_smaller(self):
+        self.assertTrue(wire.smaller(
+            wire.pack('/endpoint', PAYLOADS), '/endpoint', PAYLOADS))
+        self.assertFalse(wire.smaller(
+            wire.pack('/endpoint', PAYLOADS[:1]), '/endpoint', PAYLOADS[:1]))
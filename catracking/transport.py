@@ -0,0 +1,125 @@
+import logging
+import os
+import requests
+import threading
+
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
+
+from catracking.breaker import (
+    CircuitOpenError,
+    get_breaker)
+from catracking.core import (
+    TrackerNotConfiguredError,
+    get_config)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_CONNECT_TIMEOUT = 3.05
+DEFAULT_READ_TIMEOUT = 10
+DEFAULT_RETRIES = 2
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def tracker_settings(tracker_ident):
+    try:
+        return get_config(tracker_ident)
+    except TrackerNotConfiguredError:
+        return {}
+
+
+def retry_policy(retries):
+    """
+    Retries are only done when the connection could not be established.
+    A hit that failed after being sent (read timeout or reset) may have
+    reached the tracker, so it is not sent again here, to avoid duplicates.
+    Bad status codes are handled by whoever sent the hit.
+    """
+    options = {
+        'total': retries, 'connect': retries, 'read': 0,
+        'redirect': 0, 'status': 0, 'raise_on_status': False}
+    try:
+        return Retry(allowed_methods=False, **options)
+    except TypeError:
+        return Retry(method_whitelist=False, **options)
+
+
+def build_session(tracker_ident):
+    config = tracker_settings(tracker_ident)
+    adapter = HTTPAdapter(
+        pool_maxsize=config.get('HTTP_POOL_SIZE', DEFAULT_POOL_SIZE),
+        max_retries=retry_policy(config.get('HTTP_RETRIES', DEFAULT_RETRIES)))
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def get_session(tracker_ident):
+    """
+    Returns the keep-alive session of a tracker, shared by every delivery
+    in the current process.
+
+    Connection pools can not be shared with forked processes, so a new
+    session is built whenever the process id changes.
+    """
+    pid = os.getpid()
+    try:
+        session_pid, session = _sessions[tracker_ident]
+        if session_pid == pid:
+            return session
+    except KeyError:
+        pass
+    with _sessions_lock:
+        session_pid, session = _sessions.get(tracker_ident, (None, None))
+        if session_pid != pid:
+            session = build_session(tracker_ident)
+            _sessions[tracker_ident] = (pid, session)
+        return session
+
+
+def timeout(tracker_ident):
+    config = tracker_settings(tracker_ident)
+    return (
+        config.get('HTTP_CONNECT_TIMEOUT', DEFAULT_CONNECT_TIMEOUT),
+        config.get('HTTP_READ_TIMEOUT', DEFAULT_READ_TIMEOUT))
+
+
+def post(tracker_ident, endpoint, payload):
+    """
+    Sends the payload, unless the circuit breaker of the endpoint is open.
+    Server errors and connection failures are recorded by the breaker.
+    """
+    config = tracker_settings(tracker_ident)
+    breaker = get_breaker(tracker_ident, endpoint, config)
+    if not breaker.allow():
+        raise CircuitOpenError(
+            'Circuit breaker is open for {}'.format(endpoint))
+    try:
+        response = get_session(tracker_ident).post(
+            endpoint, data=payload, timeout=timeout(tracker_ident))
+    except requests.RequestException:
+        breaker.record_failure()
+        raise
+    if response.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    return response
+
+
+def warm_session(tracker_ident, endpoint):
+    """
+    Opens a connection to the tracker endpoint ahead of the first hit, so
+    the TCP and TLS handshakes do not happen while delivering it.
+    """
+    try:
+        get_session(tracker_ident).head(
+            endpoint, timeout=timeout(tracker_ident))
+    except requests.RequestException:
+        logger.warning(
+            'Could not warm up the tracker session',
+            extra={'tracker': tracker_ident, 'endpoint': endpoint})
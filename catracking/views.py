@@ -0,0 +1,15 @@
+from django.http import HttpResponse
+
+from catracking import multiprocess
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def metrics(request):
+    """
+    Prometheus text snapshot of the tracking counters of every process of
+    the host, see `catracking.multiprocess`. It is meant to be scraped on
+    an internal route only.
+    """
+    return HttpResponse(
+        multiprocess.snapshot(), content_type=PROMETHEUS_CONTENT_TYPE)
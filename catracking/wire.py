@@ -0,0 +1,84 @@
+"""
+Compact format of the tracking messages sent to the broker.
+
+Payloads are split into their `key=value` tokens, and every distinct token
+is stored once in a table, payloads only hold the indexes of their tokens.
+The endpoint is stored once per message.
+
+Messages are lists, carried by the celery serializer as they are. When
+they are big enough, they are serialized to JSON and compressed with
+zlib instead, as base64 text, so any celery serializer can carry them.
+
+Packing only pays off when payloads share tokens, see `smaller`.
+"""
+import base64
+import json
+import zlib
+
+COMPRESSED = 'z'
+UNCOMPRESSED = '-'
+
+DEFAULT_COMPRESS_MIN = 1024
+
+
+def serialize(data):
+    return json.dumps(data, separators=(',', ':'))
+
+
+def size(data):
+    """
+    Returns the size of the data serialized to JSON, an estimate of its
+    size in a celery message.
+    """
+    return len(serialize(data).encode('utf-8'))
+
+
+def pack(endpoint, payloads, compress_min=DEFAULT_COMPRESS_MIN):
+    """
+    Returns the message holding the endpoint and the payloads. Payloads of
+    a batch are split by hit, so their tokens are shared too.
+    """
+    indexes = {}
+    table = []
+    packed = []
+    for payload in payloads:
+        hits = []
+        for hit in payload.split('\n'):
+            tokens = []
+            for token in hit.split('&'):
+                try:
+                    tokens.append(indexes[token])
+                except KeyError:
+                    indexes[token] = len(table)
+                    tokens.append(len(table))
+                    table.append(token)
+            hits.append(tokens)
+        packed.append(hits)
+
+    data = [endpoint, table, packed]
+    body = serialize(data).encode('utf-8')
+    if len(body) < compress_min:
+        return [UNCOMPRESSED] + data
+    return [COMPRESSED, base64.b64encode(zlib.compress(body)).decode('ascii')]
+
+
+def smaller(message, endpoint, payloads):
+    """
+    Whether the message is smaller than the endpoint and the payloads sent
+    as they are. A few hits, or hits that share few tokens, are not.
+    """
+    return size(message) < size([endpoint, payloads])
+
+
+def unpack(message):
+    """
+    Returns the endpoint and the payloads of a message built by `pack`.
+    """
+    if message[0] == COMPRESSED:
+        endpoint, table, packed = json.loads(
+            zlib.decompress(base64.b64decode(message[1])).decode('utf-8'))
+    else:
+        endpoint, table, packed = message[1:]
+    return endpoint, [
+        '\n'.join('&'.join(table[index] for index in hit) for hit in hits)
+        for hits in packed]